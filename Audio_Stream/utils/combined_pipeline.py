@@ -49,15 +49,23 @@ all_cluster_labels = [
 
 models = ["confidence", "emotion"]
 
+# REPLACE WITH THE CORRECT INTERVIEW AUDIO FILE PATH
+AUDIO_PATH = "/Users/erencimentepe/Desktop/VSCode Projects/Capstone-2T6/Audio_Stream/utils/output_audio.mp3"
+
+# openSMILE window store for this recording (see processing.segment_audio): the second model and
+# later trimmed / lightly edited versions saved over the same file reuse its windows. It lives in
+# a private per-user directory (processing.window_store_path; AUDIO_WINDOW_STORE_DIR moves it);
+# set to None to extract every window
+AUDIO_STORE = processing.window_store_path(AUDIO_PATH)
+
 all_dfs = []
 
 # RUNNING MODELS
 try:
-    # REPLACE WITH THE CORRECT INTERVIEW AUDIO FILE PATH
-    audio = AudioSegment.from_file("/Users/erencimentepe/Desktop/VSCode Projects/Capstone-2T6/Audio_Stream/utils/output_audio.mp3")
+    audio = AudioSegment.from_file(AUDIO_PATH)
     for i, feature_cols in enumerate(all_feature_cols):
         # Segment the file based on the current feature columns corresponding to the appropriate model
-        segments = processing.segment_audio(audio, feature_cols=feature_cols)
+        segments = processing.segment_audio(audio, feature_cols=feature_cols, store_path=AUDIO_STORE)
 
         # Upload the correct models
         scaler, predictor = model.load_model(models[i])
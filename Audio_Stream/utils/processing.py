@@ -1,5 +1,7 @@
 import os
 import json
+import hashlib
+import numpy as np
 import pandas as pd
 import opensmile
 from pydub import AudioSegment
@@ -11,15 +13,173 @@ smile = opensmile.Smile(
     feature_level=opensmile.FeatureLevel.Functionals
 )
 
-def segment_audio(audio, feature_cols, segment_duration_ms=3000, step_size=1500):
+STORE_DIR_ENV = "AUDIO_WINDOW_STORE_DIR"  # overrides the window store directory
+PROBE_SAMPLES = 32  # samples at each stored window start used to find it again in a new upload
+MAX_MISSES = 8      # consecutive stored windows not found before whole-track probe searches stop
+
+
+def window_hash(segment):
+    """
+    Content hash of an audio window (its raw PCM samples).
+
+    Parameters:
+        segment (AudioSegment, mandatory): Audio window.
+
+    Returns:
+        str: Hex digest.
+    """
+    return hashlib.sha1(segment.raw_data).hexdigest()
+
+
+def window_store_path(audio_path):
+    """
+    Private window store path for a recording, keyed by its absolute path.
+
+    Stores live in $AUDIO_WINDOW_STORE_DIR, default ~/.cache/audio_windows, created with
+    mode 0700; a directory that belongs to another user or that others can access is refused.
+
+    Parameters:
+        audio_path (str, mandatory): The recording the windows are extracted from.
+
+    Returns:
+        str: Store path (JSON) for segment_audio(store_path=...).
+    """
+    store_dir = os.environ.get(STORE_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "audio_windows")
+    os.makedirs(store_dir, mode=0o700, exist_ok=True)
+    st = os.stat(store_dir)
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+        raise PermissionError(f"{store_dir} is not private to this user (needs mode 0700)")
+    key = hashlib.sha1(os.path.abspath(audio_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(store_dir, f"{key}.json")
+
+
+def load_window_store(store_path, audio, window, step):
+    """
+    Load the windows of a previous run from a store file, if it matches this audio's format.
+
+    Parameters:
+        store_path (str, mandatory): Store written by save_window_store.
+        audio (AudioSegment, mandatory): Audio about to be segmented.
+        window (int, mandatory): Window length in samples.
+        step (int, mandatory): Window step in samples.
+
+    Returns:
+        list[dict]: Stored windows ({"start", "hash", "probe", "features"}), empty if none or incompatible.
+    """
+    if not store_path or not os.path.exists(store_path):
+        return []
+    with open(store_path) as f:
+        store = json.load(f)
+    fmt = [audio.frame_rate, audio.channels, audio.sample_width, window, step]
+    if [store.get(k) for k in ("frame_rate", "channels", "sample_width", "window", "step")] != fmt:
+        return []
+    return store["windows"]
+
+
+def save_window_store(store_path, audio, window, step, windows):
+    """
+    Save every window's start, hash, probe samples and openSMILE features for the next run.
+
+    Parameters:
+        store_path (str, mandatory): Output path (JSON).
+        audio (AudioSegment, mandatory): The segmented audio.
+        window (int, mandatory): Window length in samples.
+        step (int, mandatory): Window step in samples.
+        windows (list[dict], mandatory): Windows as returned in the store format.
+    """
+    store = {"frame_rate": audio.frame_rate, "channels": audio.channels, "sample_width": audio.sample_width,
+             "window": window, "step": step, "windows": windows}
+    tmp = f"{store_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(store, f)
+    os.replace(tmp, store_path)
+
+
+def _find_probe(samples, probe, lo=0, hi=None):
+    """Start positions of `probe` in samples[lo:hi] (both channel-0 sample arrays)."""
+    hi = len(samples) - len(probe) + 1 if hi is None else min(hi, len(samples) - len(probe) + 1)
+    if hi <= lo:
+        return np.empty(0, dtype=np.int64)
+    cand = lo + np.flatnonzero(samples[lo:hi] == probe[0])
+    for k in range(1, len(probe)):
+        cand = cand[samples[cand + k] == probe[k]]
+        if not cand.size:
+            break
+    return cand
+
+
+def align_windows(audio, previous, window, step):
+    """
+    Window start positions for a new upload, aligned with a previous run's windows.
+
+    Each stored window is looked for in the new audio by its probe samples, near where the
+    current offset between the two uploads puts it, and confirmed by its hash. Only until
+    MAX_MISSES windows in a row were not found is a miss also searched for in the whole
+    track (which finds trims and cuts); after that the search stays local, so audio that
+    shares nothing sample-exact with the previous run (e.g. re-encoded to a lossy format)
+    costs a few whole-track searches, not one per window. The grid then snaps to the found
+    positions: trimmed or cut audio gets windows over exactly the old content (reusable),
+    and new content gets windows `step` apart as usual.
+
+    Parameters:
+        audio (AudioSegment, mandatory): New audio.
+        previous (list[dict], mandatory): Stored windows of the previous run.
+        window (int, mandatory): Window length in samples.
+        step (int, mandatory): Window step in samples.
+
+    Returns:
+        list[int]: Window start positions (samples).
+    """
+    n = int(audio.frame_count())
+    samples = np.array(audio.get_array_of_samples())[::audio.channels]
+    found, offset, misses = [], 0, 0
+    for w in previous:
+        probe = np.asarray(w["probe"], dtype=samples.dtype)
+        if len(np.unique(probe)) < 4:
+            continue  # silence / near-constant: would match almost anywhere
+        expected = w["start"] + offset
+        cand = _find_probe(samples, probe, max(0, expected - step), expected + step + 1)
+        if not cand.size and misses < MAX_MISSES:
+            cand = _find_probe(samples, probe)
+        for pos in cand[np.argsort(np.abs(cand - expected))][:8]:
+            pos = int(pos)
+            if pos + window <= n and window_hash(audio.get_sample_slice(pos, pos + window)) == w["hash"]:
+                found.append(pos)
+                offset = pos - w["start"]
+                break
+        else:
+            misses += 1
+            continue
+        misses = 0
+
+    anchors = np.unique(found)
+    starts, t = [], 0
+    while t + window <= n:
+        i = np.searchsorted(anchors, t)
+        if i < len(anchors) and anchors[i] - t < step:
+            t = int(anchors[i])  # snap onto old content
+        starts.append(t)
+        t += step
+    return starts
+
+
+def segment_audio(audio, feature_cols, segment_duration_ms=3000, step_size=1500, store_path=None):
     """ 
     Segment audio into smaller chunks and extract features.
+
+    With store_path, every window's openSMILE features are kept in that file keyed by a hash
+    of the window's samples. When the file already holds a previous run (e.g. the recording
+    before it was trimmed or re-uploaded with a small edit), the windows are aligned with the
+    old ones (align_windows) and only windows whose content changed are extracted again.
+    Reuse needs sample-exact audio: edits made on the decoded samples or a lossless file
+    (WAV / FLAC). A lossy re-encode (MP3, AAC) changes every sample, so nothing is reused.
     
     Parameters:
         audio (AudioSegment, mandatory): AudioSegment object to process.
         segment_duration_ms (int, optional): Duration of each segment in milliseconds.
         step_size (int, optional): Overlap amount in milliseconds.
         feature_cols (list[str], mandatory): List of feature columns to extract.
+        store_path (str, optional): Window feature store (JSON) to reuse and update.
     
     Returns:
         list[dict]: List of dictionaries with the extracted features.
@@ -29,16 +189,37 @@ def segment_audio(audio, feature_cols, segment_duration_ms=3000, step_size=1500)
     file_id = "segmented_audio"
     # audio is already an AudioSegment object, no need to load it again
 
+    # Windows in samples, so an aligned grid can start anywhere
+    rate = audio.frame_rate
+    window = segment_duration_ms * rate // 1000
+    step = step_size * rate // 1000
+    previous = load_window_store(store_path, audio, window, step)
+    if previous:
+        starts = align_windows(audio, previous, window, step)
+    else:
+        starts = [i * rate // 1000 for i in range(0, len(audio) - segment_duration_ms + 1, step_size)]
+    known = {w["hash"]: w["features"] for w in previous}
+    windows, reused = [], 0
+
     # Segment audio
-    for i in range(0, len(audio) - segment_duration_ms + 1, step_size):
-        segment = audio[i:i + segment_duration_ms]
-        segment_path = f"/tmp/{file_id}_segment_{i}.wav"
-        segment.export(segment_path, format="wav")
+    for start in starts:
+        segment = audio.get_sample_slice(start, start + window)
+        i = start * 1000 // rate
+        digest = window_hash(segment)
+        features = known.get(digest)
+        if features is not None:
+            reused += 1
+        else:
+            segment_path = f"/tmp/{file_id}_segment_{i}.wav"
+            segment.export(segment_path, format="wav")
 
-        # Extract features
-        features_df = smile.process_file(segment_path).reset_index(drop=True).round(3)
-        features = features_df.to_dict("records")[0]
-        os.remove(segment_path)
+            # Extract features
+            features_df = smile.process_file(segment_path).reset_index(drop=True).round(3)
+            features = features_df.to_dict("records")[0]
+            os.remove(segment_path)
+        if store_path:
+            probe = np.array(segment.get_array_of_samples()[:PROBE_SAMPLES * audio.channels])[::audio.channels]
+            windows.append({"start": start, "hash": digest, "probe": probe.tolist(), "features": features})
 
         # Timestamp
         start_sec = i // 1000
@@ -51,6 +232,10 @@ def segment_audio(audio, feature_cols, segment_duration_ms=3000, step_size=1500)
             feature_row[col] = features.get(col)
 
         segments.append(feature_row)
+
+    if store_path:
+        save_window_store(store_path, audio, window, step, windows)
+        print(f"[info] Audio windows: {reused} of {len(starts)} reused, {len(starts) - reused} extracted")
     
     return segments
 
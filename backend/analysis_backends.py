@@ -0,0 +1,95 @@
+"""
+Lazy plugin layer for the heavy analysis backends (Whisper, openSMILE, Py-Feat, MediaPipe)
+and the presentation_analyzer post-processing stages (AU flags, body metrics).
+
+None of the backend modules are imported when this file is imported, so the API
+process starts without paying for torch / whisper / opensmile / feat / mediapipe.
+A backend is resolved the first time it is used, either:
+
+- in this process  -> get_backend(name)(...)
+- in a dedicated, long-lived worker process -> await run_backend(name, ...)
+
+The worker-process route keeps the ML imports (and their memory) out of the API
+process entirely; each backend gets its own single-worker pool so its models stay
+warm between calls.
+"""
+
+import asyncio
+import importlib
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict
+
+HERE = Path(__file__).resolve().parent
+REPO_ROOT = HERE.parent
+AUDIO_UTILS = REPO_ROOT / "Audio_Stream" / "utils"
+ANALYZER_UTILS = REPO_ROOT / "presentation_analyzer" / "utils"
+
+# name -> where the callable lives. Modules in this repo are flat scripts, so each
+# entry also names the directory that has to be on sys.path to import it.
+BACKENDS: Dict[str, Dict[str, object]] = {
+    "whisper":        {"path": HERE,           "module": "whisper_functions",  "attr": "transcribe_audio"},
+    "whisper_record": {"path": HERE,           "module": "whisper_testing",    "attr": "transcribe_audio"},
+    "opensmile":      {"path": AUDIO_UTILS,    "module": "processing",         "attr": "segment_audio"},
+    "pyfeat":         {"path": ANALYZER_UTILS, "module": "pyfeat_runner",      "attr": "run_pyfeat_on_frames"},
+    "mediapipe":      {"path": ANALYZER_UTILS, "module": "landmark_detection", "attr": "detect_landmarks"},
+    # Py-Feat rows (DataFrame / results path) -> segments dict; body metrics added to that dict
+    "au_flags":       {"path": ANALYZER_UTILS, "module": "au_flags",           "attr": "analyze"},
+    "body_metrics":   {"path": ANALYZER_UTILS, "module": "body_metrics",       "attr": "add_body_metrics"},
+}
+
+_loaded: Dict[str, Callable] = {}
+_pools: Dict[str, ProcessPoolExecutor] = {}
+
+
+def get_backend(name: str) -> Callable:
+    """Import the backend module on first use and return its entry-point callable."""
+    fn = _loaded.get(name)
+    if fn is not None:
+        return fn
+    try:
+        spec = BACKENDS[name]
+    except KeyError:
+        raise KeyError(f"Unknown analysis backend '{name}'. Known: {sorted(BACKENDS)}") from None
+
+    path = str(spec["path"])
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    module = importlib.import_module(str(spec["module"]))
+    fn = getattr(module, str(spec["attr"]))
+    _loaded[name] = fn
+    return fn
+
+
+def is_loaded(name: str) -> bool:
+    """True once the backend has been imported in *this* process."""
+    return name in _loaded
+
+
+def _call_backend(name: str, args: tuple, kwargs: dict):
+    # Runs inside the worker process; the import happens there, once per worker.
+    return get_backend(name)(*args, **kwargs)
+
+
+def _pool_for(name: str) -> ProcessPoolExecutor:
+    pool = _pools.get(name)
+    if pool is None:
+        if name not in BACKENDS:
+            raise KeyError(f"Unknown analysis backend '{name}'. Known: {sorted(BACKENDS)}")
+        pool = ProcessPoolExecutor(max_workers=1)
+        _pools[name] = pool
+    return pool
+
+
+async def run_backend(name: str, *args, **kwargs):
+    """Run a backend call in its dedicated worker process without blocking the event loop."""
+    fut = _pool_for(name).submit(_call_backend, name, args, kwargs)
+    return await asyncio.wrap_future(fut)
+
+
+def shutdown_workers(wait: bool = True) -> None:
+    """Stop every backend worker process that has been started."""
+    for pool in _pools.values():
+        pool.shutdown(wait=wait)
+    _pools.clear()
@@ -1,10 +1,17 @@
 # in your FastAPI code (e.g. main.py)
+import os
+import sys
+from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import FastAPI, File, UploadFile
 
-from whisper_testing import transcribe_audio
+# Heavy ML backends (whisper/torch, opensmile, py-feat, mediapipe) are imported
+# lazily in worker processes, never at API import time.
+from analysis_backends import run_backend, shutdown_workers
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "final_report_generation"))
 
 app = FastAPI()
 
@@ -21,6 +28,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def stop_backend_workers():
+    shutdown_workers(wait=False)
+    if _report_client is not None:
+        await _report_client.close()
+
 @app.get("/")
 async def root():
     return JSONResponse({"message": "Hi Divas!"})
@@ -39,7 +52,7 @@ async def echo(text: str) -> JSONResponse:
 
 @app.get("/transcribe_macbeth")
 async def transcribe() -> str:
-    transcription = transcribe_audio("MacBeth_Voiceover.mp3")
+    transcription = await run_backend("whisper_record", "MacBeth_Voiceover.mp3")
     return transcription
 
 @app.post("/upload")
@@ -47,3 +60,30 @@ async def upload_file(file: UploadFile = File(...)):
     contents = await file.read()
     # Process the file here
     return {"filename": file.filename, "size": len(contents)}
+
+_report_client = None
+
+def get_report_client():
+    # One client for the whole app, so its concurrency limit and cache are shared by all requests.
+    global _report_client
+    if _report_client is None:
+        from report_client import DEFAULT_MODEL, ReportClient
+        # REPORT_LLM_BASE_URL points the API at an OpenAI-compatible server (e.g. stub_llm_server.py)
+        _report_client = ReportClient(model=os.environ.get("REPORT_LLM_MODEL", DEFAULT_MODEL),
+                                      base_url=os.environ.get("REPORT_LLM_BASE_URL"))
+    return _report_client
+
+@app.post("/report/preliminary")
+async def preliminary(timeline: list[dict]) -> JSONResponse:
+    # Instant, deterministic summary served while the LLM report is still being generated.
+    from preliminary_report import preliminary_report
+
+    return JSONResponse(preliminary_report(timeline))
+
+@app.post("/report")
+async def report(timeline: list[dict]):
+    # Stream the coaching report as it is generated so the first text shows up right away.
+    # Long talks are split into sections and evaluated map-reduce style (see map_reduce.py).
+    from LLM_prompting import report_stream
+
+    return StreamingResponse(report_stream(timeline, get_report_client()), media_type="text/plain")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tokens saved by compacting the merged timeline before it goes into the LLM prompt.
+
+Compares, per session:
+  raw      json.dump(..., indent=2) as written to merged.json (what LLM_prompting used to send)
+  minified json.dumps with no whitespace
+  table    compact_timeline without a budget (null-dropping, runs, tabular encoding)
+  budget   compact_timeline with --budget (precision/coarsening degradation)
+
+    python backend/benchmarks/bench_compaction.py
+    python backend/benchmarks/bench_compaction.py --merged merged.json --budget 3000
+"""
+
+import argparse, json, time
+
+from sample_sessions import make_timeline
+from compaction import count_tokens, compact_timeline, tokenizer_name
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark timeline compaction token savings")
+    ap.add_argument("--merged", nargs="*", default=[], help="merged.json files to measure (default: synthetic)")
+    ap.add_argument("--minutes", type=float, nargs="*", default=[5, 15, 45], help="Synthetic session lengths")
+    ap.add_argument("--budget", type=int, default=4000)
+    args = ap.parse_args()
+
+    sessions = []
+    for path in args.merged:
+        with open(path, "r", encoding="utf-8") as f:
+            sessions.append((path, json.load(f)))
+    if not args.merged:
+        sessions = [(f"synthetic {m:g} min", make_timeline(m, seed=i)) for i, m in enumerate(args.minutes)]
+
+    print(f"[info] Tokenizer: {tokenizer_name()}")
+    print(f"{'session':<22}{'raw':>9}{'minified':>10}{'table':>9}{'budget':>9}{'saved':>8}{'rows':>7}{'lvl':>5}{'ms':>8}")
+    for name, timeline in sessions:
+        raw = count_tokens(json.dumps(timeline, indent=2))
+        mini = count_tokens(json.dumps(timeline, separators=(",", ":")))
+        table, _ = compact_timeline(timeline, token_budget=None)
+        t0 = time.perf_counter()
+        _, stats = compact_timeline(timeline, token_budget=args.budget)
+        ms = (time.perf_counter() - t0) * 1000
+        saved = 100.0 * (1 - stats["tokens"] / raw) if raw else 0.0
+        print(f"{name:<22}{raw:>9}{mini:>10}{count_tokens(table):>9}{stats['tokens']:>9}"
+              f"{saved:>7.1f}%{stats['rows']:>7}{stats['coarsen_level']:>5}{ms:>8.1f}"
+              + ("  (over budget)" if stats["over_budget"] else ""))
+
+
+if __name__ == "__main__":
+    main()
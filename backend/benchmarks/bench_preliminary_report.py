@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Latency of the local preliminary report (preliminary_report.py) per session.
+
+    python backend/benchmarks/bench_preliminary_report.py --minutes 5 15 45 90
+"""
+
+import argparse, statistics, time
+
+from sample_sessions import make_timeline
+from preliminary_report import preliminary_report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the preliminary report engine")
+    ap.add_argument("--minutes", type=float, nargs="*", default=[5, 15, 45, 90])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'session':<10}{'rows':>7}{'p50 ms':>10}{'max ms':>10}")
+    for m in args.minutes:
+        timeline = make_timeline(m)
+        preliminary_report(timeline)  # warm-up
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            preliminary_report(timeline)
+            times.append((time.perf_counter() - t0) * 1000)
+        print(f"{m:>6g} min{len(timeline):>7}{statistics.median(times):>10.2f}{max(times):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
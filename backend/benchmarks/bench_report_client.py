@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Offline throughput / latency benchmark for the async report client.
+
+Starts stub_llm_server.py on a free local port, fires --requests report generations with
+--concurrency client-side slots, and reports time-to-first-token, full latency and throughput.
+A second pass over the same payloads measures the response cache.
+
+    python backend/benchmarks/bench_report_client.py --requests 32 --concurrency 8
+    python backend/benchmarks/bench_report_client.py --fail_rate 0.2   # exercise retries
+"""
+
+import argparse, asyncio, os, socket, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from sample_sessions import make_timeline
+from compaction import compact_timeline
+from LLM_prompting import prompt
+from report_client import ReportClient
+
+REPORT_DIR = Path(__file__).resolve().parent.parent / "final_report_generation"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    env = dict(os.environ, STUB_LLM_TTFT_MS=str(args.ttft_ms), STUB_LLM_TOKEN_MS=str(args.token_ms),
+               STUB_LLM_TOKENS=str(args.tokens), STUB_LLM_FAIL_RATE=str(args.fail_rate))
+    proc = subprocess.Popen([sys.executable, "stub_llm_server.py", "--port", str(port)], cwd=REPORT_DIR, env=env)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("stub server did not start")
+
+
+async def one(client: ReportClient, payload: str):
+    t0 = time.perf_counter()
+    ttft, n = None, 0
+    async for piece in client.stream(prompt, payload):
+        if ttft is None:
+            ttft = time.perf_counter() - t0
+        n += len(piece)
+    return ttft, time.perf_counter() - t0, n
+
+
+async def run_pass(client: ReportClient, payloads):
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*[one(client, p) for p in payloads])
+    return results, time.perf_counter() - t0
+
+
+def report(name: str, results, wall: float):
+    ttfts = sorted(r[0] for r in results)
+    lats = sorted(r[1] for r in results)
+    p95 = lambda xs: xs[min(len(xs) - 1, int(0.95 * len(xs)))]
+    chars = sum(r[2] for r in results)
+    print(f"{name:<8} n={len(results):<4} ttft p50={statistics.median(ttfts)*1000:8.1f} ms "
+          f"p95={p95(ttfts)*1000:8.1f} ms | latency p50={statistics.median(lats)*1000:8.1f} ms "
+          f"p95={p95(lats)*1000:8.1f} ms | {len(results)/wall:7.2f} req/s {chars/wall:10.0f} chars/s")
+
+
+async def amain(args, port: int):
+    payloads = [compact_timeline(make_timeline(args.minutes, seed=i), token_budget=None)[0]
+                for i in range(args.requests)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = ReportClient(model="stub", base_url=f"http://127.0.0.1:{port}",
+                              max_concurrency=args.concurrency, backoff_base=0.05, cache_dir=cache_dir)
+        try:
+            report("cold", *await run_pass(client, payloads))
+            report("cached", *await run_pass(client, payloads))
+        finally:
+            await client.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the async report client against the local stub")
+    ap.add_argument("--requests", type=int, default=16)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--minutes", type=float, default=3.0, help="Synthetic session length per request")
+    ap.add_argument("--ttft_ms", type=float, default=200)
+    ap.add_argument("--token_ms", type=float, default=5)
+    ap.add_argument("--tokens", type=int, default=200)
+    ap.add_argument("--fail_rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    port = free_port()
+    stub = start_stub(port, args)
+    try:
+        asyncio.run(amain(args, port))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the API process.
+
+Imports a module (default: the FastAPI `app`) in a fresh interpreter several
+times and reports the wall-clock import cost, plus the heaviest imports as
+measured by `python -X importtime`. Use --max_ms to make it fail (exit 1) when
+startup regresses past a budget, e.g. after someone adds a top-level torch import.
+
+    python backend/benchmarks/bench_startup.py
+    python backend/benchmarks/bench_startup.py --module whisper_testing --runs 3
+"""
+
+import argparse, statistics, subprocess, sys, time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def time_import(module: str, cwd: Path) -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=cwd,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    dt = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()}")
+    return dt
+
+
+def top_imports(module: str, cwd: Path, n: int, depth: int = 1):
+    """Return [(cumulative_us, module_name)] for the n most expensive imports up to `depth` levels deep."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level > depth:  # deeper imports are already counted in their parent
+            continue
+        rows.append((int(parts[1]), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:n]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure cold import time of the API process")
+    ap.add_argument("--module", default="app", help="Module to import (from the backend dir)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="Show the N heaviest imports")
+    ap.add_argument("--depth", type=int, default=1, help="Import nesting depth to report")
+    ap.add_argument("--max_ms", type=float, default=None, help="Fail if the median exceeds this")
+    args = ap.parse_args()
+
+    time_import(args.module, BACKEND_DIR)  # warm the OS file cache / .pyc files
+    times = [time_import(args.module, BACKEND_DIR) for _ in range(args.runs)]
+    med = statistics.median(times) * 1000
+
+    print(f"[info] import {args.module}: median={med:.1f} ms "
+          f"min={min(times)*1000:.1f} ms max={max(times)*1000:.1f} ms (runs={args.runs})")
+    print("[info] Heaviest imports (cumulative):")
+    for us, name in top_imports(args.module, BACKEND_DIR, args.top, args.depth):
+        print(f"  {us/1000:>9.1f} ms  {name}")
+
+    if args.max_ms is not None and med > args.max_ms:
+        print(f"[error] Startup {med:.1f} ms exceeds budget {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
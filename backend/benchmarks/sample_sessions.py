@@ -0,0 +1,73 @@
+"""
+Synthetic presentation sessions for the report-generation benchmarks.
+
+Streams mimic the real formats: openSMILE audio windows ("00:03 - 00:06", 3 s / 1.5 s),
+au_flags video segments ("0:02-0:07", 5 s / 2 s) and Whisper segments ("0.00 - 5.23").
+Labels are sticky (they change every few windows) like real recordings.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "final_report_generation"))
+
+from temporal_join import fmt_range, fuse_streams  # noqa: E402
+
+CONFIDENCE = ["Low Confidence (Tense)", "High Confidence (Expressive)", "Very Low Confidence (Flat, Pause)",
+              "Moderate Confidence", "High Confidence (Calm)"]
+EMOTION = ["Tense (low confidence)", "Neutral", "Nervous", "Energetic and Assertive", "Enthusiastic",
+           "Expressive and Engaged"]
+FACE_EMOTIONS = ["happiness", "neutral", "surprise", "sadness"]
+CLUSTERS = ["authentic_smile", "eyebrow_engagement", "focused_thinking", "tension"]
+WORDS = ("so today I want to talk about matcha and why our team believes it is the best drink for "
+         "students who need focus during long study sessions um we looked at caffeine content price and "
+         "taste and the results were pretty clear").split()
+
+
+def _mmss(sec: int) -> str:
+    return f"{sec // 60:02d}:{sec % 60:02d}"
+
+
+def _sticky(rng, choices, prev, p_keep=0.75):
+    return prev if prev is not None and rng.random() < p_keep else rng.choice(choices)
+
+
+def make_streams(minutes: float, seed: int = 0):
+    """Return (audio, video, text) record lists for a session of the given length."""
+    rng = random.Random(seed)
+    dur = minutes * 60.0
+
+    audio, conf, emo = [], None, None
+    t = 0.0
+    while t + 3.0 <= dur:
+        conf, emo = _sticky(rng, CONFIDENCE, conf), _sticky(rng, EMOTION, emo)
+        audio.append({"timestamp": f"{_mmss(int(t))} - {_mmss(int(t + 3.0))}", "confidence": conf, "emotion": emo})
+        t += 1.5
+
+    video, face = [], None
+    t = 0.0
+    while t <= dur:
+        face = _sticky(rng, FACE_EMOTIONS, face)
+        seg = {"timestamp": fmt_range(t, t + 5.0), "emotions": {face: round(rng.uniform(0.4, 0.9), 2)}}
+        active = {c: round(rng.uniform(0.4, 1.0), 2) for c in CLUSTERS if rng.random() < 0.3}
+        if active:
+            seg["clusters"] = active
+        video.append(seg)
+        t += 2.0
+
+    text = []
+    t = 0.0
+    while t < dur:
+        seg_len = rng.uniform(2.0, 7.0)
+        n_words = int(seg_len * rng.uniform(1.8, 2.8))
+        words = " ".join(rng.choice(WORDS) for _ in range(n_words))
+        text.append({"timestamp": f"{t:.2f} - {min(t + seg_len, dur):.2f}", "transcription": words.capitalize() + "."})
+        t += seg_len + rng.uniform(0.0, 0.8)
+
+    return audio, video, text
+
+
+def make_timeline(minutes: float, seed: int = 0, win_sec: float = 5.0):
+    """Fused timeline as produced by concatenate_streams."""
+    return fuse_streams(make_streams(minutes, seed), win_sec=win_sec)
@@ -1,5 +1,15 @@
 import os
-from huggingface_hub import InferenceClient
+import sys
+import json
+import asyncio
+import argparse
+
+from compaction import DEFAULT_TOKEN_BUDGET, compact_timeline
+from map_reduce import DEFAULT_SECTION_SEC, map_reduce_stream
+from preliminary_report import preliminary_report
+from report_client import DEFAULT_MODEL, ReportClient
+
+TOKEN_BUDGET = int(os.environ.get("REPORT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
 
 prompt = (
     "Act as a communication coach and generate an evaluation report on how this user’s "
@@ -13,25 +23,82 @@ prompt = (
     "speech. Show this as a structured, balanced, and actionable framework that highlights strengths, "
     "areas for improvement, and specific next steps. Assume there will be transcription errors in the "
     "text so not all the words will be accurate, but they should sound similar to something correct "
-    "phonetically. Here is the user’s recorded speech as a JSON:"
+    "phonetically. Here is the user’s recorded speech as a table: the first row names the columns, "
+    "each following row is one time range, and cells are separated by '|':\n"
 )
 
-with open("merged.json", "r", encoding="utf-8") as f:
-    json_string = f.read()
 
-client = InferenceClient(
-    provider="auto",
-    api_key=os.environ["HF_TOKEN"],
-)
+def build_payload(timeline, token_budget=TOKEN_BUDGET):
+    """Compact the merged timeline into the table that follows the prompt."""
+    table, stats = compact_timeline(timeline, token_budget=token_budget)
+    print(f"[info] Timeline compacted: {stats['raw_tokens']} -> {stats['tokens']} tokens "
+          f"({stats['rows']} rows, coarsen level {stats['coarsen_level']})", file=sys.stderr)
+    return table, stats
+
+
+async def report_stream(timeline, client, mode="auto", section_sec=DEFAULT_SECTION_SEC):
+    """
+    Yield the coaching report piece by piece.
+
+    mode="single" sends the whole compacted timeline in one call; mode="map_reduce" evaluates sections
+    in parallel and merges them (see map_reduce.py); mode="auto" switches to map-reduce when the
+    compacted timeline does not fit TOKEN_BUDGET.
+    """
+    if mode != "map_reduce":
+        table, stats = build_payload(timeline)
+        if mode == "single" or not stats["over_budget"]:
+            async for piece in client.stream(prompt, table):
+                yield piece
+            return
+    async for piece in map_reduce_stream(timeline, client, section_sec=section_sec):
+        yield piece
+
+
+async def stream_report(timeline, client=None, out=sys.stdout, mode="auto", section_sec=DEFAULT_SECTION_SEC):
+    """Stream the coaching report to `out` as it is generated and return the full text."""
+    own_client = client is None
+    client = client or ReportClient()
+    parts = []
+    try:
+        async for piece in report_stream(timeline, client, mode=mode, section_sec=section_sec):
+            out.write(piece)
+            out.flush()
+            parts.append(piece)
+    finally:
+        if own_client:
+            await client.close()
+    out.write("\n")
+    return "".join(parts)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate the coaching report for a merged timeline")
+    ap.add_argument("--merged", default="merged.json", help="Merged timeline JSON (see contatenation.py)")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--base_url", default=None,
+                    help="OpenAI-compatible endpoint instead of the HF router (e.g. stub_llm_server.py)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--max_retries", type=int, default=4)
+    ap.add_argument("--no_cache", action="store_true", help="Do not read or write the response cache")
+    ap.add_argument("--mode", choices=["auto", "single", "map_reduce"], default="auto",
+                    help="map_reduce evaluates sections in parallel; auto uses it when the timeline is over budget")
+    ap.add_argument("--section_sec", type=float, default=DEFAULT_SECTION_SEC, help="Target section length")
+    args = ap.parse_args()
+
+    with open(args.merged, "r", encoding="utf-8") as f:
+        timeline = json.load(f)
+
+    # Instant local summary first; the LLM report streams in after it.
+    for line in preliminary_report(timeline)["highlights"]:
+        print(f"[preliminary] {line}", file=sys.stderr)
+
+    client_kwargs = {"model": args.model, "base_url": args.base_url, "timeout": args.timeout,
+                     "max_retries": args.max_retries}
+    if args.no_cache:
+        client_kwargs["cache_dir"] = None
+    asyncio.run(stream_report(timeline, client=ReportClient(**client_kwargs), mode=args.mode,
+                              section_sec=args.section_sec))
 
-completion = client.chat.completions.create(
-    model="deepseek-ai/DeepSeek-R1-0528-Qwen3-8B",
-    messages=[
-        {
-            "role": "user",
-            "content": prompt + json_string
-        }
-    ],
-)
 
-print(completion.choices[0].message)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
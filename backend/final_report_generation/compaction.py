@@ -0,0 +1,220 @@
+import json
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from temporal_join import TEXT_FIELDS, TIME_FIELDS, _is_number, fmt_range, record_interval
+
+# Optional exact tokenizer; otherwise (or if its BPE file cannot be loaded offline) fall back
+# to a word/punctuation/line-break split, which tracks BPE token counts closely enough to
+# enforce a budget.
+try:
+    import tiktoken
+    HAVE_TIKTOKEN = True
+except ImportError:
+    HAVE_TIKTOKEN = False
+
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_TOKEN_BUDGET = 6000
+DEFAULT_MAX_COARSEN_LEVEL = 3  # windows grow at most 2**3 = 8x before we give up on one prompt
+SEP = "|"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\n\s*")
+_encoders: Dict[str, Any] = {}
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """
+    Count tokens locally (tiktoken if installed, otherwise an approximate word/punctuation count).
+    """
+    if HAVE_TIKTOKEN:
+        if encoding not in _encoders:
+            try:
+                _encoders[encoding] = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                print(f"[warn] tiktoken encoding '{encoding}' unavailable ({e.__class__.__name__}); "
+                      f"using approximate token counts.", file=sys.stderr)
+                _encoders[encoding] = None
+        enc = _encoders[encoding]
+        if enc is not None:
+            return len(enc.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+
+def tokenizer_name(encoding: str = DEFAULT_ENCODING) -> str:
+    count_tokens("", encoding)
+    return f"tiktoken/{encoding}" if _encoders.get(encoding) is not None else "approximate (word/punct)"
+
+
+def _is_empty(v: Any) -> bool:
+    return v is None or v == "" or (isinstance(v, (dict, list)) and not v)
+
+
+def _clean(entry: Dict[str, Any]) -> Tuple[float, float, Dict[str, Any]]:
+    """Split a timeline entry into (start, end, fields) with null/empty fields dropped."""
+    start, end = record_interval(entry)
+    fields = {}
+    for k, v in entry.items():
+        if k in TIME_FIELDS or _is_empty(v):
+            continue
+        if isinstance(v, dict):
+            v = {kk: vv for kk, vv in v.items() if not _is_empty(vv)}
+            if not v:
+                continue
+        fields[k] = v
+    return start, end, fields
+
+
+def _labels(fields: Dict[str, Any], ndigits: int) -> Tuple:
+    """Hashable view of the non-text fields at the precision that will be printed."""
+    out = []
+    for k in sorted(fields):
+        if k in TEXT_FIELDS:
+            continue
+        v = fields[k]
+        if isinstance(v, dict):
+            v = tuple(sorted((kk, round(vv, ndigits) if _is_number(vv) else vv) for kk, vv in v.items()))
+        elif _is_number(v):
+            v = round(v, ndigits)
+        out.append((k, v))
+    return tuple(out)
+
+
+def _merge_fields(a: Dict[str, Any], wa: float, b: Dict[str, Any], wb: float) -> Dict[str, Any]:
+    """Duration-weighted merge of two adjacent rows."""
+    out = {}
+    wt = (wa + wb) or 1.0
+    for k in list(a) + [k for k in b if k not in a]:
+        va, vb = a.get(k), b.get(k)
+        if va is None or vb is None:
+            out[k] = va if vb is None else vb
+        elif k in TEXT_FIELDS:
+            out[k] = f"{va} {vb}"
+        elif _is_number(va) and _is_number(vb):
+            out[k] = (va * wa + vb * wb) / wt
+        elif isinstance(va, dict) and isinstance(vb, dict):
+            keys = list(va) + [kk for kk in vb if kk not in va]
+            out[k] = {kk: (va.get(kk, 0.0) * wa + vb.get(kk, 0.0) * wb) / wt for kk in keys}
+        else:
+            out[k] = va if wa >= wb else vb
+    return out
+
+
+def merge_runs(rows: List[Tuple[float, float, Dict[str, Any]]], ndigits: int = 2):
+    """Merge consecutive rows whose labels (everything except free text) are identical."""
+    runs = []
+    for start, end, fields in rows:
+        if runs and _labels(runs[-1][2], ndigits) == _labels(fields, ndigits):
+            s0, _, prev = runs[-1]
+            merged = dict(prev)
+            for k in TEXT_FIELDS:
+                if k in fields:
+                    merged[k] = f"{prev[k]} {fields[k]}" if k in prev else fields[k]
+            runs[-1] = (s0, end, merged)
+        else:
+            runs.append((start, end, fields))
+    return runs
+
+
+def coarsen(rows: List[Tuple[float, float, Dict[str, Any]]]):
+    """Halve the number of rows by merging neighbours pairwise (doubles the window length)."""
+    out = []
+    for i in range(0, len(rows), 2):
+        if i + 1 == len(rows):
+            out.append(rows[i])
+            continue
+        (s0, e0, a), (s1, e1, b) = rows[i], rows[i + 1]
+        out.append((s0, e1, _merge_fields(a, e0 - s0, b, e1 - s1)))
+    return out
+
+
+def _fmt_value(v: Any, ndigits: int) -> str:
+    if _is_number(v):
+        return f"{round(v, ndigits):g}"
+    if isinstance(v, dict):
+        items = sorted(v.items(), key=lambda kv: -kv[1] if _is_number(kv[1]) else 0)
+        return " ".join(f"{kk}:{_fmt_value(vv, ndigits)}" for kk, vv in items)
+    return str(v).replace(SEP, "/").replace("\n", " ")
+
+
+def encode_table(rows: List[Tuple[float, float, Dict[str, Any]]], ndigits: int = 2) -> str:
+    """
+    Tabular encoding: one header row naming the columns, then one value row per time range.
+    Columns appear in first-seen order with free text last; empty cells stay empty.
+    """
+    cols: List[str] = []
+    for _, _, fields in rows:
+        for k in fields:
+            if k not in cols:
+                cols.append(k)
+    cols = [c for c in cols if c not in TEXT_FIELDS] + [c for c in cols if c in TEXT_FIELDS]
+
+    lines = [SEP.join(["time"] + cols)]
+    for start, end, fields in rows:
+        cells = [fmt_range(start, end)] + [_fmt_value(fields[c], ndigits) if c in fields else "" for c in cols]
+        lines.append(SEP.join(cells))
+    return "\n".join(lines)
+
+
+def compact_timeline(timeline: List[Dict[str, Any]], token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+                     ndigits: int = 2, encoding: str = DEFAULT_ENCODING,
+                     max_coarsen_level: Optional[int] = DEFAULT_MAX_COARSEN_LEVEL) -> Tuple[str, Dict[str, Any]]:
+    """
+    Compact a merged timeline (see contatenation.concatenate_streams) into a token-budgeted table for the LLM.
+
+    Steps: drop null/empty fields, merge consecutive segments with identical labels into runs, encode as a
+    header row plus value rows. If the result is still over `token_budget`, degrade gracefully instead of
+    truncating: first lower numeric precision to 1 digit, then repeatedly coarsen the windows (merge
+    neighbouring rows pairwise, duration-weighted) until the table fits. Transcript text is never cut; if
+    the table still does not fit after `max_coarsen_level` halvings (e.g. the transcript alone exceeds the
+    budget), it is returned as small as those steps make it, flagged over budget (split the session into
+    sections instead, see map_reduce.py).
+
+    Parameters
+    ----------
+    timeline : list[dict]
+        Merged timeline entries with a "timestamp" (or numeric "start"/"end").
+    token_budget : int, optional
+        Maximum tokens for the table; None disables the budget.
+    ndigits : int
+        Decimal places kept for numeric values before any degradation.
+    encoding : str
+        tiktoken encoding name used when tiktoken is installed.
+    max_coarsen_level : int, optional
+        Maximum number of pairwise coarsening passes; None means no limit.
+
+    Returns
+    ----------
+    tuple[str, dict]
+        The table, and stats: raw_tokens (indent=2 JSON), tokens, rows, coarsen_level, ndigits, over_budget.
+        over_budget is True when the table could not be brought under the budget within these limits.
+    """
+    rows = sorted((_clean(e) for e in timeline), key=lambda r: r[0])
+    rows = [r for r in rows if r[2]]
+    rows = merge_runs(rows, ndigits)
+    level = 0
+
+    table = encode_table(rows, ndigits)
+    tokens = count_tokens(table, encoding)
+    while token_budget is not None and tokens > token_budget:
+        if ndigits > 1:
+            ndigits = 1
+            rows = merge_runs(rows, ndigits)
+        elif len(rows) > 1 and (max_coarsen_level is None or level < max_coarsen_level):
+            rows = merge_runs(coarsen(rows), ndigits)
+            level += 1
+        else:
+            break
+        table = encode_table(rows, ndigits)
+        tokens = count_tokens(table, encoding)
+
+    stats = {
+        "raw_tokens": count_tokens(json.dumps(timeline, indent=2), encoding),
+        "tokens": tokens,
+        "rows": len(rows),
+        "coarsen_level": level,
+        "ndigits": ndigits,
+        "token_budget": token_budget,
+        "over_budget": token_budget is not None and tokens > token_budget,
+    }
+    return table, stats
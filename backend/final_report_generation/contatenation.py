@@ -1,53 +1,49 @@
 import json
+from typing import Any, Dict, List, Optional
 
-def concatenate_streams(audio: str, video: str, text: str):
+from temporal_join import fuse_streams
+
+def concatenate_streams(audio: Any, video: Any, text: Any, out_path: Optional[str] = "merged.json",
+                        win_sec: float = 5.0, hop_sec: Optional[float] = None) -> List[Dict[str, Any]]:
     """
-    Merge three JSON "streams" (files) into a single JSON file by matching records on the "timestamp" key.
+    Merge the three streams into a single timeline by joining their time intervals onto a common grid.
+
+    The streams use different timestamp formats and window grids (audio "00:03 - 00:06" on 3 s / 1.5 s,
+    video "0:02-0:07" on 5 s / 2 s, Whisper "0.00 - 5.23"), so records are matched on overlapping
+    [start, end) intervals rather than on exact "timestamp" strings. See temporal_join.fuse_streams.
 
     Parameters
     ----------
-    audio : str
-        Path to a JSON file containing a list (array) of objects with a "timestamp" field and audio-related keys
+    audio : str | list[dict] | dict | DataFrame
+        Path to a JSON file, or in-memory records, with a "timestamp" field and audio-related keys
         (e.g., "confidence", "emotion", "tone").
-    video : str
-        Path to a JSON file containing a list of objects with a "timestamp" field and video/body-language keys
-        (e.g., "smile_intensity", "eye_contact_ratio").
-    text : str
-        Path to a JSON file containing a list of objects with a "timestamp" field and text/transcript keys
+    video : str | list[dict] | dict | DataFrame
+        Path to a JSON file, or in-memory records, with a "timestamp" field and video/body-language keys
+        (e.g., "smile_intensity", "eye_contact_ratio"). An au_flags output ({"metadata", "segments"}) works as-is.
+    text : str | list[dict] | dict | DataFrame
+        Path to a JSON file, or in-memory records, with a "timestamp" field and text/transcript keys
         (e.g., "transcription").
-    
+    out_path : str, optional
+        Where to write the merged JSON; pass None to skip writing.
+    win_sec, hop_sec : float
+        Output grid (hop defaults to win_sec).
+
     Returns
     ----------
-    None
-        The merged JSON is written to "merged.json". The function does not return the merged data.
+    list[dict]
+        The merged timeline, one entry per output window.
 
     """
-    
-    files = [audio, video, text]
-    # Dictionary to merge by timestamp
-    merged_data = {}
-
-    # Go through each file
-    for f in files:
-        with open(f, "r") as infile:
-            data = json.load(infile)
-            for entry in data:
-                ts = entry["timestamp"]
-                if ts not in merged_data:
-                    merged_data[ts] = {"timestamp": ts}
-                # Merge the rest of the fields into the same timestamp entry
-                for k, v in entry.items():
-                    if k != "timestamp":
-                        merged_data[ts][k] = v
-
-    # Convert merged_data back into a list of dicts (if needed)
-    final_data = list(merged_data.values())
+    final_data = fuse_streams([audio, video, text], win_sec=win_sec, hop_sec=hop_sec)
 
     # Save to output file
-    with open("merged.json", "w") as outfile:
-        json.dump(final_data, outfile, indent=2)
+    if out_path:
+        with open(out_path, "w") as outfile:
+            json.dump(final_data, outfile, indent=2)
+    return final_data
 
-# test the function
-concatenate_streams(audio=r"C:\Users\Jeslyn\Downloads\audio.json",
-                    video=r"C:\Users\Jeslyn\Downloads\body_language.json",
-                    text=r"C:\Users\Jeslyn\Downloads\transcript.json")
\ No newline at end of file
+if __name__ == "__main__":
+    # test the function
+    concatenate_streams(audio=r"C:\Users\Jeslyn\Downloads\audio.json",
+                        video=r"C:\Users\Jeslyn\Downloads\body_language.json",
+                        text=r"C:\Users\Jeslyn\Downloads\transcript.json")
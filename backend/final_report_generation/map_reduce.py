@@ -0,0 +1,131 @@
+import asyncio
+import sys
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from compaction import compact_timeline
+from report_client import ReportClient
+from temporal_join import TEXT_FIELDS, fmt_range, record_interval
+
+DEFAULT_SECTION_SEC = 300.0
+DEFAULT_SECTION_TOKEN_BUDGET = 3000
+
+SECTION_PROMPT = (
+    "Act as a communication coach. The table below is one section of a longer recorded presentation "
+    "in the context of <Matcha presentation>. Evaluate only this section: list strengths, issues and "
+    "concrete moments (with timestamps) for Clarity & Conciseness, Confidence & Presence, Voice & Tone, "
+    "Body Language and Storytelling, and note whether the tone of voice, words and body language fit the "
+    "context and whether the content is correct and sufficient. Use short bullet points, at most 200 words. "
+    "Assume there will be transcription errors in the text so not all the words will be accurate, but they "
+    "should sound similar to something correct phonetically. The first row of the table names the columns, "
+    "each following row is one time range, and cells are separated by '|'.\n"
+)
+
+REDUCE_PROMPT = (
+    "Act as a communication coach and generate an evaluation report on how this user’s transcripted speech, "
+    "audio qualities and body language perform in the context of [context] <Matcha presentation>. The "
+    "presentation was evaluated section by section; those section evaluations follow, in order. Combine them "
+    "into one report for the whole presentation: whether the tone of voice, words and body language fit the "
+    "context, whether the information is correct, whether the content spoken is sufficient given the context, "
+    "and clarity of the message. Provide helpful suggestions where necessary to improve Clarity & Conciseness, "
+    "Confidence & Presence, Voice & Tone, Body Language, and Storytelling, and how vocal quality, body language "
+    "and the spoken transcript can be used together to enhance the speech. Point out patterns that repeat across "
+    "sections and how the speaker changes over the talk. Show this as a structured, balanced, and actionable "
+    "framework that highlights strengths, areas for improvement, and specific next steps. Section evaluations:\n"
+)
+
+
+def _is_boundary(rows: List[Dict[str, Any]], i: int) -> bool:
+    """A row is a good place to end a section if its speech ends a sentence or a pause follows it."""
+    text = next((str(rows[i][k]).strip() for k in TEXT_FIELDS if rows[i].get(k)), "")
+    if text.endswith((".", "?", "!")):
+        return True
+    nxt = rows[i + 1] if i + 1 < len(rows) else None
+    return nxt is not None and not any(nxt.get(k) for k in TEXT_FIELDS)
+
+
+def split_sections(timeline: List[Dict[str, Any]], section_sec: float = DEFAULT_SECTION_SEC,
+                   min_fraction: float = 0.6, max_fraction: float = 1.25) -> List[List[Dict[str, Any]]]:
+    """
+    Split a merged timeline into consecutive sections of roughly `section_sec` seconds.
+
+    Sections end at a topic boundary (end of a sentence, or a pause in speech) once they are at least
+    min_fraction * section_sec long; without one they are cut hard at max_fraction * section_sec.
+    A short leftover at the end is folded into the last section.
+
+    Returns
+    ----------
+    list[list[dict]]
+        The timeline entries of each section, in time order.
+    """
+    rows = sorted(timeline, key=lambda r: record_interval(r)[0])
+    sections: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    last_boundary = None  # index into `current`
+    for j, row in enumerate(rows):
+        current.append(row)
+        start = record_interval(current[0])[0]
+        elapsed = record_interval(row)[1] - start
+        i = len(current) - 1
+        if elapsed >= min_fraction * section_sec and _is_boundary(rows, j):
+            last_boundary = i
+        if elapsed >= section_sec and last_boundary is not None:
+            sections.append(current[:last_boundary + 1])
+            current = current[last_boundary + 1:]
+            last_boundary = None
+        elif elapsed >= max_fraction * section_sec:
+            sections.append(current)
+            current, last_boundary = [], None
+    if current:
+        tail = record_interval(current[-1])[1] - record_interval(current[0])[0]
+        if sections and tail < min_fraction * section_sec:
+            sections[-1].extend(current)  # don't evaluate a few leftover seconds on their own
+        else:
+            sections.append(current)
+    return sections
+
+
+def section_span(section: List[Dict[str, Any]]) -> str:
+    return fmt_range(record_interval(section[0])[0], record_interval(section[-1])[1])
+
+
+def section_payloads(sections: List[List[Dict[str, Any]]],
+                     token_budget: Optional[int] = DEFAULT_SECTION_TOKEN_BUDGET) -> List[str]:
+    """Compacted table for each section, prefixed with its time span."""
+    payloads = []
+    for section in sections:
+        table, _ = compact_timeline(section, token_budget=token_budget)
+        payloads.append(f"Section {section_span(section)}\n{table}")
+    return payloads
+
+
+async def map_sections(sections: List[List[Dict[str, Any]]], client: ReportClient,
+                       token_budget: Optional[int] = DEFAULT_SECTION_TOKEN_BUDGET) -> List[str]:
+    """
+    Evaluate every section in parallel (bounded by the client's concurrency limit).
+
+    Each evaluation is cached by the client under its section payload, so after one section changes
+    only that section is sent to the LLM again.
+    """
+    payloads = section_payloads(sections, token_budget)
+    return await asyncio.gather(*[client.generate(SECTION_PROMPT, p) for p in payloads])
+
+
+def reduce_payload(sections: List[List[Dict[str, Any]]], evaluations: List[str]) -> str:
+    return "\n\n".join(f"## Section {i + 1} ({section_span(s)})\n{ev.strip()}"
+                       for i, (s, ev) in enumerate(zip(sections, evaluations)))
+
+
+async def map_reduce_stream(timeline: List[Dict[str, Any]], client: ReportClient,
+                            section_sec: float = DEFAULT_SECTION_SEC,
+                            token_budget: Optional[int] = DEFAULT_SECTION_TOKEN_BUDGET) -> AsyncIterator[str]:
+    """
+    Map-reduce report generation for long presentations.
+
+    Splits the timeline into sections, evaluates them in parallel, then streams one reduce call that
+    turns the section evaluations into the final structured coaching report.
+    """
+    sections = split_sections(timeline, section_sec=section_sec)
+    print(f"[info] Map-reduce report: {len(sections)} sections of ~{section_sec:.0f}s", file=sys.stderr)
+    evaluations = await map_sections(sections, client, token_budget)
+    async for piece in client.stream(REDUCE_PROMPT, reduce_payload(sections, evaluations)):
+        yield piece
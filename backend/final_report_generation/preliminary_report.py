@@ -0,0 +1,145 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from temporal_join import TEXT_FIELDS, fmt_range, record_interval
+
+TENSION_MIN_RATE = 0.40  # same default as au_flags --cluster_min_rate
+
+
+def _row_weights(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Seconds each row accounts for; overlapping windows only count up to the next row's start."""
+    nxt = np.append(starts[1:], ends[-1]) if len(starts) else starts
+    return np.clip(np.minimum(ends, nxt) - starts, 0.0, None)
+
+
+def _label_shares(labels: List[Optional[str]], w: np.ndarray) -> Dict[str, float]:
+    """Share of labelled time spent in each label, largest first."""
+    present = np.array([lab is not None for lab in labels], dtype=bool)
+    if not present.any():
+        return {}
+    names, inv = np.unique(np.array([lab for lab in labels if lab is not None], dtype=object).astype(str),
+                           return_inverse=True)
+    time_per = np.bincount(inv, weights=w[present], minlength=len(names))
+    total = time_per.sum()
+    if total <= 0:
+        return {}
+    order = np.argsort(-time_per)
+    return {str(names[i]): round(float(time_per[i] / total), 3) for i in order}
+
+
+def _dict_matrix(rows: List[Dict[str, Any]], field: str):
+    """(keys, values[rows x keys], has_field[rows]) for a field holding dicts of numbers."""
+    keys: List[str] = []
+    for r in rows:
+        for k in (r.get(field) or {}):
+            if k not in keys:
+                keys.append(k)
+    mat = np.zeros((len(rows), len(keys)), dtype=float)
+    has = np.zeros(len(rows), dtype=bool)
+    col = {k: j for j, k in enumerate(keys)}
+    for i, r in enumerate(rows):
+        d = r.get(field)
+        if d:
+            has[i] = True
+            for k, v in d.items():
+                mat[i, col[k]] = float(v)
+    return keys, mat, has
+
+
+def _longest_run(mask: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """(seconds, start, end) of the longest stretch of consecutive True rows."""
+    if not mask.any():
+        return 0.0, None, None
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1) - 1
+    secs = ends[run_ends] - starts[run_starts]
+    k = int(np.argmax(secs))
+    return float(secs[k]), float(starts[run_starts[k]]), float(ends[run_ends[k]])
+
+
+def preliminary_report(timeline: List[Dict[str, Any]], tension_min_rate: float = TENSION_MIN_RATE) -> Dict[str, Any]:
+    """
+    Deterministic summary of a fused timeline (see temporal_join.fuse_streams), computed locally in
+    milliseconds so users get feedback before the LLM report arrives.
+
+    Returns
+    ----------
+    dict
+        duration_sec, confidence / voice_emotion / face_emotion shares of time, engagement rates from the
+        au_flags clusters, the longest tension run, speaking rate, and a list of one-line highlights.
+    """
+    rows = sorted(timeline, key=lambda r: record_interval(r)[0])
+    if not rows:
+        return {"duration_sec": 0.0, "highlights": []}
+    iv = np.array([record_interval(r) for r in rows], dtype=float)
+    starts, ends = iv[:, 0], iv[:, 1]
+    w = _row_weights(starts, ends)
+    duration = float(ends.max() - starts.min())
+
+    out: Dict[str, Any] = {"duration_sec": round(duration, 2)}
+    out["confidence"] = _label_shares([r.get("confidence") for r in rows], w)
+    out["voice_emotion"] = _label_shares([r.get("emotion") for r in rows], w)
+
+    # Face emotions: time-weighted mean probability per emotion, normalised to shares.
+    keys, mat, has = _dict_matrix(rows, "emotions")
+    face = {}
+    if keys and has.any():
+        means = (mat[has] * w[has, None]).sum(axis=0) / max(w[has].sum(), 1e-9)
+        total = means.sum()
+        order = np.argsort(-means)
+        face = {keys[j]: round(float(means[j] / total), 3) for j in order if total > 0}
+    out["face_emotion"] = face
+
+    # AU clusters: rates are the share of frames with the cluster active in each window.
+    keys, mat, has = _dict_matrix(rows, "clusters")
+    col = {k: j for j, k in enumerate(keys)}
+    covered = w[has].sum() if has.any() else 0.0
+    def rate(name):
+        if name not in col or covered <= 0:
+            return 0.0
+        return round(float((mat[has, col[name]] * w[has]).sum() / covered), 3)
+    out["engagement"] = {
+        "smile_rate": rate("authentic_smile"),
+        "eyebrow_engagement_rate": rate("eyebrow_engagement"),
+        "focused_thinking_rate": rate("focused_thinking"),
+        "tension_rate": rate("tension"),
+    }
+
+    tense = mat[:, col["tension"]] >= tension_min_rate if "tension" in col else np.zeros(len(rows), dtype=bool)
+    secs, t0, t1 = _longest_run(tense, starts, ends)
+    out["longest_tension_run"] = {"seconds": round(secs, 2),
+                                  "timestamp": fmt_range(t0, t1) if t0 is not None else None}
+
+    texts = [" ".join(str(r[k]) for k in TEXT_FIELDS if r.get(k)) for r in rows]
+    words = np.array([len(t.split()) for t in texts], dtype=float)
+    speaking = float(w[words > 0].sum())
+    out["speaking_rate"] = {
+        "words": int(words.sum()),
+        "wpm": round(float(words.sum() / (duration / 60.0)), 1) if duration > 0 else 0.0,
+        "wpm_while_speaking": round(float(words.sum() / (speaking / 60.0)), 1) if speaking > 0 else 0.0,
+        "speaking_share": round(speaking / duration, 3) if duration > 0 else 0.0,
+    }
+
+    out["highlights"] = _highlights(out)
+    return out
+
+
+def _highlights(rep: Dict[str, Any]) -> List[str]:
+    lines = []
+    if rep["confidence"]:
+        label, share = next(iter(rep["confidence"].items()))
+        lines.append(f"Voice mostly '{label}' ({share:.0%} of the talk).")
+    if rep["face_emotion"]:
+        label, share = next(iter(rep["face_emotion"].items()))
+        lines.append(f"Most common facial expression: {label} ({share:.0%}).")
+    eng = rep["engagement"]
+    lines.append(f"Smiling {eng['smile_rate']:.0%} and raising eyebrows {eng['eyebrow_engagement_rate']:.0%} of the time.")
+    run = rep["longest_tension_run"]
+    if run["seconds"] > 0:
+        lines.append(f"Longest tense stretch: {run['timestamp']} ({run['seconds']:.0f}s).")
+    sr = rep["speaking_rate"]
+    if sr["words"]:
+        lines.append(f"Speaking rate {sr['wpm_while_speaking']:.0f} words/min while speaking.")
+    return lines
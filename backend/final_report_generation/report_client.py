@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+DEFAULT_MODEL = "deepseek-ai/DeepSeek-R1-0528-Qwen3-8B"
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".report_cache"
+
+# HTTP statuses worth retrying; other 4xx mean the request itself is wrong.
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def cache_key(model: str, prompt: str, payload: str) -> str:
+    """
+    Response-cache key: hash of the model, the prompt and the payload.
+    """
+    h = hashlib.sha256()
+    for part in (model, prompt, payload):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _is_retryable(err: Exception) -> bool:
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(err, "status_code", None)
+    if status is None:
+        return True  # timeouts, dropped connections, ...
+    return int(status) in RETRYABLE_STATUS
+
+
+class ReportClient:
+    """
+    Asyncio LLM client for report generation.
+
+    - bounded concurrency (one semaphore shared by every call on this client)
+    - per-request timeout and retries with full-jitter exponential backoff
+    - token streaming (`stream`) so the first text can be shown as soon as it arrives
+    - a response cache keyed by model, prompt and payload hash (memory + one JSON file per key)
+
+    `base_url` points the client at any OpenAI-compatible server instead of the
+    Hugging Face router, e.g. the offline stub in stub_llm_server.py.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, provider: str = "auto",
+                 max_concurrency: int = 4, timeout: float = 120.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 cache_dir: Optional[str] = str(DEFAULT_CACHE_DIR), max_tokens: Optional[int] = None):
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key if api_key is not None else os.environ.get("HF_TOKEN")
+        self.provider = provider
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_tokens = max_tokens
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._mem_cache: Dict[str, str] = {}
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    # ---------- cache ----------
+    def _cache_get(self, key: str) -> Optional[str]:
+        if key in self._mem_cache:
+            return self._mem_cache[key]
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{key}.json"
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    text = json.load(f)["text"]
+                self._mem_cache[key] = text
+                return text
+        return None
+
+    def _cache_put(self, key: str, text: str):
+        self._mem_cache[key] = text
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_dir / f"{key}.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "text": text}, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_dir / f"{key}.json")
+
+    # ---------- transport ----------
+    def _inference_client(self):
+        if self._client is None:
+            # Imported here so that importing this module (e.g. from the API) stays cheap.
+            from huggingface_hub import AsyncInferenceClient
+            if self.base_url:
+                self._client = AsyncInferenceClient(base_url=self.base_url, api_key=self.api_key or "-",
+                                                    timeout=self.timeout)
+            else:
+                self._client = AsyncInferenceClient(provider=self.provider, api_key=self.api_key,
+                                                    timeout=self.timeout)
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0.0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _messages(self, prompt: str, payload: str) -> List[Dict[str, str]]:
+        return [{"role": "user", "content": prompt + payload}]
+
+    # ---------- public API ----------
+    async def stream(self, prompt: str, payload: str) -> AsyncIterator[str]:
+        """
+        Yield the completion text piece by piece. Cache hits are yielded in one piece.
+
+        Failures are retried only until the first piece has been yielded; after that the
+        error is raised, since already-delivered text cannot be taken back.
+        """
+        key = cache_key(self.model, prompt, payload)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        async with self._sem:
+            parts: List[str] = []
+            attempt = 0
+            while True:
+                try:
+                    client = self._inference_client()
+                    stream = await asyncio.wait_for(
+                        client.chat.completions.create(model=self.model, messages=self._messages(prompt, payload),
+                                                       stream=True, max_tokens=self.max_tokens),
+                        timeout=self.timeout)
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        piece = chunk.choices[0].delta.content
+                        if piece:
+                            parts.append(piece)
+                            yield piece
+                    break
+                except Exception as e:
+                    if parts or attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    reason = str(e).strip().splitlines()[0] if str(e).strip() else ""
+                    print(f"[warn] LLM call failed ({e.__class__.__name__}: {reason}); "
+                          f"retry {attempt}/{self.max_retries} in {delay:.2f}s", file=sys.stderr)
+                    await asyncio.sleep(delay)
+
+        self._cache_put(key, "".join(parts))
+
+    async def generate(self, prompt: str, payload: str) -> str:
+        """Full completion text (streamed internally, cached like `stream`)."""
+        return "".join([piece async for piece in self.stream(prompt, payload)])
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
@@ -0,0 +1,89 @@
+"""
+Local OpenAI-compatible stand-in for the LLM provider, so report-generation throughput and
+latency can be measured offline and without spending tokens.
+
+Serves POST /v1/chat/completions (streaming and non-streaming). Behaviour is set through
+environment variables so it also works under plain `uvicorn stub_llm_server:app`:
+
+    STUB_LLM_TTFT_MS   delay before the first token          (default 200)
+    STUB_LLM_TOKEN_MS  delay between tokens                   (default 5)
+    STUB_LLM_TOKENS    tokens per completion                  (default 200)
+    STUB_LLM_FAIL_RATE share of requests answered with 503    (default 0)
+
+    python stub_llm_server.py --port 8089
+    python LLM_prompting.py --base_url http://127.0.0.1:8089
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+
+def _setting(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _tokens(messages, n: int):
+    """Deterministic pseudo-report: same messages -> same text."""
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+    words = ["Strengths:", "clear", "structure,", "steady", "voice.", "Improve:", "eye", "contact,",
+             "pacing,", "pauses.", "Next", "steps:", "practice", "openings."]
+    rng = random.Random(digest)
+    return [f"Stub report {digest[:8]}:"] + [" " + rng.choice(words) for _ in range(max(n - 1, 0))]
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if random.random() < _setting("STUB_LLM_FAIL_RATE", 0.0):
+        return JSONResponse({"error": {"message": "stub overloaded"}}, status_code=503)
+
+    model = body.get("model") or "stub"
+    tokens = _tokens(body.get("messages", []), int(_setting("STUB_LLM_TOKENS", 200)))
+    ttft = _setting("STUB_LLM_TTFT_MS", 200) / 1000.0
+    gap = _setting("STUB_LLM_TOKEN_MS", 5) / 1000.0
+    created = int(time.time())
+    cid = f"chatcmpl-stub-{random.getrandbits(32):08x}"
+
+    if not body.get("stream"):
+        await asyncio.sleep(ttft + gap * len(tokens))
+        return JSONResponse({
+            "id": cid, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(tokens)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        })
+
+    async def events():
+        await asyncio.sleep(ttft)
+        for i, tok in enumerate(tokens):
+            if i:
+                await asyncio.sleep(gap)
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"role": "assistant", "content": tok}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Offline OpenAI-compatible LLM stub")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    args = ap.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
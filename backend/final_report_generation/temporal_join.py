@@ -0,0 +1,241 @@
+import heapq
+import json
+import numbers
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Free-text fields are concatenated across a window instead of voted on.
+TEXT_FIELDS = {"transcription", "text"}
+TIME_FIELDS = {"timestamp", "start", "end"}
+
+_RANGE_RE = re.compile(r"^\s*([\d:.]+)\s*-\s*([\d:.]+)\s*$")
+
+
+def parse_clock(value: str) -> float:
+    """
+    Convert "ss.ff", "m:ss" or "h:mm:ss" into seconds.
+    """
+    secs = 0.0
+    for part in value.strip().split(":"):
+        secs = secs * 60.0 + float(part)
+    return secs
+
+
+def parse_timestamp(ts: str) -> Tuple[float, float]:
+    """
+    Parse any of the stream timestamp formats into a numeric [start, end) interval in seconds.
+
+    Supported formats
+    ----------
+    "00:03 - 00:06"  audio (openSMILE windows)
+    "0:02-0:07"      video (au_flags segments)
+    "0.00 - 5.23"    Whisper segments
+    """
+    m = _RANGE_RE.match(ts)
+    if not m:
+        raise ValueError(f"Unrecognised timestamp range: {ts!r}")
+    start, end = parse_clock(m.group(1)), parse_clock(m.group(2))
+    if end < start:
+        raise ValueError(f"Timestamp range ends before it starts: {ts!r}")
+    return start, end
+
+
+def fmt_range(a: float, b: float) -> str:
+    s0, s1 = int(round(a)), int(round(b))
+    m0, r0 = divmod(s0, 60)
+    m1, r1 = divmod(s1, 60)
+    return f"{m0}:{r0:02d}-{m1}:{r1:02d}"
+
+
+def load_stream(src: Any) -> List[Dict[str, Any]]:
+    """
+    Normalise a stream into a list of records.
+
+    Parameters
+    ----------
+    src : str | os.PathLike | list[dict] | dict | pandas.DataFrame
+        - a path to a JSON file (list of records, or an au_flags output with a "segments" key)
+        - an in-memory list of records
+        - a columnar dict of equal-length arrays, e.g. {"start": [...], "end": [...], "confidence": [...]}
+        - a DataFrame (anything with .to_dict(orient="records"))
+
+    Returns
+    ----------
+    list[dict]
+        One dict per record; each has either "timestamp" or numeric "start"/"end".
+    """
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "r", encoding="utf-8") as infile:
+            src = json.load(infile)
+
+    if hasattr(src, "to_dict") and not isinstance(src, dict):
+        return src.to_dict(orient="records")
+
+    if isinstance(src, dict):
+        if "segments" in src:
+            return list(src["segments"])
+        # .tolist() turns NumPy arrays into Python scalars, so values are typed as in the other inputs
+        cols = {k: v.tolist() if hasattr(v, "tolist") else list(v) for k, v in src.items()}
+        n = len(next(iter(cols.values()))) if cols else 0
+        return [{k: v[i] for k, v in cols.items()} for i in range(n)]
+
+    return list(src)
+
+
+def record_interval(rec: Dict[str, Any]) -> Tuple[float, float]:
+    if "start" in rec and "end" in rec:
+        return float(rec["start"]), float(rec["end"])
+    return parse_timestamp(str(rec["timestamp"]))
+
+
+def make_grid(t_end: float, win_sec: float = 5.0, hop_sec: Optional[float] = None,
+              t_start: float = 0.0) -> List[Tuple[float, float]]:
+    """
+    Output windows [t, t + win_sec) every hop_sec (defaults to win_sec, i.e. non-overlapping) covering [t_start, t_end).
+    """
+    hop = float(hop_sec or win_sec)
+    if win_sec <= 0 or hop <= 0:
+        raise ValueError("win_sec and hop_sec must be positive")
+    grid = []
+    i = 0
+    while True:
+        t0 = t_start + i * hop
+        if t0 >= t_end and grid:
+            break
+        grid.append((t0, t0 + win_sec))
+        i += 1
+    return grid
+
+
+def overlap_join(windows: Sequence[Tuple[float, float]],
+                 intervals: Sequence[Tuple[float, float]]) -> Iterator[Tuple[int, int, float]]:
+    """
+    Sorted-sweep interval join.
+
+    Yields (window_index, interval_index, overlap_seconds) for every pair with a positive overlap.
+    `windows` must be sorted by start. Runs in O((n + m) log m + k) for n windows, m intervals and
+    k overlapping pairs; within a window, intervals are yielded in start order.
+    """
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i])
+    active: List[Tuple[float, int]] = []  # min-heap of (end, rank in `order`)
+    j = 0
+    for wi, (ws, we) in enumerate(windows):
+        while j < len(order) and intervals[order[j]][0] < we:
+            heapq.heappush(active, (intervals[order[j]][1], j))
+            j += 1
+        while active and active[0][0] <= ws:
+            heapq.heappop(active)
+        for end, rank in sorted(active, key=lambda x: x[1]):
+            start = intervals[order[rank]][0]
+            ov = min(end, we) - max(start, ws)
+            if ov > 0:
+                yield wi, order[rank], ov
+
+
+def _is_number(v: Any) -> bool:
+    # numbers.Real also covers NumPy scalars (np.float32, np.int64, ...); NumPy bools are not Real
+    return isinstance(v, numbers.Real) and not isinstance(v, bool)
+
+
+class _WindowAccumulator:
+    """Overlap-weighted aggregation of the records that fall into one output window."""
+
+    def __init__(self):
+        self.num = defaultdict(lambda: [0.0, 0.0])          # field -> [sum(w*v), sum(w)]
+        self.maps = defaultdict(lambda: [defaultdict(float), 0.0])  # field -> [{key: sum(w*v)}, sum(w)]
+        self.labels = defaultdict(lambda: defaultdict(float))       # field -> {label: sum(w)}
+        self.texts = defaultdict(list)                                # field -> [text, ...]
+
+    def add(self, rec: Dict[str, Any], w: float, owns_text: bool = True):
+        for k, v in rec.items():
+            if getattr(v, "ndim", None) == 0:
+                v = v.item()  # NumPy scalar -> Python bool / int / float / str
+            if k in TIME_FIELDS or v is None:
+                continue
+            if k in TEXT_FIELDS:
+                if not owns_text:
+                    continue
+                text = str(v).strip()
+                if text and (not self.texts[k] or self.texts[k][-1] != text):
+                    self.texts[k].append(text)
+            elif _is_number(v) or isinstance(v, bool):
+                acc = self.num[k]
+                acc[0] += w * float(v)
+                acc[1] += w
+            elif isinstance(v, dict):
+                acc = self.maps[k]
+                for kk, vv in v.items():
+                    if _is_number(vv):
+                        acc[0][kk] += w * float(vv)
+                acc[1] += w
+            else:
+                self.labels[k][str(v)] += w
+
+    def result(self, ndigits: int = 3) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for k, (s, w) in self.num.items():
+            out[k] = round(s / w, ndigits)
+        for k, (sums, w) in self.maps.items():
+            out[k] = {kk: round(s / w, ndigits) for kk, s in sums.items()}
+        for k, votes in self.labels.items():
+            out[k] = max(votes.items(), key=lambda kv: kv[1])[0]
+        for k, parts in self.texts.items():
+            out[k] = " ".join(parts)
+        return out
+
+
+def fuse_streams(streams: Iterable[Any], win_sec: float = 5.0, hop_sec: Optional[float] = None,
+                 t_end: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Join any number of timestamped streams onto one common output grid.
+
+    Each record is parsed into a numeric [start, end) interval and joined against the grid windows
+    with a sorted sweep. Every record contributes to a window in proportion to its overlap with it:
+
+    - numbers / booleans  -> overlap-weighted mean (booleans become the share of time that was True)
+    - dicts of numbers     -> per-key overlap-weighted mean (e.g. au_flags "emotions" / "clusters")
+    - text fields          -> concatenated in time order ("transcription"); a record's text goes to the
+                              window(s) containing its midpoint so it is not repeated across neighbours
+    - other strings        -> the label covering the most time in the window (e.g. "confidence")
+
+    Parameters
+    ----------
+    streams : iterable
+        Each item is anything accepted by `load_stream` (file path, list of records, columnar arrays, DataFrame).
+    win_sec, hop_sec : float
+        Output grid; hop defaults to win (non-overlapping windows).
+    t_end : float, optional
+        End of the grid; defaults to the latest record end over all streams.
+
+    Returns
+    ----------
+    list[dict]
+        One entry per grid window that any stream overlaps, with "timestamp", numeric "start"/"end"
+        and the aggregated fields of every stream.
+    """
+    parsed = []
+    latest = 0.0
+    for src in streams:
+        records = load_stream(src)
+        intervals = [record_interval(r) for r in records]
+        if intervals:
+            latest = max(latest, max(e for _, e in intervals))
+        parsed.append((records, intervals))
+
+    grid = make_grid(latest if t_end is None else t_end, win_sec, hop_sec)
+    accs = [_WindowAccumulator() for _ in grid]
+    for records, intervals in parsed:
+        for wi, ri, ov in overlap_join(grid, intervals):
+            mid = 0.5 * (intervals[ri][0] + intervals[ri][1])
+            ws, we = grid[wi]
+            accs[wi].add(records[ri], ov, owns_text=ws <= mid < we)
+
+    fused = []
+    for (ws, we), acc in zip(grid, accs):
+        fields = acc.result()
+        if not fields:
+            continue
+        fused.append({"timestamp": fmt_range(ws, we), "start": round(ws, 3), "end": round(we, 3), **fields})
+    return fused
@@ -1,17 +1,26 @@
-import pandas as pd
+import os
+import sys
+
 import matplotlib.pyplot as plt
 
-# Load the CSV file
-df = pd.read_csv('output/pyfeat_results.csv')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils"))
+from results_io import read_results, result_columns  # noqa: E402
+
+# Load the results (Parquet from newer runs, CSV from older ones)
+path = next((p for p in ('output/pyfeat_results.parquet', 'output/pyfeat_results.csv') if os.path.exists(p)),
+            'output/pyfeat_results.csv')
 
 # Emotion columns based on py-feat output
 emotion_columns = ['anger', 'disgust', 'fear', 'happiness', 'sadness', 'surprise', 'neutral']
 
 # Check if all emotion columns exist
-missing = [col for col in emotion_columns if col not in df.columns]
+missing = [col for col in emotion_columns if col not in result_columns(path)]
 if missing:
     raise ValueError(f"Missing emotion columns: {missing}")
 
+# Only the emotion columns are read
+df = read_results(path, columns=emotion_columns)
+
 # Plot emotion intensities over time
 plt.figure(figsize=(12, 6))
 for emotion in emotion_columns:
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Batch mode: run main.py's pipeline over a directory or manifest of videos.
+
+Videos move through three stages, each in its own thread, so stages of different videos
+overlap: while Py-Feat / landmarks analyze video N, video N+1 is standardized and decoded
+ahead (--lookahead videos, --prefetch_frames frames each), and video N-1's segments are built.
+Only one video is analyzed at a time, so the analyzers keep the whole CPU budget.
+
+Models stay warm for the whole batch: the Py-Feat worker (service backend) is started once,
+and the local backend loads one Detector in this process.
+
+A video that fails is recorded and the batch moves on. Progress is kept in a state file
+(default <workdir>/batch_state.json); re-running the same command skips videos already done
+(unless the file changed since) and retries failed ones.
+Within a video, stages come from the stage cache when their inputs are unchanged; a shared
+--cache_dir also lets duplicate uploads reuse each other's results.
+
+    python presentation_analyzer/batch.py --videos recordings/ --workdir runs/cohort1
+    python presentation_analyzer/batch.py --manifest cohort1.csv --workdir runs/cohort1 --run_landmarks
+
+Manifest: one video path per line (# comments), or a .csv with a "video" column and an
+optional "name" column (the output subdir; default: the file name without extension).
+Relative paths are resolved against the manifest's folder.
+"""
+
+import csv, json, os, queue, sys, threading, time, traceback
+from datetime import datetime
+from pathlib import Path
+
+from main import analyze_video, build_parser, cpu_plan, finish_video, prepare_video, video_job
+
+VIDEO_EXTS = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v"}
+
+
+def list_videos(paths, manifest=None):
+    """(video path, output name or None) in batch order."""
+    items = []
+    for p in map(Path, paths or []):
+        if p.is_dir():
+            items += [(v, None) for v in sorted(p.iterdir()) if v.suffix.lower() in VIDEO_EXTS]
+        else:
+            items.append((p, None))
+    if manifest:
+        root = Path(manifest).resolve().parent
+        with open(manifest, encoding="utf-8", newline="") as f:
+            if manifest.lower().endswith(".csv"):
+                rows = [(r["video"], r.get("name") or None) for r in csv.DictReader(f) if r.get("video")]
+            else:
+                rows = [(ln.strip(), None) for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+        items += [(root / v, name) for v, name in rows]
+    return [(Path(v).resolve(), name) for v, name in items]
+
+
+def _fingerprint(video: Path) -> dict:
+    try:
+        st = video.stat()
+        return {"size": st.st_size, "mtime": int(st.st_mtime)}
+    except OSError:
+        return {}
+
+
+def load_state(path: Path) -> dict:
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"videos": {}}
+
+
+def save_state(state: dict, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)  # never leave a half-written state file behind
+
+
+def plan_batch(items, state: dict, workdir: Path, retry_failed: bool = True):
+    """Jobs still to run as (key, name, video); names are unique and stable across resumes."""
+    entries = state["videos"]
+    used = {e["name"] for e in entries.values()}
+    todo, done = [], 0
+    for video, name in items:
+        key = str(video)
+        entry = entries.get(key)
+        if entry is None:
+            base = name or video.stem
+            name, i = base, 1
+            while name in used:
+                i += 1
+                name = f"{base}_{i}"
+            used.add(name)
+        else:
+            name = entry["name"]
+            if entry["status"] == "done" and entry.get("file") == _fingerprint(video) \
+                    and (workdir / name / entry["json"]).exists():
+                done += 1
+                continue
+            if entry["status"] == "failed" and not retry_failed:
+                continue
+        todo.append((key, name, video))
+    return todo, done
+
+
+def warm_models(args, plan):
+    """Start the Py-Feat worker, or load one Detector for the local backend (returned)."""
+    pyfeat_threads = plan[1]
+    if args.pyfeat_backend == "service":
+        from pyfeat_service import ensure_running
+        print(f"[info] Py-Feat worker: {ensure_running(args.pyfeat_address, pyfeat_threads)}", flush=True)
+        return None
+    if args.pipeline == "disk" and args.pyfeat_workers > 1:
+        return None  # per-video worker pool, each with its own Detector
+    from pyfeat_runner import _load_detector
+    print(">>> Loading Py-Feat Detector once for the batch…", flush=True)
+    detector = _load_detector(pyfeat_threads)
+    if detector is None:
+        raise RuntimeError("Py-Feat Detector could not be loaded")
+    return detector
+
+
+def run_batch(args, todo, state, state_path, plan, detector=None):
+    """Run the jobs as a three-stage pipeline; returns (done, failed) counts."""
+    total = len(todo)
+    ahead = threading.Semaphore(max(1, args.lookahead))
+    prepared, analyzed = queue.Queue(), queue.Queue()
+
+    def fail(job, name):
+        # Called from an except block; keeps the first error of the job
+        job["error"] = job["error"] or f"{name}: {traceback.format_exc()}"
+        print(f"[error] {job['name']}: {name} failed:\n{traceback.format_exc()}", flush=True)
+
+    def stage(job, name, fn):
+        if job["error"]:
+            return
+        print(f">>> [{job['pos']}/{total}] {job['name']}: {name}", flush=True)
+        t0 = time.perf_counter()
+        try:
+            code = fn()
+            if code:
+                job["error"] = f"{name}: exit code {code}"
+        except Exception:
+            fail(job, name)
+        job["seconds"][name] = round(time.perf_counter() - t0, 2)
+
+    # Each loop passes every job on (failed ones marked) and always posts its end sentinel,
+    # so the finish loop below never waits on a thread that died
+    def prepare_loop():
+        try:
+            for pos, (key, name, video) in enumerate(todo, 1):
+                ahead.acquire()  # at most --lookahead videos prepared ahead of the analyzers
+                job = {"video": Path(video), "key": key, "name": name, "pos": pos, "error": None, "seconds": {}}
+
+                def prepare(job=job, video=video, name=name):
+                    job.update(video_job(args, video, Path(args.workdir) / name))
+                    return prepare_video(args, job, plan, prefetch=args.prefetch_frames)
+
+                stage(job, "prepare", prepare)
+                prepared.put(job)
+        finally:
+            prepared.put(None)
+
+    def analyze_loop():
+        try:
+            while True:
+                job = prepared.get()
+                ahead.release()
+                if job is None:
+                    break
+                stage(job, "analyze", lambda: analyze_video(args, job, plan, detector=detector))
+                try:
+                    close = getattr(job.get("frames"), "close", None)
+                    if close is not None:
+                        close()
+                except Exception:
+                    fail(job, "analyze")
+                analyzed.put(job)
+        finally:
+            analyzed.put(None)
+
+    for fn in (prepare_loop, analyze_loop):
+        threading.Thread(target=fn, name=f"batch-{fn.__name__}", daemon=True).start()
+
+    # Finish stage in this thread; it is also the only writer of the state file
+    done = failed = 0
+    while True:
+        job = analyzed.get()
+        if job is None:
+            break
+        stage(job, "finish", lambda: finish_video(args, job, plan))
+        entry = {"name": job["name"], "file": _fingerprint(job["video"]), "json": args.out_json,
+                 "seconds": job["seconds"], "finished": datetime.now().isoformat(timespec="seconds")}
+        if job["error"]:
+            failed += 1
+            entry.update(status="failed", error=job["error"])
+            print(f"[warn] [{job['pos']}/{total}] {job['name']} failed; continuing.", flush=True)
+        else:
+            done += 1
+            entry.update(status="done", segments=job.get("segments"))
+            print(f"[✓] [{job['pos']}/{total}] {job['name']}: {job['out_json']}", flush=True)
+        state["videos"][job["key"]] = entry
+        save_state(state, state_path)
+    return done, failed
+
+
+def main():
+    ap = build_parser(batch=True)
+    ap.description = "Batch mode: main.py's pipeline over many videos, stages overlapped across videos"
+    ap.add_argument("--videos", nargs="*", default=[], help="Video files and/or folders of videos")
+    ap.add_argument("--manifest", default=None, help="Text file (one path per line) or .csv with a 'video' column")
+    ap.add_argument("--state", default=None, help="Resume state file (default: <workdir>/batch_state.json)")
+    ap.add_argument("--no_retry_failed", dest="retry_failed", action="store_false",
+                    help="On resume, leave videos that failed before alone")
+    ap.add_argument("--lookahead", type=int, default=1,
+                    help="Videos standardized / decoded ahead of the one being analyzed")
+    ap.add_argument("--prefetch_frames", type=int, default=64,
+                    help="Memory pipeline: frames decoded ahead per prepared video")
+    args = ap.parse_args()
+
+    items = list_videos(args.videos, args.manifest)
+    if not items:
+        print("[error] No videos given (--videos / --manifest).", flush=True)
+        return 2
+    workdir = Path(args.workdir).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    state_path = Path(args.state).resolve() if args.state else workdir / "batch_state.json"
+    state = load_state(state_path)
+
+    todo, already = plan_batch(items, state, workdir, args.retry_failed)
+    print(f"[info] Batch: {len(items)} video(s), {already} already done, {len(todo)} to run "
+          f"(state: {state_path})", flush=True)
+    if not todo:
+        return 0
+
+    plan = cpu_plan(args)
+    try:
+        detector = warm_models(args, plan)
+    except Exception as e:
+        print(f"[error] {e}", flush=True)
+        return 3
+
+    t0 = time.perf_counter()
+    done, failed = run_batch(args, todo, state, state_path, plan, detector)
+    print(f"[done] Batch: {done} done, {failed} failed, {already} skipped in {time.perf_counter() - t0:.1f}s "
+          f"(state: {state_path})", flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Per-frame AU cluster flags: vectorized compute_cluster_flags vs the per-row compute_cluster_flag.
+
+Builds a synthetic frames x AUs table (--rows, ~5% NaN, intensities on the 0-5 scale plus a
+few exact-threshold values), computes every BASE_CLUSTERS flag (and the any_max rule) both ways and checks that
+they agree. The row loop is timed on the first --ref_rows rows and scaled up.
+
+    python presentation_analyzer/benchmarks/bench_au_flags.py --rows 1000000
+    python presentation_analyzer/benchmarks/bench_au_flags.py --rows 5000000 --ref_rows 200000
+"""
+
+import argparse, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from au_flags import BASE_CLUSTERS, compute_cluster_flag, compute_cluster_flags  # noqa: E402
+
+
+def make_table(n_rows: int, thr: float, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    aus = sorted({au for spec in BASE_CLUSTERS.values() for au in spec["aus"]})
+    data = rng.gamma(1.2, 0.8, size=(n_rows, len(aus)))
+    data[rng.random(data.shape) < 0.05] = np.nan
+    data[rng.random(data.shape) < 0.01] = thr  # ties at the threshold
+    return pd.DataFrame(data, columns=aus)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark au_flags cluster flag computation")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--ref_rows", type=int, default=None,
+                    help="Rows for the per-row reference (default: all; it is slow)")
+    ap.add_argument("--thr", type=float, default=1.5)
+    args = ap.parse_args()
+
+    aus_df = make_table(args.rows, args.thr)
+    ref_rows = min(args.rows, args.ref_rows or args.rows)
+    print(f"[info] {args.rows} rows x {aus_df.shape[1]} AUs, reference on {ref_rows} rows")
+
+    t_vec = t_ref = 0.0
+    ok = True
+    cases = dict(BASE_CLUSTERS)
+    cases["(any_max rule)"] = {"aus": BASE_CLUSTERS["tension"]["aus"], "rule": "any_max"}  # unused by the clusters
+    for cname, spec in cases.items():
+        mat = aus_df[spec["aus"]].values
+        t0 = time.perf_counter()
+        fast = compute_cluster_flags(aus_df[spec["aus"]].to_numpy(dtype=float), spec["rule"], args.thr)
+        t_vec += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        slow = np.array([compute_cluster_flag(list(row), spec["rule"], args.thr) for row in mat[:ref_rows]], bool)
+        t_ref += time.perf_counter() - t0
+        same = np.array_equal(fast[:ref_rows], slow)
+        ok &= same
+        print(f"{cname:<20} {spec['rule']:<17} active={fast.mean():.3f}  {'identical' if same else 'MISMATCH'}")
+
+    t_ref_full = t_ref * args.rows / max(ref_rows, 1)
+    print(f"per-row    {t_ref_full:8.2f} s" + ("" if ref_rows == args.rows else " (extrapolated)"))
+    print(f"vectorized {t_vec:8.3f} s  ({t_ref_full / max(t_vec, 1e-9):.0f}x)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+body_metrics throughput on a synthetic landmark store (random-walk speaker).
+
+Writes a store of --minutes x --fps frames to a temp dir, memory-maps it back and times
+compute_metrics on the au_flags window grid (cold: first touch of the mmap; warm: second run).
+
+    python presentation_analyzer/benchmarks/bench_body_metrics.py --minutes 60 --fps 1
+    python presentation_analyzer/benchmarks/bench_body_metrics.py --minutes 60 --fps 10
+"""
+
+import argparse, sys, tempfile, time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from body_metrics import compute_metrics, frame_times, window_grid  # noqa: E402
+from landmark_store import N_LANDMARKS, PARTS, LandmarkWriter, load_landmarks  # noqa: E402
+
+
+def make_store(path: str, n_frames: int, fps: float, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.3, 0.7, size=(N_LANDMARKS, 2)).astype(np.float32)
+    face = 33  # plausible frontal face geometry for the eye-contact proxy
+    base[face + 33], base[face + 263], base[face + 1], base[face + 152] = (0.45, 0.4), (0.55, 0.4), (0.5, 0.47), (0.5, 0.6)
+    drift = np.cumsum(rng.normal(0, 0.002, size=(n_frames, 1, 2)), axis=0).astype(np.float32)
+    jitter = rng.normal(0, 0.003, size=(n_frames, N_LANDMARKS, 2)).astype(np.float32)
+    xy = base[None] + drift + jitter
+    data = np.concatenate([xy, np.zeros((n_frames, N_LANDMARKS, 1), np.float32),
+                           np.full((n_frames, N_LANDMARKS, 1), 0.9, np.float32)], axis=-1)
+    hands_seen = rng.random(n_frames) < 0.4
+    data[~hands_seen, 501:] = np.nan
+    mask = np.ones((n_frames, len(PARTS)), bool)
+    mask[~hands_seen, 2:] = False
+    w = LandmarkWriter(path, mode="synthetic")
+    for i in range(n_frames):
+        w.append(i, i / fps, data[i], mask[i])
+    w.close()
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark body_metrics.compute_metrics")
+    ap.add_argument("--minutes", type=float, default=60)
+    ap.add_argument("--fps", type=float, default=1.0)
+    ap.add_argument("--win_sec", type=float, default=5.0)
+    ap.add_argument("--hop_sec", type=float, default=2.0)
+    args = ap.parse_args()
+
+    n = int(args.minutes * 60 * args.fps)
+    with tempfile.TemporaryDirectory() as tmp:
+        make_store(tmp, n, args.fps)
+        store = load_landmarks(tmp)
+        times = frame_times(store, args.fps)
+        grid = window_grid(float(times.max()), args.win_sec, args.hop_sec)
+        print(f"[info] {n} frames ({args.minutes:g} min @ {args.fps:g} fps), {len(grid)} windows, "
+              f"store {store.landmarks.nbytes / 2**20:.0f} MB")
+        for label in ("cold", "warm"):
+            t0 = time.perf_counter()
+            metrics = compute_metrics(store.landmarks, times, grid)
+            dt = time.perf_counter() - t0
+            print(f"{label:<5} {dt * 1000:8.1f} ms  " +
+                  "  ".join(f"{k}={np.nanmean(v):.3f}" for k, v in metrics.items()))
+        del store
+
+
+if __name__ == "__main__":
+    main()
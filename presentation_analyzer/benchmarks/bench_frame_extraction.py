@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Frame-extraction throughput per sampling mode (frame_extraction.EXTRACT_MODES).
+
+Reports, for each mode, wall time, sampled frames/s and the equivalent source
+frames/s (how fast the mode gets through the video). Without --video a synthetic
+clip is generated with OpenCV.
+
+    python presentation_analyzer/benchmarks/bench_frame_extraction.py --video talk.mp4
+    python presentation_analyzer/benchmarks/bench_frame_extraction.py --seconds 120 --every_ms 1000 --write
+"""
+
+import argparse, os, shutil, sys, tempfile, time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from frame_extraction import EXTRACT_MODES, extract_frames, iter_frames  # noqa: E402
+
+
+def make_video(path: str, seconds: float, fps: int = 25, size=(640, 480)) -> str:
+    """Moving-gradient clip; enough texture for the codec to do real work."""
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    xx = np.tile(np.arange(w, dtype=np.uint16), (h, 1))
+    yy = np.tile(np.arange(h, dtype=np.uint16)[:, None], (1, w))
+    for i in range(int(seconds * fps)):
+        frame = np.stack([(xx + i * 3) % 256, (yy + i * 2) % 256, (xx + yy + i) % 256], axis=-1).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark frame extraction modes")
+    ap.add_argument("--video", default=None, help="Video to use (default: synthetic clip)")
+    ap.add_argument("--seconds", type=float, default=60, help="Synthetic clip length")
+    ap.add_argument("--every_ms", type=int, default=1000)
+    ap.add_argument("--modes", nargs="*", default=list(EXTRACT_MODES))
+    ap.add_argument("--write", action="store_true", help="Include JPEG writing (extract_frames)")
+    args = ap.parse_args()
+    if "ffmpeg" in args.modes and shutil.which("ffmpeg") is None:
+        print("[warn] ffmpeg binary not found; skipping mode 'ffmpeg'")
+        args.modes.remove("ffmpeg")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_video(os.path.join(tmp, "synthetic.mp4"), args.seconds)
+        cap = cv2.VideoCapture(video)
+        fps, total = cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        print(f"[info] {video}: {total} frames @ {fps:.2f} fps, sampling every {args.every_ms} ms")
+        print(f"{'mode':<8}{'sampled':>9}{'wall s':>9}{'sampled/s':>11}{'source fps':>12}{'speedup':>9}")
+
+        base = None
+        for mode in ["read"] + [m for m in args.modes if m != "read"]:
+            t0 = time.perf_counter()
+            if args.write:
+                n = extract_frames(video, os.path.join(tmp, f"frames_{mode}"), args.every_ms, mode=mode)
+            else:
+                n = sum(1 for _ in iter_frames(video, args.every_ms, mode=mode))
+            dt = time.perf_counter() - t0
+            base = base or dt
+            print(f"{mode:<8}{n:>9}{dt:>9.2f}{n / dt:>11.1f}{total / dt:>12.1f}{base / dt:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
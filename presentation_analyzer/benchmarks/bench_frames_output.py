@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+au_flags --include_frames output: old per-record dicts + json.dump(indent=2) vs frames_writer.
+
+Synthetic per-frame table of --rows frames (4 cluster flags, frame index, 7 emotions with a
+few NaN). The old path is timed on the first --legacy_rows rows and scaled up (size too);
+every new format is written in full and read back to check it matches the old records.
+--memory adds a second, traced pass per writer for the peak Python allocation.
+
+    python presentation_analyzer/benchmarks/bench_frames_output.py --rows 200000 --memory
+"""
+
+import argparse, json, math, os, sys, tempfile, time, tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from au_flags import BASE_CLUSTERS, EMOTION_COLS  # noqa: E402
+from frames_writer import FRAME_FORMATS, frame_columns, write_columnar, write_jsonl, write_with_inline_frames  # noqa: E402
+
+
+def make_table(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    flags = pd.DataFrame(rng.random((n, len(BASE_CLUSTERS))) < 0.3, columns=list(BASE_CLUSTERS))
+    df = pd.DataFrame(rng.dirichlet(np.ones(len(EMOTION_COLS)), size=n), columns=EMOTION_COLS)
+    df.iloc[::97, 2] = np.nan
+    df["frame"] = np.arange(n)
+    return flags, df
+
+
+def legacy_records(flags_df, df, frame_key, available_emotions):
+    """The per-frame loop au_flags used before frames_writer."""
+    frames = []
+    for i in range(len(flags_df)):
+        rec = {k: bool(flags_df.iloc[i][k]) for k in flags_df.columns}
+        rec["index"] = int(i)
+        if frame_key is not None:
+            val = df.loc[i, frame_key]
+            try: rec[frame_key] = int(val)
+            except Exception:
+                try: rec[frame_key] = float(val)
+                except Exception: rec[frame_key] = str(val)
+        emo = {}
+        for col in available_emotions:
+            v = df.loc[i, col]
+            try: emo[col] = float(v)
+            except Exception: emo[col] = v if pd.notna(v) else None
+        rec["emotions"] = emo
+        frames.append(rec)
+    return frames
+
+
+def same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a):
+        return math.isnan(b)
+    if a is None or b is None:  # NaN used to be written as NaN, now null
+        return (a is None or (isinstance(a, float) and math.isnan(a))) and \
+               (b is None or (isinstance(b, float) and math.isnan(b)))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    return a == b
+
+
+def timed(fn, memory: bool):
+    """(seconds, peak traced bytes or NaN); tracing slows allocation down, so it gets its own pass."""
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    if not memory:
+        return dt, float("nan")
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dt, peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the au_flags per-frame output")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--legacy_rows", type=int, default=20_000)
+    ap.add_argument("--memory", action="store_true", help="Also measure peak allocations (slower)")
+    args = ap.parse_args()
+
+    flags, df = make_table(args.rows)
+    out = {"metadata": {"num_frames": args.rows}, "segments": []}
+    m = min(args.rows, args.legacy_rows)
+    scale = args.rows / m
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.json")
+
+        def run_legacy():
+            recs = legacy_records(flags.iloc[:m], df.iloc[:m], "frame", EMOTION_COLS)
+            with open(legacy_path, "w", encoding="utf-8") as f:
+                json.dump(dict(out, frames=recs), f, ensure_ascii=False, indent=2)
+
+        dt, peak = timed(run_legacy, args.memory)
+        size = os.path.getsize(legacy_path) * scale
+        print(f"[info] {args.rows} frames; legacy measured on {m} and scaled x{scale:g}")
+        print(f"{'legacy':<9} {dt * scale:8.2f} s  {size / 2**20:8.1f} MB  peak {peak * scale / 2**20:7.1f} MB")
+        reference = json.load(open(legacy_path))["frames"]
+
+        writers = {
+            "inline": lambda p, c: write_with_inline_frames(p, out, c),
+            "jsonl": write_jsonl,
+            "columnar": write_columnar,
+        }
+        ok = True
+        for fmt in FRAME_FORMATS:
+            path = os.path.join(tmp, f"{fmt}.json")
+            dt, peak = timed(lambda: writers[fmt](path, frame_columns(flags, df, "frame", EMOTION_COLS)), args.memory)
+            if fmt == "inline":
+                recs = json.load(open(path))["frames"][:m]
+            elif fmt == "jsonl":
+                with open(path, encoding="utf-8") as f:
+                    recs = [json.loads(next(f)) for _ in range(m)]
+            else:
+                col = json.load(open(path))
+                recs = [{**{k: col[k][i] for k in col if k not in ("num_frames", "emotions")},
+                         "emotions": {e: col["emotions"][e][i] for e in col["emotions"]}} for i in range(m)]
+            match = all(same(a, b) for a, b in zip(reference, recs)) and len(recs) == m
+            ok &= match
+            print(f"{fmt:<9} {dt:8.2f} s  {os.path.getsize(path) / 2**20:8.1f} MB  peak {peak / 2**20:7.1f} MB"
+                  f"  {'matches' if match else 'MISMATCH'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
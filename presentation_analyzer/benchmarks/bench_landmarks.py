@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+MediaPipe Holistic cost and output size per landmark mode x output format.
+
+static+json is the original behaviour (full detection on every frame, one indented JSON
+file per frame); video+npy tracks across frames and writes one float32 store. Frames are
+decoded once up front so only landmark detection and writing are timed.
+
+    python presentation_analyzer/benchmarks/bench_landmarks.py --video talk.mp4 --every_ms 1000
+"""
+
+import argparse, os, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from frame_extraction import iter_frames  # noqa: E402
+from landmark_detection import detect_landmarks_from_arrays  # noqa: E402
+from landmark_store import load_landmarks  # noqa: E402
+
+CONFIGS = [("static", "json"), ("static", "npy"), ("video", "json"), ("video", "npy")]
+
+
+def dir_size(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).iterdir() if f.is_file())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark landmark modes / formats")
+    ap.add_argument("--video", required=True)
+    ap.add_argument("--every_ms", type=int, default=1000)
+    ap.add_argument("--max_frames", type=int, default=0, help="Only the first N sampled frames (0 = all)")
+    args = ap.parse_args()
+
+    frames = list(iter_frames(args.video, args.every_ms))
+    if args.max_frames:
+        frames = frames[:args.max_frames]
+    print(f"[info] {args.video}: {len(frames)} sampled frames")
+    print(f"{'mode':<8}{'format':<8}{'wall s':>9}{'frames/s':>10}{'size KB':>11}{'KB/frame':>10}{'load ms':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, fmt in CONFIGS:
+            out = os.path.join(tmp, f"{mode}_{fmt}")
+            t0 = time.perf_counter()
+            n = detect_landmarks_from_arrays(iter(frames), output_dir=out, mode=mode, output_format=fmt)
+            wall = time.perf_counter() - t0
+            size = dir_size(out) / 1024
+            t0 = time.perf_counter()
+            if fmt == "npy":
+                store = load_landmarks(out)
+                float(store.part("face")[:, :, 0].sum()) if len(store) else None  # touch one column
+            else:
+                import json
+                for p in sorted(Path(out).glob("*.json")):
+                    json.load(open(p, encoding="utf-8"))
+            load_ms = (time.perf_counter() - t0) * 1000
+            print(f"{mode:<8}{fmt:<8}{wall:>9.2f}{n / max(wall, 1e-9):>10.1f}{size:>11.1f}"
+                  f"{size / max(n, 1):>10.1f}{load_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Py-Feat detection throughput per configuration (batch size x torch threads x workers).
+
+Each configuration runs utils/pyfeat_runner.py in a fresh process on the same frame
+directory and reads back the ">>> Detection: ..." line, so model load time is excluded
+from the frames/s figure but reported separately as total wall time.
+
+    python presentation_analyzer/benchmarks/bench_pyfeat.py --frame_dir frames
+    python presentation_analyzer/benchmarks/bench_pyfeat.py --frame_dir frames --configs 1:1:1 8:4:1 8:2:2
+"""
+
+import argparse, os, re, subprocess, sys, tempfile, time
+from pathlib import Path
+
+RUNNER = Path(__file__).resolve().parent.parent / "utils" / "pyfeat_runner.py"
+RATE_RE = re.compile(r">>> Detection: (\d+) frames in ([\d.]+)s \(([\d.]+) fps\)")
+
+
+def default_configs():
+    """Baseline (old behaviour: 1 thread, unbatched) against batched/threaded/sharded variants."""
+    cores = os.cpu_count() or 1
+    configs = [(1, 1, 1), (8, 1, 1), (1, cores, 1), (8, cores, 1)]
+    if cores >= 4:
+        configs.append((8, cores, 2))
+    return configs
+
+
+def parse_config(text: str):
+    batch, threads, workers = (int(x) for x in text.split(":"))
+    return batch, threads, workers
+
+
+def run_config(frame_dir: str, batch: int, threads: int, workers: int, out_csv: str):
+    cmd = [sys.executable, str(RUNNER), "--frame_dir", frame_dir, "--output_csv", out_csv,
+           "--batch_size", str(batch), "--num_threads", str(threads), "--workers", str(workers)]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    wall = time.perf_counter() - t0
+    m = RATE_RE.search(proc.stdout)
+    if proc.returncode != 0 or m is None:
+        tail = "\n".join(proc.stdout.strip().splitlines()[-5:])
+        print(f"[warn] batch={batch} threads={threads} workers={workers} failed:\n{tail}")
+        return None
+    return int(m.group(1)), float(m.group(2)), float(m.group(3)), wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Py-Feat batching / threading / sharding")
+    ap.add_argument("--frame_dir", required=True, help="Directory of extracted frames (JPEG/PNG)")
+    ap.add_argument("--configs", nargs="*", default=None,
+                    help="batch:threads:workers triples (default: a small sweep)")
+    args = ap.parse_args()
+
+    configs = [parse_config(c) for c in args.configs] if args.configs else default_configs()
+    print(f"{'batch':>6}{'threads':>9}{'workers':>9}{'frames':>8}{'detect s':>10}{'fps':>8}{'wall s':>9}{'speedup':>9}")
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (batch, threads, workers) in enumerate(configs):
+            res = run_config(args.frame_dir, batch, threads, workers, os.path.join(tmp, f"run{i}.csv"))
+            if res is None:
+                continue
+            n, det_s, fps, wall = res
+            base = base or fps
+            print(f"{batch:>6}{threads:>9}{workers:>9}{n:>8}{det_s:>10.2f}{fps:>8.2f}{wall:>9.2f}{fps / base:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
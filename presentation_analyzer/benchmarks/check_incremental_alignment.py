@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Frame alignment of incremental re-analysis (--previous_run) on synthetic edits.
+
+Draws a talking-head recording in front of a static room (the hard case: every frame's
+whole-frame hash is nearly the same) whose face moves a little every source frame, and
+stores the fingerprints of one frame every --step_ms the way the in-memory runners do.
+JPEG re-encoded edits of it (trims and cuts on and off the sampling grid, a replaced
+stretch) are then sampled with FrameReuse.sample(), as main.py does for a fixed grid.
+Prints, per edit, how many samples show content of the previous run, how many of those
+were reused, and how many reused frames came from the wrong time.
+
+Exits 1 when any frame is reused from the wrong time, or when fewer than --min_reuse of
+the samples showing previous content are reused in any edit.
+
+    python presentation_analyzer/benchmarks/check_incremental_alignment.py --seconds 120
+"""
+
+import argparse, sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from incremental import FACE_BOX, FACE_LEVELS, MAX_BITS, FrameReuse, fingerprint, tag_rows  # noqa: E402
+
+H, W = 480, 640
+BOX = (260, 150, 120, 160)  # x, y, w, h of the face
+
+
+class Recording:
+    """Source frames drawn on demand: static blurred room, face whose features drift every frame."""
+
+    def __init__(self, n_frames: int, fps: float, seed: int):
+        rng = np.random.default_rng(seed)
+        self.room = cv2.GaussianBlur(rng.integers(30, 180, (H, W, 3)).astype(np.uint8), (0, 0), 3)
+        # brow, brow tilt, gaze x / y, mouth height / width / x: each a sum of slow sines
+        lo, hi = np.array([0, -5, -4, -3, 2, 20, -8]), np.array([12, 5, 4, 3, 40, 45, 8])
+        t = np.arange(n_frames)[:, None, None] / fps
+        waves = np.sin(2 * np.pi * rng.uniform(0.05, 0.6, (len(lo), 3)) * t + rng.uniform(0, 2 * np.pi, (len(lo), 3)))
+        self.pose = (lo + (hi - lo) * (0.5 + waves.sum(axis=2) / 6)).round()
+
+    def draw(self, i: int) -> np.ndarray:
+        x, y, w, h = BOX
+        img = self.room.copy()
+        cv2.rectangle(img, (x, y), (x + w, y + h), (255, 255, 255), 3)
+        img[y + 3:y + h - 2, x + 3:x + w - 2] = (120, 150, 185)
+        brow, tilt, gx, gy, mouth, mw, mx = self.pose[i].astype(int).tolist()
+        for side, ex in ((-1, x + 35), (1, x + 85)):
+            cv2.circle(img, (ex, y + 60), 8, (230, 230, 230), -1)
+            cv2.circle(img, (ex + gx, y + 60 + gy), 4, (40, 40, 40), -1)
+            cv2.line(img, (ex - 14, y + 40 - brow + side * tilt), (ex + 14, y + 40 - brow - side * tilt), (30, 30, 60), 4)
+        cv2.ellipse(img, (x + w // 2 + mx, y + 120), (mw, mouth // 2 + 1), 0, 0, 360, (60, 40, 150), -1)
+        return img
+
+
+def reencode(img: np.ndarray, quality: int) -> np.ndarray:
+    return cv2.imdecode(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_COLOR)
+
+
+def stored_rows(rec: Recording, sources, fps: float) -> pd.DataFrame:
+    """Previous-run rows (one face per sampled frame) with the runners' fingerprint columns."""
+    parts = []
+    for k, src in enumerate(sources):
+        df = pd.DataFrame([dict(zip(FACE_BOX, BOX), frame=k, timestamp=src / fps)])
+        parts.append(tag_rows(df, fingerprint(reencode(rec.draw(src), 95))))
+    return pd.concat(parts, ignore_index=True)
+
+
+def edits(n: int, fps: int):
+    """(name, [original source frame or -1 for new content, ...]) for each edit of an n-frame recording."""
+    at = lambda sec: int(round(sec * fps))
+    mid, third = n // 2, n // 3
+    yield "unchanged", list(range(n))
+    yield "trim 10 s", list(range(at(10), n))
+    yield "trim 10.4 s", list(range(at(10.4), n))
+    yield "trim 30.7 s", list(range(at(30.7), n))
+    yield "cut 5 s", list(range(mid)) + list(range(mid + at(5), n))
+    yield "cut 4.7 s", list(range(mid)) + list(range(mid + at(4.7), n))
+    yield "replace 8 s", list(range(third)) + [-1] * at(8) + list(range(third + at(8), n))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check incremental re-analysis frame alignment")
+    ap.add_argument("--seconds", type=int, default=120)
+    ap.add_argument("--fps", type=int, default=10, help="Source frame rate")
+    ap.add_argument("--step_ms", type=int, default=1000, help="Sampling interval (--frame_every_ms)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--quality", type=int, default=80, help="JPEG quality of the re-encoded upload")
+    ap.add_argument("--reuse_hash_bits", type=int, default=MAX_BITS)
+    ap.add_argument("--reuse_face_levels", type=int, default=FACE_LEVELS)
+    ap.add_argument("--min_reuse", type=float, default=0.8,
+                    help="Share of the samples showing previous content that must be reused")
+    args = ap.parse_args()
+
+    n = args.seconds * args.fps
+    rec, fresh = Recording(n, args.fps, args.seed), Recording(n, args.fps, args.seed + 1)  # fresh: poses for replaced content
+    every = max(1, int(round(args.fps * args.step_ms / 1000)))
+    prev_src = np.arange(0, n, every)
+    previous = stored_rows(rec, prev_src, args.fps)
+
+    failed = False
+    print(f"{'edit':<12} {'samples':>7} {'old':>5} {'reused':>6} {'wrong':>5}")
+    for name, source in edits(n, args.fps):
+        reuse = FrameReuse(previous, args.reuse_hash_bits, args.reuse_face_levels)
+        frames = [(i / args.fps, lambda i=i, src=src: reencode(rec.draw(src) if src >= 0 else fresh.draw(i),
+                                                              args.quality))
+                  for i, src in enumerate(source)]
+        old = reused = wrong = 0
+        for idx, t_sec, _ in reuse.sample(frames, args.step_ms / 1000.0):
+            src = source[int(round(t_sec * args.fps))]
+            old += src >= 0
+            j, _ = reuse.matches.pop(idx)
+            if j >= 0:
+                reused += 1
+                wrong += int(prev_src[reuse.aligner.frames[j]] != src)
+        low = reused < args.min_reuse * old
+        failed |= wrong > 0 or low
+        print(f"{name:<12} {idx + 1:>7} {old:>5} {reused:>6} {wrong:>5}" + ("  <- low reuse" if low else ""))
+    if failed:
+        print("[error] Frames were reused from the wrong time, or too few were reused")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
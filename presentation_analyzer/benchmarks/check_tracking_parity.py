@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+AU/emotion parity between full per-frame face detection and tracking mode (--track_every).
+
+Runs Py-Feat twice over the same sampled frames of each video, with one Detector, and
+compares the outputs frame by frame: mean/max absolute difference per AU and emotion column,
+and agreement of AU activation at --thr. The runner prints the per-stage time breakdown
+of each pass. Exits 1 when any video's mean AU difference exceeds --tol.
+
+    python presentation_analyzer/benchmarks/check_tracking_parity.py --videos talk1.mp4 talk2.mp4 --track_every 5
+"""
+
+import argparse, os, re, sys, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
+from frame_extraction import iter_frames  # noqa: E402
+from pyfeat_runner import _EMOTION_NAMES, _load_detector, run_pyfeat_on_arrays  # noqa: E402
+from results_io import read_results  # noqa: E402
+
+
+def first_face(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per sampled frame (largest face), indexed by frame."""
+    if "FaceRectWidth" in df.columns:
+        df = df.assign(_area=df["FaceRectWidth"] * df["FaceRectHeight"]).sort_values("_area", ascending=False)
+    return df.drop_duplicates("frame").set_index("frame").sort_index()
+
+
+def compare(full: pd.DataFrame, tracked: pd.DataFrame, thr: float):
+    a, b = first_face(full), first_face(tracked)
+    common = a.index.intersection(b.index)
+    cols = [c for c in a.columns if (re.fullmatch(r"AU\d+", c) or c in _EMOTION_NAMES) and c in b.columns]
+    rows = []
+    for c in cols:
+        x = pd.to_numeric(a.loc[common, c], errors="coerce").to_numpy(float)
+        y = pd.to_numeric(b.loc[common, c], errors="coerce").to_numpy(float)
+        ok = np.isfinite(x) & np.isfinite(y)
+        d = np.abs(x[ok] - y[ok])
+        agree = np.mean((x[ok] >= thr) == (y[ok] >= thr)) if ok.any() else np.nan
+        rows.append({"column": c, "mae": d.mean() if d.size else np.nan,
+                     "max": d.max() if d.size else np.nan, "agree": agree})
+    return pd.DataFrame(rows), len(a), len(b), len(common)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check Py-Feat output parity of tracking mode")
+    ap.add_argument("--videos", nargs="+", required=True)
+    ap.add_argument("--every_ms", type=int, default=1000)
+    ap.add_argument("--track_every", type=int, default=5)
+    ap.add_argument("--track_min_score", type=float, default=0.6)
+    ap.add_argument("--thr", type=float, default=0.5, help="AU activation threshold for agreement")
+    ap.add_argument("--tol", type=float, default=0.05, help="Max allowed mean AU abs difference")
+    args = ap.parse_args()
+
+    detector = _load_detector()
+    if detector is None:
+        return 2
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for video in args.videos:
+            frames = list(iter_frames(video, args.every_ms))
+            print(f"[info] {video}: {len(frames)} sampled frames")
+            t0 = time.perf_counter()
+            full = run_pyfeat_on_arrays(iter(frames), os.path.join(tmp, "full.csv"), detector=detector)
+            t_full = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            tracked = run_pyfeat_on_arrays(iter(frames), os.path.join(tmp, "tracked.csv"), detector=detector,
+                                           track_every=args.track_every, track_min_score=args.track_min_score)
+            t_tracked = time.perf_counter() - t0
+            if full is None or tracked is None:
+                print(f"[warn] {video}: no detections; skipped")
+                continue
+            full, tracked = read_results(full), read_results(tracked)
+
+            table, n_full, n_tracked, n_common = compare(full, tracked, args.thr)
+            print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+            au = table[table["column"].str.match(r"AU\d+")]
+            mae = float(au["mae"].mean()) if len(au) else float("nan")
+            print(f"[info] frames with a face: full={n_full} tracked={n_tracked} compared={n_common}")
+            print(f"[info] time: full {t_full:.2f}s, tracked {t_tracked:.2f}s ({t_full / max(t_tracked, 1e-9):.2f}x)")
+            if not mae <= args.tol:
+                print(f"[FAIL] {video}: mean AU abs diff {mae:.4f} > {args.tol}")
+                failed = True
+            else:
+                print(f"[✓] {video}: mean AU abs diff {mae:.4f}, activation agreement {au['agree'].mean():.3f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,47 +7,181 @@ UTILS = HERE / "utils"
 sys.path.insert(0, str(UTILS))
 
 # Local utils
-from video_preprocessing import standardize_video
-from frame_extraction import extract_frames
+from video_preprocessing import STANDARDIZE_MODES, standardize_video
+from frame_extraction import EXTRACT_MODES, TIMESTAMPS_FILE, extract_frames, iter_frames, iter_source_frames
+from adaptive_sampling import DEFAULTS as SAMPLING_DEFAULTS, format_stats, iter_adaptive_frames
+from stage_scheduler import run_stages, split_cpu_budget
+from frame_pipeline import FramePrefetcher, jpeg_dump_consumer, run_frame_pipeline
+from pyfeat_runner import default_num_threads
+from landmark_store import is_store
+from results_io import default_results_path
+from stage_cache import StageCache, code_version, output_digest
+from incremental import (FACE_LEVELS as REUSE_FACE_LEVELS, MAX_BITS as REUSE_MAX_BITS, FrameReuse, load_previous,
+                         reuse_consumer)
 
 # Landmarks optional
 try:
-    from landmark_detection import detect_landmarks
+    from landmark_detection import detect_landmarks, detect_landmarks_from_arrays, detect_landmarks_sharded
     HAVE_LANDMARKS = True
 except Exception:
     HAVE_LANDMARKS = False
 
+# Source files (in utils/) and packages whose changes invalidate a stage's cached results
+STAGE_CODE = {
+    "standardize": (["video_preprocessing.py"], []),
+    "frames": (["frame_extraction.py", "adaptive_sampling.py", "video_preprocessing.py"], ["opencv-python"]),
+    "pyfeat": (["pyfeat_runner.py", "pyfeat_service.py", "face_tracking.py", "results_io.py", "incremental.py"],
+               ["py-feat", "torch"]),
+    "landmarks": (["landmark_detection.py", "landmark_store.py"], ["mediapipe"]),
+}
+LANDMARK_FILES = ("*.npy", "*.json")
+FRAME_FILES = ("*.jpg", TIMESTAMPS_FILE)
 
-def main():
+
+def sample_frames(args, source_video, stats, reuse=None):
+    """
+    Frame iterator for the chosen --sampling strategy; yields (idx, t_sec, frame_bgr).
+
+    With reuse (an incremental.FrameReuse) every sample is matched to the previous run, and
+    the fixed grid snaps onto the previous run's frames.
+    """
+    resize_dim = (args.width, args.height)
+    if args.sampling == "adaptive":
+        frames = iter_adaptive_frames(str(source_video), min_interval_ms=args.min_sample_ms,
+                                      resize_dim=resize_dim, mode=args.extract_mode, stats=stats,
+                                      max_interval_ms=args.max_sample_ms,
+                                      budget_per_min=args.sample_budget_per_min,
+                                      motion_thr=args.motion_thr, hash_thr=args.hash_thr)
+        return reuse.tag(frames) if reuse is not None else frames
+    if reuse is not None:
+        return reuse.sample(iter_source_frames(str(source_video), resize_dim=resize_dim, mode=args.extract_mode),
+                            args.frame_every_ms / 1000.0)
+    return iter_frames(str(source_video), frame_interval_ms=args.frame_every_ms,
+                       resize_dim=resize_dim, mode=args.extract_mode)
+
+
+def sampling_params(args) -> dict:
+    """The options that decide which frames are sampled and how they look (part of the cache keys)."""
+    params = {"sampling": args.sampling, "size": [args.width, args.height], "extract_mode": args.extract_mode}
+    if args.sampling == "adaptive":
+        params.update(min_sample_ms=args.min_sample_ms, max_sample_ms=args.max_sample_ms,
+                      budget_per_min=args.sample_budget_per_min, motion_thr=args.motion_thr, hash_thr=args.hash_thr)
+    else:
+        params["frame_every_ms"] = args.frame_every_ms
+    return params
+
+
+def stage_code(args, stage: str) -> str:
+    files, packages = STAGE_CODE[stage]
+    if args.pipeline == "memory" and stage in ("pyfeat", "landmarks"):
+        files, packages = files + STAGE_CODE["frames"][0], packages + STAGE_CODE["frames"][1]  # frames sampled in-process
+    return code_version([UTILS / f for f in files], packages)
+
+
+def build_parser(batch: bool = False) -> argparse.ArgumentParser:
+    """main.py's options; batch.py reuses them for every video (without --video)."""
     ap = argparse.ArgumentParser(
-        description="End-to-end: video → frames → Py-Feat CSV → slim JSON"
+        description="End-to-end: video → frames → Py-Feat results → slim JSON"
     )
 
     # Inputs / outputs
-    ap.add_argument("--video", required=True, help="Path to input video")
+    if not batch:
+        ap.add_argument("--video", required=True, help="Path to input video")
     ap.add_argument("--workdir", default=".", help="Working directory")
-    ap.add_argument("--overwrite", action="store_true", help="Overwrite existing outputs")
+    ap.add_argument("--overwrite", action="store_true",
+                    help="Recompute every stage, ignoring (and replacing) cached results")
+    ap.add_argument("--cache_dir", default=None,
+                    help="Stage cache keyed by input content + parameters + code version "
+                         "(default: <workdir>/.stage_cache; share one across jobs to reuse their stages)")
+    ap.add_argument("--no_cache", action="store_true", help="Run every stage and keep no cache")
     ap.add_argument("--verbose", action="store_true", help="Verbose logs")
 
     # Standardize video
-    ap.add_argument("--std_fps", type=int, default=25)
+    ap.add_argument("--standardize", choices=STANDARDIZE_MODES, default="none",
+                    help="none: decode the upload directly; copy: fast stream copy to processed_video.mp4; "
+                         "encode: full libx264 re-encode (old behaviour)")
+    ap.add_argument("--std_fps", type=int, default=25, help="Only used with --standardize encode")
     ap.add_argument("--width", type=int, default=640)
     ap.add_argument("--height", type=int, default=480)
 
     # Frames
+    ap.add_argument("--pipeline", choices=["memory", "disk"], default="memory",
+                    help="memory: decoded frames go straight to the analyzers; disk: JPEGs in frames_dir (old)")
+    ap.add_argument("--queue_depth", type=int, default=8, help="Frames buffered per analyzer (memory pipeline)")
+    ap.add_argument("--dump_frames", action="store_true", help="Also write JPEGs to frames_dir (memory pipeline, debug)")
     ap.add_argument("--frame_every_ms", type=int, default=1000, help="Save one frame every N ms")
     ap.add_argument("--frames_dir", default="frames", help="Frames subdir")
+    ap.add_argument("--extract_mode", choices=EXTRACT_MODES, default="ffmpeg",
+                    help="ffmpeg: fps/scale filters in the decoder; grab: decode every frame, retrieve / convert only kept ones; "
+                         "seek: jump to each kept frame; read: decode + convert all")
+    ap.add_argument("--sampling", choices=["fixed", "adaptive"], default="fixed",
+                    help="fixed: one frame every --frame_every_ms; adaptive: dense while the speaker moves, "
+                         "sparse when static (within --sample_budget_per_min)")
+    ap.add_argument("--min_sample_ms", type=int, default=SAMPLING_DEFAULTS["min_interval_ms"],
+                    help="Adaptive: finest sampling interval (candidate frames)")
+    ap.add_argument("--max_sample_ms", type=int, default=SAMPLING_DEFAULTS["max_interval_ms"],
+                    help="Adaptive: always keep a frame after this long, even if static")
+    ap.add_argument("--sample_budget_per_min", type=float, default=SAMPLING_DEFAULTS["budget_per_min"],
+                    help="Adaptive: max analyzed frames per video minute")
+    ap.add_argument("--motion_thr", type=float, default=SAMPLING_DEFAULTS["motion_thr"],
+                    help="Adaptive: mean abs frame difference (0-1) that counts as motion")
+    ap.add_argument("--hash_thr", type=int, default=SAMPLING_DEFAULTS["hash_thr"],
+                    help="Adaptive: perceptual-hash bits (of 64) that count as a content change")
+
+    # Scheduling
+    ap.add_argument("--cpu_budget", type=int, default=0, help="Cores shared by Py-Feat and landmarks (0 = all)")
+    ap.add_argument("--pyfeat_share", type=float, default=0.5,
+                    help="Fraction of --cpu_budget for Py-Feat when landmarks run too")
+    ap.add_argument("--landmark_workers", type=int, default=0,
+                    help="MediaPipe processes, each on its own frame range (0 = from the CPU budget)")
 
     # Landmarks (optional)
     ap.add_argument("--run_landmarks", action="store_true", help="Run MediaPipe Holistic")
     ap.add_argument("--landmarks_dir", default="landmarks", help="Landmarks subdir")
+    ap.add_argument("--landmarks_mode", choices=["video", "static"], default="video",
+                    help="video: track landmarks across frames in order; static: detect from scratch on every frame (old)")
+    ap.add_argument("--landmarks_format", choices=["npy", "json"], default="npy",
+                    help="npy: one float32 frames x 543 x 4 store (memory-mappable); json: one file per frame (old)")
 
     # Py-Feat
-    ap.add_argument("--pyfeat_csv", default="output/pyfeat_results.csv", help="Py-Feat CSV path")
+    ap.add_argument("--pyfeat_results", "--pyfeat_csv", dest="pyfeat_csv", default=default_results_path(),
+                    help="Py-Feat results path: .parquet (float32 row groups, column-projected reads; default "
+                         "when pyarrow is installed) or .csv")
+    ap.add_argument("--pyfeat_backend", choices=["service", "local"], default="local",
+                    help="local: load Py-Feat for this run only (in-process / pyfeat_runner.py subprocess); "
+                         "service: warm background worker shared across runs (started on demand, stays up "
+                         "until idle for its --idle_timeout; stop it with pyfeat_service.py stop)")
+    ap.add_argument("--pyfeat_address", default=None,
+                    help="Worker socket path / pipe name (default: per-user temp path)")
+    ap.add_argument("--pyfeat_batch_size", type=int, default=8, help="Frames per Py-Feat detect call")
+    ap.add_argument("--pyfeat_threads", type=int, default=None,
+                    help="Torch threads for Py-Feat (default: its share of --cpu_budget; 1 on Windows)")
+    ap.add_argument("--pyfeat_workers", type=int, default=1,
+                    help="Py-Feat processes, each with its own Detector (disk pipeline, local backend only)")
+    ap.add_argument("--pyfeat_track_every", type=int, default=0,
+                    help="Full face detection every K frames, tracked face boxes in between (0 = off)")
+    ap.add_argument("--pyfeat_track_min_score", type=float, default=0.6,
+                    help="Tracker match score below which face detection runs again early")
+    ap.add_argument("--previous_run", nargs="?", const="", default=None,
+                    help="Memory pipeline: re-analyze a trimmed / edited upload incrementally, reusing the Py-Feat "
+                         "rows of unchanged frames from an earlier run (its workdir or results file; no value: "
+                         "this workdir)")
+    ap.add_argument("--reuse_hash_bits", type=int, default=REUSE_MAX_BITS,
+                    help="Frames whose dHash differs in at most this many bits (of 64) may be unchanged")
+    ap.add_argument("--reuse_face_levels", type=int, default=REUSE_FACE_LEVELS,
+                    help="... and whose face boxes differ by at most this many gray levels in every "
+                         "signature cell are unchanged (if exactly one previous frame matches)")
 
     # AU flags → JSON
     ap.add_argument("--out_json", default="output_flags.json", help="Final JSON path")
     ap.add_argument("--include_frames", action="store_true", help="Include per-frame JSON (bigger)")
+    ap.add_argument("--live_segments", action="store_true",
+                    help="Memory pipeline: also emit segments while Py-Feat runs, as each window closes "
+                         "(<out_json stem>.live.jsonl; running AU threshold estimate)")
+    ap.add_argument("--live_calibration_rows", type=int, default=0,
+                    help="Hold live segments until this many Py-Feat rows have calibrated the threshold")
+    ap.add_argument("--frames_format", choices=["inline", "jsonl", "columnar"], default="inline",
+                    help="Per-frame block: inside the JSON, or a JSON-lines / columnar sidecar next to it")
 
     # Segmenting & sparsification
     ap.add_argument("--fps_for_segments", type=float, default=1.0,
@@ -58,113 +192,334 @@ def main():
     ap.add_argument("--emo_margin", type=float, default=0.15)
     ap.add_argument("--cluster_min_rate", type=float, default=0.40)
 
-    args = ap.parse_args()
+    return ap
+
+
+def cpu_plan(args):
+    """(run_landmarks, pyfeat_threads, landmark_workers) for the CPU budget options."""
+    # Py-Feat (torch threads) and MediaPipe (worker processes) run side by side
+    run_landmarks = args.run_landmarks and HAVE_LANDMARKS
+    if args.run_landmarks and not HAVE_LANDMARKS:
+        print("[warn] landmark_detection unavailable; skipping.", flush=True)
+    shares = {"pyfeat": args.pyfeat_share, "landmarks": 1.0 - args.pyfeat_share} if run_landmarks else {"pyfeat": 1.0}
+    budget = split_cpu_budget(shares, args.cpu_budget or None)
+    pyfeat_threads = args.pyfeat_threads or min(budget["pyfeat"], default_num_threads())
+    landmark_workers = args.landmark_workers or budget.get("landmarks", 0)
+    if run_landmarks:
+        print(f"[info] CPU budget: Py-Feat {pyfeat_threads} threads, landmarks {landmark_workers} worker(s)", flush=True)
+    return run_landmarks, pyfeat_threads, landmark_workers
+
 
-    workdir = Path(args.workdir).resolve()
-    workdir.mkdir(parents=True, exist_ok=True)
+def video_job(args, video, workdir) -> dict:
+    """Paths of one video's run; the stage functions below fill in the rest."""
+    workdir = Path(workdir).resolve()
+    cache_dir = Path(args.cache_dir).resolve() if args.cache_dir else workdir / ".stage_cache"
+    return {
+        "video": Path(video).resolve(),
+        "workdir": workdir,
+        "cache": StageCache(cache_dir, enabled=not args.no_cache, refresh=args.overwrite),
+        "processed_video": workdir / "processed_video.mp4",
+        "frames_dir": workdir / args.frames_dir,
+        "landmarks_dir": workdir / args.landmarks_dir,
+        "pyfeat_csv": workdir / args.pyfeat_csv,
+        "out_json": workdir / args.out_json,
+    }
 
-    video_in = Path(args.video).resolve()
+
+def previous_results(args, job) -> Path:
+    """Results file of the run named by --previous_run: a workdir or a results file (empty: this workdir)."""
+    p = Path(args.previous_run).resolve() if args.previous_run else job["workdir"]
+    return p / args.pyfeat_csv if p.is_dir() else p
+
+
+def fetch_stage(args, job, stage: str, inputs: dict, params: dict, outputs: dict, label: str):
+    """Cache lookup for one stage: (spec, manifest). On a miss the manifest is None and old outputs are removed."""
+    cache = job["cache"]
+    spec = cache.stage(stage, inputs, params, stage_code(args, stage))
+    manifest = cache.fetch(spec, outputs)
+    if manifest is not None:
+        print(f"[skip] {label} up to date (cache {spec['key'][:12]})", flush=True)
+    else:
+        cache.clear(outputs)
+    return spec, manifest
+
+
+def analyzer_stages(args, job, plan, inputs: dict) -> dict:
+    """Cache lookups for Py-Feat and landmarks; returns the ones to run: name -> (spec, outputs)."""
+    run_landmarks, _, landmark_workers = plan
+    sampled = sampling_params(args) if args.pipeline == "memory" else {}
+    stages = {"pyfeat": ({**sampled, "batch_size": args.pyfeat_batch_size, "track_every": args.pyfeat_track_every,
+                          "track_min_score": args.pyfeat_track_min_score, "format": job["pyfeat_csv"].suffix},
+                         {"results": job["pyfeat_csv"]}, f"Py-Feat results {job['pyfeat_csv']}")}
+    if run_landmarks:
+        # Sharded video mode tracks each block of frames on its own
+        stages["landmarks"] = ({**sampled, "mode": args.landmarks_mode, "format": args.landmarks_format,
+                                "sharded": args.landmarks_mode == "video" and landmark_workers > 1},
+                               {"landmarks": (job["landmarks_dir"], LANDMARK_FILES)},
+                               f"Landmarks in {job['landmarks_dir']}")
+    todo = {}
+    for name, (params, outputs, label) in stages.items():
+        spec, manifest = fetch_stage(args, job, name, inputs, params, outputs, label)
+        if manifest is None:
+            todo[name] = (spec, outputs)
+    return todo
+
+
+def prepare_video(args, job, plan, prefetch: int = 0) -> int:
+    """
+    Step 1, plus frame sampling: JPEG extraction (disk pipeline) or the frame iterator (memory).
+
+    Every stage is looked up in the stage cache first; only stages whose inputs, parameters
+    or code changed run again. With prefetch > 0 the memory pipeline starts decoding right
+    away, up to that many frames ahead of the analyzers (batch mode: the next video decodes
+    while this one is analyzed).
+    """
+    video_in, processed_video, frames_dir = job["video"], job["processed_video"], job["frames_dir"]
+    cache = job["cache"]
+    job["workdir"].mkdir(parents=True, exist_ok=True)
     if not video_in.exists():
         print(f"[error] Video not found: {video_in}", flush=True)
         return 2
 
-    processed_video = workdir / "processed_video.mp4"
-    frames_dir = workdir / args.frames_dir
-    landmarks_dir = workdir / args.landmarks_dir
-    pyfeat_csv = workdir / args.pyfeat_csv
-    out_json = workdir / args.out_json
-    au_flags_py = HERE / "utils" / "au_flags.py"
-
-    # 1) Standardize video
-    if processed_video.exists() and not args.overwrite:
-        print(f"[skip] Standardized video exists: {processed_video}", flush=True)
-    else:
-        print("[1/5] Standardizing video…", flush=True)
-        standardize_video(str(video_in), str(processed_video),
-                          fps=args.std_fps, resolution=(args.width, args.height))
-        print(f"[ok] Saved: {processed_video}", flush=True)
-
-    # 2) Extract frames (clear old if overwriting)
-    if frames_dir.exists() and any(frames_dir.glob("*.jpg")) and not args.overwrite:
-        count = len(list(frames_dir.glob("*.jpg")))
-        print(f"[skip] Frames already present: {frames_dir} ({count} jpgs)", flush=True)
+    # 1) Standardize video (optional: frames are normally decoded, resampled and scaled
+    #    straight from the upload in step 2, without an intermediate re-encode)
+    if args.standardize == "none":
+        source_video, source_digest = video_in, cache.digest(video_in)
+        print("[1/5] No standardization; decoding the input directly.", flush=True)
     else:
+        outputs = {"video": processed_video}
+        spec, manifest = fetch_stage(args, job, "standardize", {"video": cache.digest(video_in)},
+                                     {"mode": args.standardize, "fps": args.std_fps, "size": [args.width, args.height]},
+                                     outputs, f"Standardized video {processed_video}")
+        if manifest is None:
+            print(f"[1/5] Standardizing video ({args.standardize})…", flush=True)
+            standardize_video(str(video_in), str(processed_video),
+                              fps=args.std_fps, resolution=(args.width, args.height),
+                              mode=args.standardize)
+            manifest = cache.store(spec, outputs)
+            print(f"[ok] Saved: {processed_video}", flush=True)
+        source_video, source_digest = processed_video, output_digest(manifest, "video")
+    job["source_video"] = source_video
+    job["sampling_stats"] = {}
+
+    if args.pipeline == "memory":
+        # Read before the cache lookup, which clears outdated outputs (maybe this very file)
+        job["previous"] = load_previous(previous_results(args, job)) if args.previous_run is not None else None
+        # Frames are decoded in steps 2-4, and only if an analyzer has to run
+        job["pending"] = analyzer_stages(args, job, plan, {"video": source_digest})
+        job["frames"] = None
+        job["reuse"] = None
+        if job["pending"]:
+            if job["previous"] is not None and "pyfeat" in job["pending"]:
+                job["reuse"] = FrameReuse(job["previous"], args.reuse_hash_bits, args.reuse_face_levels)
+            frames = sample_frames(args, source_video, job["sampling_stats"], job["reuse"])
+            job["frames"] = FramePrefetcher(frames, prefetch) if prefetch > 0 else frames
+        return 0
+
+    if args.previous_run is not None:
+        print("[warn] --previous_run needs --pipeline memory; analyzing every frame.", flush=True)
+
+    # 2) Extract frames
+    outputs = {"frames": (frames_dir, FRAME_FILES)}
+    spec, manifest = fetch_stage(args, job, "frames", {"video": source_digest}, sampling_params(args),
+                                 outputs, f"Frames in {frames_dir}")
+    if manifest is None:
         print("[2/5] Extracting frames…", flush=True)
         frames_dir.mkdir(parents=True, exist_ok=True)
-        if args.overwrite:
-            for p in frames_dir.glob("*.jpg"):
-                try: p.unlink()
-                except Exception: pass
-        extract_frames(str(processed_video), str(frames_dir),
-                       frame_interval_ms=args.frame_every_ms,
-                       resize_dim=(args.width, args.height))
-
-    # 3) Landmarks (optional; clear old if overwriting)
-    if args.run_landmarks:
-        if not HAVE_LANDMARKS:
-            print("[warn] landmark_detection unavailable; skipping.", flush=True)
-        else:
-            print("[3/5] Running landmarks…", flush=True)
-            landmarks_dir.mkdir(parents=True, exist_ok=True)
-            if args.overwrite:
-                for p in landmarks_dir.glob("*.json"):
-                    try: p.unlink()
-                    except Exception: pass
-            detect_landmarks(str(frames_dir), output_json_dir=str(landmarks_dir))
-
-    # 4) Py-Feat → CSV (subprocess; avoids Windows handle issues)
-    if pyfeat_csv.exists() and not args.overwrite:
-        print(f"[skip] Py-Feat CSV exists: {pyfeat_csv}", flush=True)
-    else:
-        print("[4/5] Running Py-Feat on frames…", flush=True)
+        extract_frames(str(source_video), str(frames_dir),
+                       frames=sample_frames(args, source_video, job["sampling_stats"]))
+        if args.sampling == "adaptive":
+            print(f"[info] Adaptive sampling: {format_stats(job['sampling_stats'])}", flush=True)
+        manifest = cache.store(spec, outputs)
+    job["pending"] = analyzer_stages(args, job, plan, {"frames": output_digest(manifest, "frames")})
+    return 0
+
+
+def analyze_video(args, job, plan, detector=None) -> int:
+    """
+    Steps 2-4 (memory pipeline) or 3-4 (disk): Py-Feat and, optionally, landmarks, for the
+    stages prepare_video did not find in the cache; their results are added to it.
+
+    plan is cpu_plan(args). A warm Py-Feat Detector can be passed in (local backend) so
+    consecutive videos do not reload the models.
+    """
+    _, pyfeat_threads, landmark_workers = plan
+    frames_dir, landmarks_dir, pyfeat_csv = job["frames_dir"], job["landmarks_dir"], job["pyfeat_csv"]
+    pending, cache = job["pending"], job["cache"]
+    if args.live_segments and args.pipeline == "memory" and "pyfeat" not in pending:
+        print("[info] Py-Feat results came from the cache; no live segments this run.", flush=True)
+    if not pending:
+        return 0
+
+    if args.pipeline == "memory":
+        # 2-4) Decode once; frames go straight from the decoder to Py-Feat and MediaPipe
+        #      through bounded queues, without JPEGs on disk. Both analyzers run concurrently.
+        print("[2-4/5] Decoding frames and running analyzers in memory…", flush=True)
+        consumers = {}
+        live = None
+        if "pyfeat" in pending:
+            if args.pyfeat_backend == "service":
+                from pyfeat_service import run_arrays_via_service as run_pyfeat
+                pyfeat_kw = {"address": args.pyfeat_address}
+            else:
+                from pyfeat_runner import run_pyfeat_on_arrays as run_pyfeat
+                pyfeat_kw = {"detector": detector}
+
+            if args.live_segments and job["previous"] is not None:
+                print("[warn] --live_segments is off for incremental runs; segments are built at the end.",
+                      flush=True)
+            elif args.live_segments:
+                from au_stream import OnlineSegmenter, SegmentLog
+                out_json = job["out_json"]
+                live_path = out_json.with_name(out_json.stem + ".live.jsonl")
+                live = SegmentLog(str(live_path), OnlineSegmenter(
+                    fps=args.fps_for_segments, win_sec=args.win_sec, hop_sec=args.hop_sec, emo_min=args.emo_min,
+                    emo_margin=args.emo_margin, cluster_min_rate=args.cluster_min_rate,
+                    calibration_rows=args.live_calibration_rows), echo=args.verbose)
+                pyfeat_kw["on_rows"] = live
+
+            pyfeat_csv.parent.mkdir(parents=True, exist_ok=True)
+            run_to = lambda frames, path: run_pyfeat(
+                frames, path, batch_size=args.pyfeat_batch_size, num_threads=pyfeat_threads,
+                track_every=args.pyfeat_track_every, track_min_score=args.pyfeat_track_min_score, **pyfeat_kw)
+            consumers["pyfeat"] = lambda frames: run_to(frames, str(pyfeat_csv))
+            if job["reuse"] is not None:
+                # Unchanged frames take the previous rows; only the rest reach Py-Feat
+                consumers["pyfeat"] = reuse_consumer(run_to, job["reuse"], str(pyfeat_csv))
+        if "landmarks" in pending:
+            if landmark_workers > 1:
+                consumers["landmarks"] = lambda frames: detect_landmarks_sharded(
+                    frames, output_dir=str(landmarks_dir), workers=landmark_workers,
+                    mode=args.landmarks_mode, output_format=args.landmarks_format)
+            else:
+                consumers["landmarks"] = lambda frames: detect_landmarks_from_arrays(
+                    frames, output_dir=str(landmarks_dir),
+                    mode=args.landmarks_mode, output_format=args.landmarks_format)
+        if args.dump_frames:
+            consumers["jpeg"] = jpeg_dump_consumer(str(frames_dir))
+
+        results, errors = run_frame_pipeline(job["frames"], consumers, queue_depth=args.queue_depth)
+        if live is not None:
+            print(f"[info] Live segments: {live.close()} -> {live_path}", flush=True)
+        if args.sampling == "adaptive":
+            print(f"[info] Adaptive sampling: {format_stats(job['sampling_stats'])}", flush=True)
+        if "landmarks" in pending and "landmarks" not in errors and job["reuse"] is None:
+            cache.store(*pending["landmarks"])  # (incremental runs sample where the previous run did)
+        if "pyfeat" in pending:
+            if "pyfeat" in errors or results.get("pyfeat") is None or not pyfeat_csv.exists():
+                print("[error] Py-Feat did not produce any results.", flush=True)
+                return 3
+            if job["reuse"] is None:  # reused rows are close, not exact: keep them out of the cache
+                cache.store(*pending["pyfeat"])
+        return 0
+
+    if args.live_segments:
+        print("[warn] --live_segments needs --pipeline memory; segments are built at the end.", flush=True)
+
+    # 3) Landmarks (optional)
+    def landmarks_stage():
+        print("[3/5] Running landmarks…", flush=True)
+        landmarks_dir.mkdir(parents=True, exist_ok=True)
+        return detect_landmarks(str(frames_dir), output_dir=str(landmarks_dir),
+                                mode=args.landmarks_mode, output_format=args.landmarks_format,
+                                workers=landmark_workers)
+
+    # 4) Py-Feat → results file (separate process unless a warm Detector is given; avoids Windows handle issues)
+    def pyfeat_stage():
         pyfeat_csv.parent.mkdir(parents=True, exist_ok=True)
+        if args.pyfeat_backend == "service":
+            print("[4/5] Running Py-Feat on frames (worker)…", flush=True)
+            from pyfeat_service import run_frame_dir_via_service
+            try:
+                run_frame_dir_via_service(str(frames_dir), str(pyfeat_csv), address=args.pyfeat_address,
+                                          num_threads=pyfeat_threads, batch_size=args.pyfeat_batch_size,
+                                          track_every=args.pyfeat_track_every,
+                                          track_min_score=args.pyfeat_track_min_score)
+            except Exception as e:
+                print(f"[error] Py-Feat worker failed: {e}", flush=True)
+            return pyfeat_csv.exists()
+
+        print("[4/5] Running Py-Feat on frames…", flush=True)
+        if detector is not None and args.pyfeat_workers <= 1:
+            from pyfeat_runner import run_pyfeat_on_frames
+            return run_pyfeat_on_frames(str(frames_dir), str(pyfeat_csv), batch_size=args.pyfeat_batch_size,
+                                        track_every=args.pyfeat_track_every,
+                                        track_min_score=args.pyfeat_track_min_score,
+                                        detector=detector) is not None
+
         runner = HERE / "utils" / "pyfeat_runner.py"
         cmd = [
             sys.executable, str(runner),
             "--frame_dir", str(frames_dir),
             "--output_csv", str(pyfeat_csv),
+            "--batch_size", str(args.pyfeat_batch_size),
+            "--workers", str(args.pyfeat_workers),
+            "--track_every", str(args.pyfeat_track_every),
+            "--track_min_score", str(args.pyfeat_track_min_score),
+            "--num_threads", str(pyfeat_threads),
         ]
         proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
         for line in proc.stdout:
             print(line, end="", flush=True)
         proc.wait()
-        if proc.returncode != 0 or not pyfeat_csv.exists():
-            print("[error] Py-Feat did not produce the CSV.", flush=True)
+        return proc.returncode == 0 and pyfeat_csv.exists()
+
+    # 3+4 only read the frames, so they run concurrently
+    stage_fns = {"landmarks": landmarks_stage, "pyfeat": pyfeat_stage}
+    results, errors, _ = run_stages({name: stage_fns[name] for name in pending})
+    if "landmarks" in pending and "landmarks" not in errors:
+        cache.store(*pending["landmarks"])
+    if "pyfeat" in pending:
+        if not results.get("pyfeat"):
+            print("[error] Py-Feat did not produce any results.", flush=True)
             return 3
+        cache.store(*pending["pyfeat"])
+    return 0
+
+
+def finish_video(args, job, plan) -> int:
+    """Step 5: AU flags (+ body metrics) → slim JSON, in this process."""
+    run_landmarks = plan[0]
+    landmarks_dir, out_json = job["landmarks_dir"], job["out_json"]
 
-    # 5) AU flags → slim JSON (force frame-based time)
+    # Time from the per-sample timestamps; rows/fps only as a fallback
     print("[5/5] Building slim JSON segments…", flush=True)
-    cmd = [
-        sys.executable, str(au_flags_py),
-        "--in_csv", str(pyfeat_csv),
-        "--out_json", str(out_json),
-        "--fps", str(args.fps_for_segments),
-        "--win_sec", str(args.win_sec),
-        "--hop_sec", str(args.hop_sec),
-        "--emo_min", str(args.emo_min),
-        "--emo_margin", str(args.emo_margin),
-        "--cluster_min_rate", str(args.cluster_min_rate),
-        "--prefer_frame_time",
-    ]
-    if args.include_frames:
-        cmd.append("--include_frames")
-    if args.verbose:
-        cmd.append("--verbose")
-
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    for line in proc.stdout:
-        print(line, end="", flush=True)
-    proc.wait()
-    if proc.returncode != 0:
-        print("[error] au_flags.py failed.", flush=True)
+    from au_flags import analyze, write_output
+    try:
+        flags = analyze(str(job["pyfeat_csv"]), fps=args.fps_for_segments, win_sec=args.win_sec,
+                        hop_sec=args.hop_sec, emo_min=args.emo_min, emo_margin=args.emo_margin,
+                        cluster_min_rate=args.cluster_min_rate, include_frames=args.include_frames,
+                        verbose=args.verbose)
+    except Exception as e:
+        print(f"[error] au_flags failed: {e}", flush=True)
         return 4
 
+    # Body-language metrics from the landmark store, on the same window grid as the AU segments
+    if run_landmarks and args.landmarks_format == "npy" and is_store(str(landmarks_dir)):
+        from body_metrics import add_body_metrics
+        add_body_metrics(flags, str(landmarks_dir), fps=args.fps_for_segments)
+        print(f"[info] Body metrics merged into {len(flags['segments'])} segments.", flush=True)
+
+    write_output(flags, str(out_json), args.frames_format, verbose=args.verbose)
+    job["segments"] = len(flags["segments"])
+    print(f"[done] Wrote {out_json} with {job['segments']} segments.", flush=True)
+    return 0
+
+
+def main():
+    args = build_parser().parse_args()
+    job = video_job(args, args.video, args.workdir)
+    plan = cpu_plan(args)
+    code = prepare_video(args, job, plan) or analyze_video(args, job, plan) or finish_video(args, job, plan)
+    if code:
+        return code
+
     print("\n=== DONE ===", flush=True)
-    print(f"Video     : {video_in}", flush=True)
-    print(f"Frames    : {frames_dir}", flush=True)
-    print(f"Py-Feat   : {pyfeat_csv}", flush=True)
-    print(f"JSON      : {out_json}", flush=True)
-    print(json.dumps({"json_path": str(out_json)}, indent=2), flush=True)
+    print(f"Video     : {job['video']}", flush=True)
+    print(f"Frames    : {job['frames_dir']}", flush=True)
+    print(f"Py-Feat   : {job['pyfeat_csv']}", flush=True)
+    print(f"JSON      : {job['out_json']}", flush=True)
+    print(json.dumps({"json_path": str(job["out_json"])}, indent=2), flush=True)
     return 0
 
 
@@ -0,0 +1,127 @@
+"""
+Adaptive frame sampling: spend Py-Feat / MediaPipe work where the speaker is moving.
+
+Candidate frames are decoded at a fine interval (min_interval_ms) and scored with two cheap
+signals on a 64x48 grayscale thumbnail:
+- motion: mean absolute difference to the previous candidate (is something moving right now?)
+- content change: Hamming distance of a 64-bit difference hash (dHash) to the last kept sample
+  (has the picture drifted since we last looked?)
+
+A candidate is kept when either signal crosses its threshold, subject to a token-bucket budget
+of `budget_per_min` samples per video minute; a frame is always kept after `max_interval_ms`
+so static stretches are still covered sparsely. Samples keep their real timestamps.
+"""
+
+from typing import Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Frame = Tuple[int, float, np.ndarray]  # (sample_idx, t_sec, frame_bgr)
+
+THUMB_SIZE = (64, 48)
+DEFAULTS = {
+    "min_interval_ms": 250,
+    "max_interval_ms": 3000,
+    "budget_per_min": 40.0,
+    "motion_thr": 0.02,   # mean |diff| as a fraction of full scale
+    "hash_thr": 6,        # dHash bits out of 64
+    "burst_sec": 10.0,    # how much unused budget can be saved up for a burst of motion
+}
+
+
+def thumbnail(frame_bgr: np.ndarray) -> np.ndarray:
+    gray = frame_bgr if frame_bgr.ndim == 2 else cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def dhash(thumb: np.ndarray) -> np.ndarray:
+    """64-bit difference hash as a bool array (brighter-than-right-neighbour on a 9x8 grid)."""
+    small = cv2.resize(thumb, (9, 8), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+def change_scores(thumb, prev_thumb, hash_bits, sample_hash) -> Tuple[float, int]:
+    """(motion vs previous candidate in [0, 1], dHash bits changed since the last sample)."""
+    motion = float(np.mean(np.abs(thumb - prev_thumb))) / 255.0 if prev_thumb is not None else 1.0
+    bits = int(np.count_nonzero(hash_bits != sample_hash)) if sample_hash is not None else 64
+    return motion, bits
+
+
+def adaptive_frames(
+    candidates: Iterable[Frame],
+    max_interval_ms: float = DEFAULTS["max_interval_ms"],
+    budget_per_min: float = DEFAULTS["budget_per_min"],
+    motion_thr: float = DEFAULTS["motion_thr"],
+    hash_thr: int = DEFAULTS["hash_thr"],
+    burst_sec: float = DEFAULTS["burst_sec"],
+    stats: Optional[dict] = None,
+) -> Iterator[Frame]:
+    """
+    Filter densely decoded candidates down to the adaptive sample set.
+
+    Yields (sample_idx, t_sec, frame_bgr) with sample_idx renumbered 0..N-1 and t_sec taken
+    from the candidate. If `stats` is given it is filled with counts (candidates, samples,
+    by reason, duration) for logging.
+    """
+    rate = budget_per_min / 60.0  # samples per second
+    # The static floor itself must fit in the budget.
+    max_gap = max(max_interval_ms / 1000.0, 1.0 / rate if rate > 0 else float("inf"))
+    capacity = max(1.0, rate * burst_sec)
+    tokens = capacity
+    st = stats if stats is not None else {}
+    st.update(candidates=0, samples=0, motion=0, content=0, floor=0, skipped_budget=0, duration=0.0)
+
+    prev_thumb = sample_hash = None
+    last_t = prev_t = None
+    out_idx = 0
+    for _, t_sec, frame in candidates:
+        st["candidates"] += 1
+        st["duration"] = t_sec
+        if prev_t is not None:
+            tokens = min(capacity, tokens + (t_sec - prev_t) * rate)
+        prev_t = t_sec
+
+        thumb = thumbnail(frame)
+        bits = dhash(thumb)
+        motion, changed = change_scores(thumb, prev_thumb, bits, sample_hash)
+        prev_thumb = thumb
+
+        reason = None
+        if last_t is None or t_sec - last_t >= max_gap:
+            reason = "floor"
+        elif motion >= motion_thr or changed >= hash_thr:
+            if tokens >= 1.0:
+                reason = "motion" if motion >= motion_thr else "content"
+            else:
+                st["skipped_budget"] += 1
+        if reason is None:
+            continue
+
+        tokens -= 1.0
+        last_t, sample_hash = t_sec, bits
+        st[reason] += 1
+        st["samples"] += 1
+        yield out_idx, t_sec, frame
+        out_idx += 1
+
+
+def iter_adaptive_frames(
+    video_path,
+    min_interval_ms: int = DEFAULTS["min_interval_ms"],
+    resize_dim=(640, 480),
+    mode: str = "grab",
+    stats: Optional[dict] = None,
+    **kwargs,
+) -> Iterator[Frame]:
+    """frame_extraction.iter_frames at `min_interval_ms`, filtered by adaptive_frames(**kwargs)."""
+    from frame_extraction import iter_frames
+    candidates = iter_frames(video_path, frame_interval_ms=min_interval_ms, resize_dim=resize_dim, mode=mode)
+    yield from adaptive_frames(candidates, stats=stats, **kwargs)
+
+
+def format_stats(stats: dict) -> str:
+    minutes = max(stats.get("duration", 0.0), 1e-9) / 60.0
+    return (f"{stats['samples']}/{stats['candidates']} candidates kept "
+            f"({stats['samples'] / minutes:.1f}/min; motion={stats['motion']}, content={stats['content']}, "
+            f"floor={stats['floor']}, over budget={stats['skipped_budget']})")
@@ -1,17 +1,28 @@
 #!/usr/bin/env python3
 """
-Compute 4 AU cluster flags per frame from a Py-Feat AU CSV and output JSON.
+Compute 4 AU cluster flags per frame from Py-Feat results (CSV or Parquet) and output JSON.
+
+Library use: analyze(df_or_path, ...) returns the segments structure in memory and
+write_output(out, path) writes it; the CLI below is a thin wrapper around both.
+
+Only the AU, emotion and time/frame columns are read from the results file.
 
 Outputs:
 - Slim segment summaries for LLM (dominant emotions + active clusters)
-- Optional per-frame blob if --include_frames is passed
+- Optional per-frame block if --include_frames is passed (inline, JSON lines or columnar; see frames_writer.py)
 """
 
 import argparse, json, math
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+from results_io import read_results, result_columns
+from frames_writer import (FRAME_FORMATS, block_columns, frame_block, sidecar_path, write_columnar, write_jsonl,
+                           write_with_inline_frames)
+from windowing import window_counts, window_grid, window_means
+
 DEFAULTS = {
     "thr_hi": 1.5,
     "thr_lo": 0.3,
@@ -36,6 +47,10 @@ def resolve_time_series(
     If prefer_frame_time=True, ignore any CSV columns and just use the row index
     (0..N-1) / fps_fallback. This is robust even if the CSV has a non-numeric
     'frame' column like 'frame_0003.jpg'.
+
+    Otherwise a timestamp column (real sample times, e.g. from adaptive sampling)
+    wins, then a numeric frame column / fps_fallback, then row index / fps_fallback;
+    columns without any span (e.g. Py-Feat's per-image frame=0) are skipped.
     """
     # 1) Force row-index-based time if requested
     if prefer_frame_time:
@@ -47,7 +62,7 @@ def resolve_time_series(
         if tcol in df.columns:
             raw = pd.to_numeric(df[tcol], errors="coerce")
             if raw.notna().any():
-                s = raw.fillna(method="ffill").fillna(0.0).astype(float)
+                s = raw.ffill().fillna(0.0).astype(float)
                 if float(s.max() - s.min()) >= min_span_sec:
                     return s
 
@@ -56,8 +71,9 @@ def resolve_time_series(
         if fcol in df.columns:
             frames = pd.to_numeric(df[fcol], errors="coerce")
             if frames.notna().any():
-                frames = frames.fillna(method="ffill").fillna(0.0)
-                return frames.astype(float) / float(max(fps_fallback, 1e-9))
+                frames = frames.ffill().fillna(0.0).astype(float)
+                if float(frames.max() - frames.min()) > 0:
+                    return frames / float(max(fps_fallback, 1e-9))
 
     # 4) Fallback to row index / fps
     idx = pd.RangeIndex(len(df))
@@ -65,6 +81,7 @@ def resolve_time_series(
 
 
 def make_overlapping_segments(times: pd.Series, win_sec: float = 5.0, hop_sec: float = 2.0):
+    """Per-window boolean masks (reference implementation; analyze() uses window_aggregates)."""
     end_time = float(times.max()) if len(times) else 0.0
     # Always produce at least one window
     t0 = 0.0
@@ -79,6 +96,29 @@ def make_overlapping_segments(times: pd.Series, win_sec: float = 5.0, hop_sec: f
         t0 += hop_sec
 
 
+def window_aggregates(times: pd.Series, flags_df: pd.DataFrame, emotions_df: pd.DataFrame,
+                      win_sec: float = 5.0, hop_sec: float = 2.0):
+    """
+    (t0, t1, cluster_rates, emo_means) per window, on the make_overlapping_segments grid.
+
+    All windows come from one pass over the rows (windowing.py): cluster rates are exact,
+    emotion means skip NaN and are None for windows without any value.
+    """
+    t = times.to_numpy(dtype=float)
+    grid = window_grid(float(t.max()) if len(t) else 0.0, win_sec, hop_sec)
+    counts = window_counts(t, grid)
+    rates = window_means(t, flags_df.to_numpy(dtype=float), grid)
+    emos = window_means(t, emotions_df.to_numpy(dtype=float), grid)
+    for i, (t0, t1) in enumerate(grid):
+        if counts[i] == 0:
+            cluster_rates = {name: 0.0 for name in flags_df.columns}
+            emo_means = {col: None for col in emotions_df.columns}
+        else:
+            cluster_rates = {name: float(v) for name, v in zip(flags_df.columns, rates[i])}
+            emo_means = {col: (None if np.isnan(v) else float(v)) for col, v in zip(emotions_df.columns, emos[i])}
+        yield t0, t1, cluster_rates, emo_means
+
+
 def fmt_range(a: float, b: float) -> str:
     s0, s1 = int(round(a)), int(round(b))
     m0, r0 = divmod(s0, 60)
@@ -104,6 +144,14 @@ def canonical_au_variants(base_au: str) -> List[Tuple[str,str]]:
         (f"AU{n}_r","intensity"), (f"AU{n}_c","presence"), (f"AU{n}","intensity"),
     ]
 
+TIME_COLS = ["timestamp", "time", "Timestamp", "Time", "frame", "Frame"]
+
+def needed_columns(clusters: Dict[str, dict] = None) -> List[str]:
+    """Every results column this script may use: AU name variants, emotions and time/frame keys."""
+    clusters = clusters or BASE_CLUSTERS
+    aus = sorted({au for spec in clusters.values() for au in spec["aus"]})
+    return [col for au in aus for col, _ in canonical_au_variants(au)] + EMOTION_COLS + TIME_COLS
+
 def locate_column(df: pd.DataFrame, base_au: str) -> Optional[Tuple[str,str]]:
     for col, kind in canonical_au_variants(base_au):
         if col in df.columns:
@@ -138,6 +186,25 @@ def compute_cluster_flag(row_vals: List[float], rule: str, thr: float) -> bool:
     if rule == "any_max": return max(vals) >= thr
     return False
 
+def compute_cluster_flags(vals: np.ndarray, rule: str, thr: float) -> np.ndarray:
+    """compute_cluster_flag over a whole frames x AUs matrix at once (same results, NaN -> 0)."""
+    v = np.asarray(vals, dtype=float)
+    v = np.where(np.isnan(v), 0.0, v)
+    n_rows, n_aus = v.shape
+    if n_aus == 0:
+        return np.zeros(n_rows, dtype=bool)
+    if rule == "min_and":
+        return v.min(axis=1) >= thr
+    if rule == "avg_and_majority":
+        total = v[:, 0].copy()
+        for j in range(1, n_aus):  # left to right, as sum() does
+            total += v[:, j]
+        count_ok = (v >= thr).sum(axis=1) >= math.ceil(n_aus / 2)
+        return (total / n_aus >= thr) & count_ok
+    if rule == "any_max":
+        return v.max(axis=1) >= thr
+    return np.zeros(n_rows, dtype=bool)
+
 # ---------- Segment sparsification ----------
 def sparsify_emotions(emo_means: Dict[str, Optional[float]], p_min: float, margin: float) -> Dict[str, float]:
     vals = {k: float(v) for k, v in emo_means.items() if v is not None}
@@ -152,21 +219,35 @@ def sparsify_emotions(emo_means: Dict[str, Optional[float]], p_min: float, margi
 def sparsify_clusters(cluster_rates: Dict[str, float], min_rate: float) -> Dict[str, float]:
     return {k: round(float(v), 2) for k, v in cluster_rates.items() if v is not None and float(v) >= min_rate}
 
-# ---------- Main ----------
-def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
-         verbose: bool, print_cols: bool, dump_stats: bool, sample_n: int,
-         fps: float, win_sec: float, hop_sec: float,
-         emo_min: float, emo_margin: float, cluster_min_rate: float,
-         prefer_frame_time: bool, include_frames: bool):
-
-    if verbose: print(f"[info] Loading CSV: {in_csv}")
-    df = pd.read_csv(in_csv)
-
-    if print_cols:
-        print("[info] CSV columns:")
-        for c in df.columns: print("  -", c)
+# ---------- Library API ----------
+def load_results(in_results: str, verbose: bool = False) -> pd.DataFrame:
+    """Read just the columns analyze() uses from a Py-Feat results file (.csv or .parquet)."""
+    if verbose: print(f"[info] Loading results: {in_results}")
+    df = read_results(in_results, columns=needed_columns())
+    if verbose: print(f"[info] Read {len(df.columns)} columns x {len(df)} rows")
+    return df
+
+
+def analyze(data, thr_hi: float = DEFAULTS["thr_hi"], thr_lo: float = DEFAULTS["thr_lo"],
+            fps: float = DEFAULTS["fps"], win_sec: float = DEFAULTS["win_sec"], hop_sec: float = DEFAULTS["hop_sec"],
+            emo_min: float = DEFAULTS["emo_min"], emo_margin: float = DEFAULTS["emo_margin"],
+            cluster_min_rate: float = DEFAULTS["cluster_min_rate"], prefer_frame_time: bool = False,
+            include_frames: bool = False, verbose: bool = False, dump_stats: bool = False, sample_n: int = 0,
+            source: Optional[str] = None) -> dict:
+    """
+    Segments for one video, in memory.
 
+    data: Py-Feat rows as a DataFrame, a dict of column arrays, or a results file path.
+    Returns {"metadata": ..., "segments": [...]} as written to the JSON; with include_frames,
+    also "frames": the per-frame block as arrays (see frames_writer.frame_block).
+    """
+    if isinstance(data, (str, Path)):
+        source = source or str(data)
+        df = load_results(str(data), verbose=verbose)
+    else:
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
     clusters = dict(BASE_CLUSTERS)
+
     needed_aus = sorted({au for spec in clusters.values() for au in spec["aus"]})
     au_series: Dict[str, pd.Series] = {}
     au_resolved_cols: Dict[str, str] = {}
@@ -208,8 +289,7 @@ def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
     # Per-frame flags
     flags_df = pd.DataFrame(index=df.index)
     for cname, spec in clusters.items():
-        vals_mat = aus_df[spec["aus"]].values
-        flags_df[cname] = [compute_cluster_flag(list(row), spec["rule"], thr) for row in vals_mat]
+        flags_df[cname] = compute_cluster_flags(aus_df[spec["aus"]].to_numpy(dtype=float), spec["rule"], thr)
         if verbose:
             print(f"[info] Cluster '{cname}': active frames = {int(flags_df[cname].sum())}/{len(flags_df)}")
 
@@ -221,28 +301,6 @@ def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
     # Emotions present?
     available_emotions = [c for c in EMOTION_COLS if c in df.columns]
 
-    # Optional per-frame JSON
-    frames = None
-    if include_frames:
-        frames = []
-        for i in range(len(flags_df)):
-            rec = {k: bool(flags_df.iloc[i][k]) for k in flags_df.columns}
-            rec["index"] = int(i)
-            if frame_key is not None:
-                val = df.loc[i, frame_key]
-                try: rec[frame_key] = int(val)
-                except Exception:
-                    try: rec[frame_key] = float(val)
-                    except Exception: rec[frame_key] = str(val)
-            if available_emotions:
-                emo = {}
-                for col in available_emotions:
-                    v = df.loc[i, col]
-                    try: emo[col] = float(v)
-                    except Exception: emo[col] = v if pd.notna(v) else None
-                rec["emotions"] = emo
-            frames.append(rec)
-
     # Segments
     times = resolve_time_series(df, fps_fallback=fps, prefer_frame_time=prefer_frame_time)
     if verbose:
@@ -251,22 +309,9 @@ def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
             f"(fps={fps:.3f}) -> duration~{duration:.3f}s, rows={len(times)}")
 
     segments_out = []
-    for seg_start, seg_end, m in make_overlapping_segments(times, win_sec=win_sec, hop_sec=hop_sec):
-        n = int(m.sum())
-        if n == 0:
-            cluster_rates = {name: 0.0 for name in flags_df.columns}
-            emo_means = {col: None for col in available_emotions}
-        else:
-            cluster_rates = {name: float(flags_df.loc[m, name].mean()) for name in flags_df.columns}
-            if available_emotions:
-                emo_means = (df.loc[m, available_emotions]
-                               .apply(pd.to_numeric, errors="coerce")
-                               .mean(skipna=True)
-                               .to_dict())
-                emo_means = {k: (None if pd.isna(v) else float(v)) for k, v in emo_means.items()}
-            else:
-                emo_means = {}
-
+    emotions_df = df[available_emotions].apply(pd.to_numeric, errors="coerce")
+    for seg_start, seg_end, cluster_rates, emo_means in window_aggregates(times, flags_df, emotions_df,
+                                                                           win_sec=win_sec, hop_sec=hop_sec):
         emotions_sparse = sparsify_emotions(emo_means, p_min=emo_min, margin=emo_margin) if available_emotions else {}
         clusters_sparse = sparsify_clusters(cluster_rates, min_rate=cluster_min_rate)
 
@@ -280,7 +325,7 @@ def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
 
     out = {
         "metadata": {
-            "input_csv": str(Path(in_csv).name),
+            "input_csv": str(Path(source).name) if source else None,
             "threshold_used": thr,
             "threshold_hi_param": thr_hi,
             "threshold_lo_param": thr_lo,
@@ -297,19 +342,56 @@ def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
         },
         "segments": segments_out
     }
-    if include_frames and frames is not None:
-        out["frames"] = frames
+    if include_frames:
+        out["frames"] = frame_block(flags_df, df, frame_key, available_emotions)
+    return out
 
+
+def write_output(out: dict, out_json: str, frames_format: str = "inline", verbose: bool = False) -> str:
+    """Write an analyze() result; its per-frame block (if any) goes inline or to a sidecar file."""
+    out = dict(out)
+    block = out.pop("frames", None)
     Path(out_json).parent.mkdir(parents=True, exist_ok=True)
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    # Optional per-frame block, streamed column-wise from the arrays
+    cols = block_columns(block) if block is not None else None
+    if cols is not None and frames_format != "inline":
+        side = sidecar_path(out_json, frames_format)
+        n = (write_jsonl if frames_format == "jsonl" else write_columnar)(side, cols)
+        out["metadata"] = dict(out["metadata"], frames={"format": frames_format, "path": side.name, "num_frames": n})
+        if verbose: print(f"[info] Wrote {n} per-frame records to {side}")
+
+    if cols is not None and frames_format == "inline":
+        write_with_inline_frames(out_json, out, cols)
+    else:
+        with open(out_json, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, indent=2)
+    return str(out_json)
+
+
+# ---------- Main ----------
+def main(in_csv: str, out_json: str, thr_hi: float, thr_lo: float,
+         verbose: bool, print_cols: bool, dump_stats: bool, sample_n: int,
+         fps: float, win_sec: float, hop_sec: float,
+         emo_min: float, emo_margin: float, cluster_min_rate: float,
+         prefer_frame_time: bool, include_frames: bool, frames_format: str = "inline"):
+
+    df = load_results(in_csv, verbose=verbose)
+    if print_cols:
+        print("[info] Results columns:")
+        for c in result_columns(in_csv): print("  -", c)
 
-    print(f"[done] Wrote {out_json} with {len(segments_out)} segments.")
+    out = analyze(df, thr_hi=thr_hi, thr_lo=thr_lo, fps=fps, win_sec=win_sec, hop_sec=hop_sec,
+                  emo_min=emo_min, emo_margin=emo_margin, cluster_min_rate=cluster_min_rate,
+                  prefer_frame_time=prefer_frame_time, include_frames=include_frames,
+                  verbose=verbose, dump_stats=dump_stats, sample_n=sample_n, source=in_csv)
+    write_output(out, out_json, frames_format, verbose=verbose)
+    print(f"[done] Wrote {out_json} with {len(out['segments'])} segments.")
 
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in_csv", required=True)
+    ap.add_argument("--in_csv", "--in_results", dest="in_csv", required=True,
+                    help="Py-Feat results (.csv or .parquet)")
     ap.add_argument("--out_json", required=True)
 
     ap.add_argument("--thr_hi", type=float, default=DEFAULTS["thr_hi"])
@@ -332,10 +414,12 @@ if __name__ == "__main__":
                     help="Use frame/FPS-derived time even if a timestamp column exists")
     ap.add_argument("--include_frames", action="store_true",
                     help="Include per-frame JSON records")
+    ap.add_argument("--frames_format", choices=FRAME_FORMATS, default="inline",
+                    help="inline: 'frames' array in the output JSON; jsonl / columnar: sidecar file next to it")
 
     args = ap.parse_args()
     main(args.in_csv, args.out_json, args.thr_hi, args.thr_lo,
          args.verbose, args.print_cols, args.dump_stats, args.sample_n,
          args.fps, args.win_sec, args.hop_sec,
          args.emo_min, args.emo_margin, args.cluster_min_rate,
-         args.prefer_frame_time, args.include_frames)
+         args.prefer_frame_time, args.include_frames, args.frames_format)
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Online AU segments: the au_flags computation fed with Py-Feat rows as they are produced.
+
+OnlineSegmenter.push(rows) takes each batch of rows (one frame or a Py-Feat batch) and
+returns every {"timestamp", "emotions", "clusters"} segment whose window closed with it;
+close() flushes the rest at end of stream. It keeps only the rows of windows still open.
+Windows, cluster rules, emotion means and sparsification are the au_flags ones.
+
+Threshold: au_flags picks thr_hi or thr_lo from the 95th percentile of all AU values in
+the table. Online, that percentile is a running P² estimate (O(1) memory), or a fixed
+threshold is given up front. --calibration_rows holds segments back until that many rows
+have been seen, so early windows use a settled estimate; once the choice matches the
+batch one, the segments are the same as au_flags'.
+
+Rows must arrive in time order. Time comes from the same column au_flags would pick: the
+first time column (timestamp, time) that advances, else the frame column / fps, else the
+row count / fps. A column only counts once it has advanced (Py-Feat's per-image results have
+frame=0 on every row), so rows are held back until one does, for at most HOLD_ROWS rows.
+
+    python au_stream.py --in_csv output/pyfeat_results.parquet --check   # replay a results file
+    python au_stream.py --in_csv ../output/pyfeat_results.csv --check    # per-image results, frame=0 throughout
+"""
+
+import argparse, json, sys
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from au_flags import (BASE_CLUSTERS, DEFAULTS, EMOTION_COLS, canonical_au_variants, compute_cluster_flags, fmt_range,
+                      sparsify_clusters, sparsify_emotions)
+
+TIME_COLS = ["timestamp", "time", "Timestamp", "Time"]
+FRAME_COLS = ["frame", "Frame"]
+MIN_SPAN_SEC = 1e-3  # au_flags.resolve_time_series: a time column must span at least this much
+HOLD_ROWS = 64       # rows held back while no time column has advanced; then the row count is used
+
+
+class P2Quantile:
+    """Running estimate of the p-quantile (Jain & Chlamtac's P² algorithm, 5 markers)."""
+
+    def __init__(self, p: float):
+        self.p = p
+        self.n = 0
+        self._first: List[float] = []
+        self.q: Optional[List[float]] = None
+        self.pos = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self.inc = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        if self.q is None:
+            self._first.append(x)
+            if len(self._first) == 5:
+                self.q = sorted(self._first)
+            return
+        q, pos = self.q, self.pos
+        if x < q[0]:
+            q[0], k = x, 0
+        elif x >= q[4]:
+            q[4], k = x, 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self.desired[i] += self.inc[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = qp
+                pos[i] += d
+
+    def update(self, values: np.ndarray) -> None:
+        for x in values.tolist():
+            self.add(x)
+
+    def value(self) -> float:
+        if self.q is not None:
+            return self.q[2]
+        return float(np.quantile(self._first, self.p)) if self._first else float("nan")
+
+
+class OnlineSegmenter:
+    """Incremental au_flags: push() row batches in time order, get closed segments back."""
+
+    def __init__(self, fps: float = DEFAULTS["fps"], win_sec: float = DEFAULTS["win_sec"],
+                 hop_sec: float = DEFAULTS["hop_sec"], thr_hi: float = DEFAULTS["thr_hi"],
+                 thr_lo: float = DEFAULTS["thr_lo"], thr: Optional[float] = None,
+                 emo_min: float = DEFAULTS["emo_min"], emo_margin: float = DEFAULTS["emo_margin"],
+                 cluster_min_rate: float = DEFAULTS["cluster_min_rate"], calibration_rows: int = 0,
+                 prefer_frame_time: bool = False):
+        self.fps, self.win, self.hop = float(fps), float(win_sec), float(hop_sec)
+        self.thr_hi, self.thr_lo, self.fixed_thr = thr_hi, thr_lo, thr
+        self.emo_min, self.emo_margin, self.cluster_min_rate = emo_min, emo_margin, cluster_min_rate
+        self.calibration_rows = calibration_rows
+        self.prefer_frame_time = prefer_frame_time
+        self.q95 = P2Quantile(0.95)
+        self.aus = sorted({au for spec in BASE_CLUSTERS.values() for au in spec["aus"]})
+        self._cluster_idx = {c: [self.aus.index(a) for a in spec["aus"]] for c, spec in BASE_CLUSTERS.items()}
+        self.emotions: Optional[List[str]] = None
+        self._time_col: Optional[str] = None
+        self._frame_col: Optional[str] = None
+        self._t = np.zeros(0)
+        self._au = np.zeros((0, len(self.aus)))
+        self._emo = np.zeros((0, 0))
+        self.rows = 0
+        self.last_t = None
+        self.t0 = 0.0           # start of the next window to emit
+        self.emitted = 0
+
+    @property
+    def threshold(self) -> float:
+        if self.fixed_thr is not None:
+            return self.fixed_thr
+        q = self.q95.value()
+        return self.thr_hi if (np.isnan(q) or q > 1.0) else self.thr_lo
+
+    def _columns(self, df: pd.DataFrame):
+        """Resolve source columns once, from the first rows (same choices as au_flags.to_intensity)."""
+        self.emotions = [c for c in EMOTION_COLS if c in df.columns]
+        self._emo = np.zeros((0, len(self.emotions)))
+        self._au_src = []  # (column or None, is_presence) per AU
+        for au in self.aus:
+            variants = canonical_au_variants(au)
+            col = next((c for c, k in variants if c in df.columns and k == "intensity"), None)
+            pres = col is None and any(c in df.columns and k == "presence" for c, k in variants)
+            if pres:
+                col = next(c for c, k in variants if c in df.columns and k == "presence")
+            self._au_src.append((col, pres))
+        self._src = [c for c, _ in self._au_src if c] + self.emotions
+        self._time = None  # (column, scale); None = row count / fps
+        self._time_cands = [] if self.prefer_frame_time else (
+            [(c, 1.0, MIN_SPAN_SEC) for c in TIME_COLS if c in df.columns]
+            + [(c, 1.0 / max(self.fps, 1e-9), 0.0) for c in FRAME_COLS if c in df.columns])
+        self._held = [] if self._time_cands else None  # batches waiting for the time source
+
+    def _resolve_time(self, df: pd.DataFrame, final: bool) -> bool:
+        """Pick the time source from the rows so far once a candidate has advanced (or if it is final)."""
+        for col, scale, min_span in self._time_cands:
+            v = pd.to_numeric(df[col], errors="coerce")
+            if v.notna().any():
+                v = v.ffill().fillna(0.0)
+                span = float(v.max() - v.min())
+                if span >= min_span and span > 0:
+                    self._time = (col, scale)
+                    self._src.append(col)
+                    return True
+        return final or len(df) >= HOLD_ROWS
+
+    @staticmethod
+    def _numeric(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+        try:
+            return df[cols].to_numpy(dtype=float)
+        except (TypeError, ValueError):
+            return df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+    def _split(self, df: pd.DataFrame):
+        """(AU matrix, emotion matrix, times) of a batch, from one numeric block."""
+        n = len(df)
+        block = self._numeric(df, self._src)
+        au, j = np.zeros((n, len(self.aus))), 0
+        for i, (col, pres) in enumerate(self._au_src):
+            if col is None:
+                continue
+            v = block[:, j]; j += 1
+            au[:, i] = np.clip(np.where(np.isnan(v), 0.0, v), 0.0, 1.0) if pres else v
+        emo = block[:, j:j + len(self.emotions)]; j += len(self.emotions)
+        if self._time is not None:
+            t = block[:, j] * self._time[1]
+        else:
+            t = np.arange(self.rows, self.rows + n, dtype=float) / max(self.fps, 1e-9)
+        if np.isnan(t).any():  # missing times carry the previous one
+            t = pd.Series(t).ffill().fillna(0.0 if self.last_t is None else self.last_t).to_numpy()
+        return au, emo, t
+
+    def _release(self, df: Optional[pd.DataFrame], final: bool = False) -> Optional[pd.DataFrame]:
+        """Hold rows until the time source is known; then return them all (None while holding)."""
+        if self._held is None:
+            return df
+        if df is not None:
+            self._held.append(df)
+        if not self._held:
+            return None
+        held = pd.concat(self._held, ignore_index=True) if len(self._held) > 1 else self._held[0]
+        if not self._resolve_time(held, final):
+            return None
+        self._held = None
+        return held
+
+    def push(self, df: pd.DataFrame) -> List[dict]:
+        """Add rows; returns the segments whose windows closed (possibly none)."""
+        if df is None or df.empty:
+            return []
+        if self.emotions is None:
+            self._columns(df)
+        df = self._release(df)
+        if df is None:
+            return []
+        return self._add(df)
+
+    def _add(self, df: pd.DataFrame) -> List[dict]:
+        au, emo, t = self._split(df)
+        vals = au[~np.isnan(au)]
+        if self.fixed_thr is None and vals.size:
+            self.q95.update(vals)
+        self._t = np.concatenate([self._t, t])
+        self._au = np.concatenate([self._au, au])
+        self._emo = np.concatenate([self._emo, emo])
+        self.rows += len(df)
+        self.last_t = float(max(t.max(), self.last_t if self.last_t is not None else t.max()))
+        if self.rows < self.calibration_rows:
+            return []
+        out = []
+        while self.t0 + self.win <= self.last_t:  # a row at or past the window end closes it
+            out.append(self._emit())
+        self._trim()
+        return out
+
+    def close(self) -> List[dict]:
+        """End of stream: the remaining windows that start at or before the last row."""
+        held = self._release(None, final=True) if self.emotions is not None else None
+        out = self._add(held) if held is not None else []
+        if self.last_t is not None:
+            while self.t0 <= self.last_t:
+                out.append(self._emit())
+        if not self.emitted:
+            out.append(self._emit())  # au_flags always produces at least one window
+        self._trim()
+        return out
+
+    def _emit(self) -> dict:
+        t0, t1 = self.t0, self.t0 + self.win
+        m = (self._t >= t0) & (self._t < t1)
+        n = int(m.sum())
+        thr = self.threshold
+        if n == 0:
+            cluster_rates = {c: 0.0 for c in BASE_CLUSTERS}
+            emo_means = {c: None for c in self.emotions or []}
+        else:
+            au = self._au[m]
+            cluster_rates = {c: float(compute_cluster_flags(au[:, idx], BASE_CLUSTERS[c]["rule"], thr).mean())
+                             for c, idx in self._cluster_idx.items()}
+            emo = self._emo[m]
+            ok = ~np.isnan(emo)
+            cnt = ok.sum(axis=0)
+            means = np.where(ok, emo, 0.0).sum(axis=0) / np.maximum(cnt, 1)
+            emo_means = {c: (float(v) if k else None) for c, v, k in zip(self.emotions, means, cnt)}
+        seg = {"timestamp": fmt_range(t0, t1)}
+        emotions_sparse = sparsify_emotions(emo_means, self.emo_min, self.emo_margin) if self.emotions else {}
+        clusters_sparse = sparsify_clusters(cluster_rates, self.cluster_min_rate)
+        if emotions_sparse: seg["emotions"] = emotions_sparse
+        if clusters_sparse: seg["clusters"] = clusters_sparse
+        self.t0 += self.hop
+        self.emitted += 1
+        return seg
+
+    def _trim(self):
+        keep = self._t >= self.t0
+        if not keep.all():
+            self._t, self._au, self._emo = self._t[keep], self._au[keep], self._emo[keep]
+
+
+class SegmentLog:
+    """on_rows callback for the Py-Feat runners: feeds an OnlineSegmenter and appends closed segments as JSON lines."""
+
+    def __init__(self, path: str, segmenter: OnlineSegmenter, echo: bool = False):
+        self.segmenter = segmenter
+        self.echo = echo
+        self.n = 0
+        self._f = open(path, "w", encoding="utf-8")
+
+    def _write(self, segments):
+        for seg in segments:
+            line = json.dumps(seg, ensure_ascii=False)
+            self._f.write(line + "\n")
+            if self.echo:
+                print(f"[live] {line}", flush=True)
+        self._f.flush()
+        self.n += len(segments)
+
+    def __call__(self, df: pd.DataFrame):
+        self._write(self.segmenter.push(df))
+
+    def close(self) -> int:
+        self._write(self.segmenter.close())
+        self._f.close()
+        return self.n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay Py-Feat results through the online segmenter")
+    ap.add_argument("--in_csv", "--in_results", dest="in_csv", required=True, help="Py-Feat results (.csv or .parquet)")
+    ap.add_argument("--out_jsonl", default=None, help="Write segments as JSON lines (default: stdout)")
+    ap.add_argument("--chunk_rows", type=int, default=1, help="Rows per push (1 = frame by frame)")
+    ap.add_argument("--thr", type=float, default=None, help="Fixed AU threshold (default: running estimate)")
+    ap.add_argument("--calibration_rows", type=int, default=0)
+    ap.add_argument("--fps", type=float, default=DEFAULTS["fps"])
+    ap.add_argument("--win_sec", type=float, default=DEFAULTS["win_sec"])
+    ap.add_argument("--hop_sec", type=float, default=DEFAULTS["hop_sec"])
+    ap.add_argument("--check", action="store_true", help="Compare with au_flags batch output")
+    args = ap.parse_args()
+
+    from au_flags import analyze, load_results
+    df = load_results(args.in_csv)
+    seg = OnlineSegmenter(fps=args.fps, win_sec=args.win_sec, hop_sec=args.hop_sec, thr=args.thr,
+                          calibration_rows=args.calibration_rows)
+    online = []
+    out = open(args.out_jsonl, "w", encoding="utf-8") if args.out_jsonl else sys.stdout
+    for start in range(0, len(df), max(1, args.chunk_rows)):
+        for s in seg.push(df.iloc[start:start + args.chunk_rows]):
+            online.append(s)
+            out.write(json.dumps(s, ensure_ascii=False) + "\n")
+    for s in seg.close():
+        online.append(s)
+        out.write(json.dumps(s, ensure_ascii=False) + "\n")
+    if out is not sys.stdout:
+        out.close()
+    print(f"[done] {len(online)} segments online (threshold {seg.threshold}, q95~{seg.q95.value():.3f})",
+          file=sys.stderr)
+
+    if args.check:
+        batch = analyze(df, fps=args.fps, win_sec=args.win_sec, hop_sec=args.hop_sec,
+                        **({"thr_hi": args.thr, "thr_lo": args.thr} if args.thr is not None else {}))
+        same = batch["segments"] == online
+        diff = sum(a != b for a, b in zip(batch["segments"], online)) + abs(len(batch["segments"]) - len(online))
+        print(f"[{'✓' if same else 'warn'}] batch threshold {batch['metadata']['threshold_used']}, "
+              f"{len(batch['segments'])} segments; {diff} differ", file=sys.stderr)
+        return 0 if same else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Body-language metrics from the MediaPipe landmark store, on the au_flags window grid.
+
+Everything is computed on the whole (frames x 543 x 4) tensor at once:
+- eye_contact_ratio: share of frames facing the camera (head-pose proxy: nose offset from the
+  eye midpoint for yaw; nose height between eyes and chin, relative to the speaker's median, for pitch)
+- gesture_activity: hand speed in shoulder widths per second (hand centroid, pose wrist as fallback)
+- posture_openness: horizontal spread of wrists/elbows in shoulder widths (~1 = arms by the sides)
+- fidget_energy: mean squared non-rigid motion of head/hand points (body sway removed), per second
+
+Window means come from windowing.py (prefix sums over time-sorted frames), so cost is O(frames + windows).
+Values are merged into au_flags segments as flat keys, which temporal_join averages like any other
+numeric video field.
+"""
+
+import argparse, json, warnings
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from landmark_store import PART_SLICES, load_landmarks
+from windowing import grid_starts, window_grid, window_means
+
+DEFAULTS = {
+    "win_sec": 5.0,
+    "hop_sec": 2.0,
+    "fps": 1.0,
+    "yaw_thr": 0.12,
+    "pitch_thr": 0.12,
+    "min_visibility": 0.5,
+}
+METRICS = ("eye_contact_ratio", "gesture_activity", "posture_openness", "fidget_energy")
+
+# MediaPipe indices (face mesh offsets are within the face block of the store)
+FACE_NOSE, FACE_EYE_R, FACE_EYE_L, FACE_CHIN = 1, 33, 263, 152
+POSE_SHOULDERS, POSE_ELBOWS, POSE_WRISTS = (11, 12), (13, 14), (15, 16)
+POSE_FIDGET = list(range(0, 11)) + list(range(15, 23))  # head + wrists/fingers
+
+
+# ---------- Per-frame signals ----------
+def _face(lm: np.ndarray, i: int) -> np.ndarray:
+    return lm[:, PART_SLICES["face"].start + i, :2]
+
+
+def _pose(lm: np.ndarray, idx) -> np.ndarray:
+    return lm[:, PART_SLICES["pose"].start + np.asarray(idx)]
+
+
+def shoulder_width(lm: np.ndarray) -> float:
+    """Median shoulder width over the video (normalized image units); the scale for all distances."""
+    sh = _pose(lm, POSE_SHOULDERS)[..., :2]
+    w = np.linalg.norm(sh[:, 0] - sh[:, 1], axis=-1)
+    w = w[np.isfinite(w) & (w > 1e-3)]
+    return float(np.median(w)) if w.size else 1.0
+
+
+def eye_contact(lm: np.ndarray, yaw_thr: float, pitch_thr: float) -> np.ndarray:
+    """1.0 where the head faces the camera, 0.0 where it does not, NaN without a face."""
+    nose, eye_r, eye_l, chin = (_face(lm, i) for i in (FACE_NOSE, FACE_EYE_R, FACE_EYE_L, FACE_CHIN))
+    mid = (eye_r + eye_l) / 2
+    iod = np.abs(eye_l[:, 0] - eye_r[:, 0])
+    yaw = (nose[:, 0] - mid[:, 0]) / iod
+    pitch = (nose[:, 1] - mid[:, 1]) / (chin[:, 1] - mid[:, 1])
+    ok = np.isfinite(yaw) & np.isfinite(pitch) & (iod > 1e-4)
+    if not ok.any():
+        return np.full(len(lm), np.nan)
+    pitch_ref = np.median(pitch[ok])
+    facing = (np.abs(yaw) <= yaw_thr) & (np.abs(pitch - pitch_ref) <= pitch_thr)
+    return np.where(ok, facing.astype(float), np.nan)
+
+
+def hand_positions(lm: np.ndarray, min_visibility: float) -> np.ndarray:
+    """(F, 2, 2): left/right hand centroid, falling back to the pose wrist when the hand was not found."""
+    hands = np.stack([np.nanmean(lm[:, PART_SLICES[h], :2], axis=1) if np.isfinite(lm[:, PART_SLICES[h], 0]).any()
+                      else np.full((len(lm), 2), np.nan) for h in ("left_hand", "right_hand")], axis=1)
+    wrists = _pose(lm, POSE_WRISTS)
+    wrist_xy = np.where((wrists[..., 3:4] >= min_visibility), wrists[..., :2], np.nan)
+    return np.where(np.isfinite(hands), hands, wrist_xy)
+
+
+def _dt(times: np.ndarray) -> np.ndarray:
+    dt = np.diff(times)
+    return np.where(dt > 0, dt, np.nan)
+
+
+def gesture_activity(lm: np.ndarray, times: np.ndarray, scale: float, min_visibility: float) -> np.ndarray:
+    """Mean hand speed per frame (shoulder widths / s); NaN for the first frame or without hands."""
+    pos = hand_positions(lm, min_visibility)
+    speed = np.linalg.norm(np.diff(pos, axis=0), axis=-1) / _dt(times)[:, None] / scale
+    out = np.full(len(lm), np.nan)
+    out[1:] = np.nanmean(speed, axis=1)
+    return out
+
+
+def posture_openness(lm: np.ndarray, scale: float, min_visibility: float) -> np.ndarray:
+    arms = np.concatenate([_pose(lm, POSE_ELBOWS), _pose(lm, POSE_WRISTS)], axis=1)  # (F, 4, 4)
+    x = np.where(arms[..., 3] >= min_visibility, arms[..., 0], np.nan)
+    spread = np.fmax(np.abs(x[:, 0] - x[:, 1]), np.abs(x[:, 2] - x[:, 3]))
+    return spread / scale
+
+
+def fidget_energy(lm: np.ndarray, times: np.ndarray, scale: float, min_visibility: float) -> np.ndarray:
+    """Mean squared speed of head/hand points after removing their common motion (sway, camera pan)."""
+    pts = _pose(lm, POSE_FIDGET)
+    xy = np.where(pts[..., 3:4] >= min_visibility, pts[..., :2], np.nan)
+    d = np.diff(xy, axis=0) / _dt(times)[:, None, None] / scale          # (F-1, P, 2)
+    resid = d - np.nanmean(d, axis=1, keepdims=True)
+    e = np.nanmean(np.sum(resid ** 2, axis=-1), axis=1)
+    out = np.full(len(lm), np.nan)
+    out[1:] = e
+    return out
+
+
+# ---------- Windows ----------
+def frame_times(store, fps: float) -> np.ndarray:
+    t = np.asarray(store.timestamps, dtype=float)
+    if len(t) and np.isfinite(t).all():
+        return t
+    return np.asarray(store.frames, dtype=float) / max(fps, 1e-9)
+
+
+def compute_metrics(lm: np.ndarray, times: np.ndarray, grid, yaw_thr: float = DEFAULTS["yaw_thr"],
+                    pitch_thr: float = DEFAULTS["pitch_thr"],
+                    min_visibility: float = DEFAULTS["min_visibility"]) -> Dict[str, np.ndarray]:
+    """metric name -> per-window values (NaN where the window has no usable frames)."""
+    times = np.asarray(times, dtype=float)
+    if np.any(np.diff(times) < 0):  # sampled in order almost always; avoid copying the whole tensor otherwise
+        order = np.argsort(times, kind="stable")
+        lm, times = lm[order], times[order]
+    # Missing parts are NaN by design; all-NaN slices and 0/0 are expected, not worth a warning.
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        scale = shoulder_width(lm)
+        per_frame = {
+            "eye_contact_ratio": eye_contact(lm, yaw_thr, pitch_thr),
+            "gesture_activity": gesture_activity(lm, times, scale, min_visibility),
+            "posture_openness": posture_openness(lm, scale, min_visibility),
+            "fidget_energy": fidget_energy(lm, times, scale, min_visibility),
+        }
+    names = list(per_frame)
+    means = window_means(times, np.stack([per_frame[k] for k in names], axis=1), grid)
+    return {name: means[:, j] for j, name in enumerate(names)}
+
+
+def metrics_to_segments(metrics: Dict[str, np.ndarray], n: int) -> List[dict]:
+    out = []
+    for i in range(n):
+        seg = {}
+        for name, vals in metrics.items():
+            v = vals[i]
+            if np.isfinite(v):
+                seg[name] = round(float(v), 2)
+        out.append(seg)
+    return out
+
+
+def add_body_metrics(flags: dict, landmarks_dir: str, fps: Optional[float] = None, **kwargs) -> dict:
+    """Add body metrics to every segment of an au_flags result (au_flags.analyze) in place, on its window grid."""
+    meta, segments = flags.setdefault("metadata", {}), flags.get("segments", [])
+    win, hop = float(meta.get("window_sec", DEFAULTS["win_sec"])), float(meta.get("hop_sec", DEFAULTS["hop_sec"]))
+    grid = [(t0, t0 + win) for t0 in grid_starts(len(segments), hop)]
+
+    store = load_landmarks(landmarks_dir)
+    times = frame_times(store, fps or float(meta.get("fps_used", DEFAULTS["fps"])))
+    metrics = compute_metrics(store.landmarks, times, grid, **kwargs)
+    for seg, extra in zip(segments, metrics_to_segments(metrics, len(segments))):
+        seg.update(extra)
+    meta["body_metrics"] = {"metrics": list(METRICS), "landmarks": str(Path(landmarks_dir).name)}
+    return flags
+
+
+def merge_into_flags(flags_json: str, landmarks_dir: str, fps: Optional[float] = None, **kwargs) -> int:
+    """Add body metrics to every segment of an au_flags JSON file. Returns #segments."""
+    with open(flags_json, encoding="utf-8") as f:
+        flags = json.load(f)
+    add_body_metrics(flags, landmarks_dir, fps, **kwargs)
+    with open(flags_json, "w", encoding="utf-8") as f:
+        json.dump(flags, f, ensure_ascii=False, indent=2)
+    return len(flags.get("segments", []))
+
+
+def main(landmarks_dir: str, flags_json: Optional[str], out_json: Optional[str],
+         win_sec: float, hop_sec: float, fps: float, verbose: bool):
+    if flags_json:
+        n = merge_into_flags(flags_json, landmarks_dir, fps=fps)
+        print(f"[done] Body metrics merged into {n} segments of {flags_json}.")
+        return
+
+    store = load_landmarks(landmarks_dir)
+    times = frame_times(store, fps)
+    grid = window_grid(float(times.max()) if len(times) else 0.0, win_sec, hop_sec)
+    metrics = compute_metrics(store.landmarks, times, grid)
+    from au_flags import fmt_range
+    segments = [dict(timestamp=fmt_range(a, b), **m)
+                for (a, b), m in zip(grid, metrics_to_segments(metrics, len(grid)))]
+    if verbose:
+        for name, vals in metrics.items():
+            print(f"[info] {name}: windows with data {int(np.isfinite(vals).sum())}/{len(vals)}, "
+                  f"mean {np.nanmean(vals) if np.isfinite(vals).any() else float('nan'):.3f}")
+    Path(out_json).parent.mkdir(parents=True, exist_ok=True)
+    with open(out_json, "w", encoding="utf-8") as f:
+        json.dump({"metadata": {"window_sec": win_sec, "hop_sec": hop_sec, "num_frames": len(times),
+                                "num_segments": len(segments)}, "segments": segments}, f, indent=2)
+    print(f"[done] Wrote {out_json} with {len(segments)} segments.")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--landmarks_dir", required=True, help="Landmark store written by landmark_detection (npy format)")
+    ap.add_argument("--flags_json", default=None, help="au_flags JSON to extend in place (uses its window grid)")
+    ap.add_argument("--out_json", default="body_metrics.json", help="Standalone output when --flags_json is not given")
+    ap.add_argument("--win_sec", type=float, default=DEFAULTS["win_sec"])
+    ap.add_argument("--hop_sec", type=float, default=DEFAULTS["hop_sec"])
+    ap.add_argument("--fps", type=float, default=DEFAULTS["fps"], help="Rows→seconds when the store has no timestamps")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    main(args.landmarks_dir, args.flags_json, args.out_json, args.win_sec, args.hop_sec, args.fps, args.verbose)
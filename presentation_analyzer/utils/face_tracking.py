@@ -0,0 +1,89 @@
+"""
+Cheap face-box propagation between full face detections.
+
+A presentation is mostly one speaker whose face moves a few pixels between 1 fps samples,
+so the box found by the detector on a keyframe is followed on the next frames with
+normalized cross-correlation (cv2.matchTemplate) inside a window around the last position.
+The match score doubles as tracking confidence: the caller falls back to full detection
+when it drops below `min_score`, or every `redetect_every` frames regardless.
+"""
+
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[float, float, float, float, float]  # (x, y, w, h, score) in pixels
+
+BOX_COLUMNS = ("FaceRectX", "FaceRectY", "FaceRectWidth", "FaceRectHeight", "FaceScore")
+
+
+def boxes_from_fex(df) -> List[Box]:
+    """Face boxes from a Py-Feat result frame (one row per face); rows with missing boxes are dropped."""
+    if df is None or df.empty or not all(c in df.columns for c in BOX_COLUMNS[:4]):
+        return []
+    cols = [c for c in BOX_COLUMNS if c in df.columns]
+    vals = df[cols].to_numpy(dtype=float)
+    if vals.shape[1] == 4:
+        vals = np.column_stack([vals, np.ones(len(vals))])
+    return [tuple(v) for v in vals if np.isfinite(v[:4]).all() and v[2] > 1 and v[3] > 1]
+
+
+def _to_gray(img: np.ndarray) -> np.ndarray:
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+
+class FaceTracker:
+    """
+    Template tracker for the boxes of the last keyframe.
+
+    Templates are taken once per keyframe (not refreshed on tracked frames) so errors do
+    not accumulate; the search window is the box grown by `search_margin` of its size.
+    """
+
+    def __init__(self, redetect_every: int = 5, min_score: float = 0.6, search_margin: float = 0.5):
+        self.redetect_every = max(1, int(redetect_every))
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self._templates: List[Tuple[np.ndarray, Box]] = []
+        self.since_keyframe = 0
+        self.last_score: Optional[float] = None
+
+    def needs_detection(self) -> bool:
+        return not self._templates or self.since_keyframe + 1 >= self.redetect_every
+
+    def reset(self, img: np.ndarray, boxes: List[Box]):
+        """Start tracking from a keyframe and its detected boxes."""
+        gray = _to_gray(img)
+        h_img, w_img = gray.shape
+        self._templates = []
+        for x, y, w, h, s in boxes:
+            x0, y0 = max(0, int(round(x))), max(0, int(round(y)))
+            x1, y1 = min(w_img, int(round(x + w))), min(h_img, int(round(y + h)))
+            if x1 - x0 > 4 and y1 - y0 > 4:
+                self._templates.append((gray[y0:y1, x0:x1].copy(), (x0, y0, x1 - x0, y1 - y0, s)))
+        self.since_keyframe = 0
+        self.last_score = None
+
+    def update(self, img: np.ndarray) -> Tuple[List[Box], float]:
+        """Locate every keyframe box in `img`; returns (boxes, min match score). Score 0 means lost."""
+        if not self._templates:
+            return [], 0.0
+        gray = _to_gray(img)
+        h_img, w_img = gray.shape
+        boxes, worst = [], 1.0
+        for tmpl, (x, y, w, h, s) in self._templates:
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            sx0, sy0 = max(0, x - mx), max(0, y - my)
+            sx1, sy1 = min(w_img, x + w + mx), min(h_img, y + h + my)
+            window = gray[sy0:sy1, sx0:sx1]
+            if window.shape[0] < h or window.shape[1] < w:
+                return [], 0.0
+            res = cv2.matchTemplate(window, tmpl, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (px, py) = cv2.minMaxLoc(res)
+            score = float(score) if np.isfinite(score) else 0.0
+            worst = min(worst, score)
+            boxes.append((float(sx0 + px), float(sy0 + py), float(w), float(h), s))
+        self.since_keyframe += 1
+        self.last_score = worst
+        return boxes, worst
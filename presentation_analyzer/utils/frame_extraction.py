@@ -1,37 +1,160 @@
 import cv2
 import os
 
-def extract_frames(
+# read : decode + convert every frame, keep one per interval (original behaviour, for comparison)
+# grab : grab() every frame, retrieve() only the kept ones (skips colour conversion / copies of dropped frames)
+# seek : jump straight to each kept frame (CAP_PROP_POS_FRAMES); fastest for sparse sampling of long-GOP video
+# ffmpeg: ffmpeg decodes with fps + scale filters and pipes raw frames (works on the original upload, no re-encode)
+EXTRACT_MODES = ("ffmpeg", "grab", "seek", "read")
+
+# Sidecar written next to the JPEGs: frame file -> source timestamp (seconds).
+TIMESTAMPS_FILE = "timestamps.csv"
+
+
+def sampling_interval(fps, frame_interval_ms):
+    """Keep one frame every this many source frames."""
+    return max(1, int(fps * (frame_interval_ms / 1000)))
+
+
+def iter_frames(
     video_path,
-    output_dir="frames/",
     frame_interval_ms=1000,
-    resize_dim=(640, 480)
+    resize_dim=(640, 480),
+    mode="grab",
 ):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    """
+    Yield (sample_idx, t_sec, frame_bgr) for one frame every `frame_interval_ms`, decoding as little as the mode allows.
+    """
+    if mode not in EXTRACT_MODES:
+        raise ValueError(f"Unknown extract mode '{mode}'. Choose from {EXTRACT_MODES}")
+
+    if mode == "ffmpeg":
+        from video_preprocessing import decode_frames
+        yield from decode_frames(video_path, fps=1000.0 / frame_interval_ms, resolution=resize_dim)
+        return
 
     cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    interval = int(fps * (frame_interval_ms / 1000))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    interval = sampling_interval(fps, frame_interval_ms)
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    current_frame = 0
     saved_frame_idx = 0
+    try:
+        if mode == "seek" and frame_count > 0:
+            for target in range(0, frame_count, interval):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if resize_dim:
+                    frame = cv2.resize(frame, resize_dim)
+                yield saved_frame_idx, target / fps, frame
+                saved_frame_idx += 1
+            return
+
+        current_frame = 0
+        while True:
+            if mode == "read":
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                keep = current_frame % interval == 0
+            else:
+                if not cap.grab():
+                    break
+                keep = current_frame % interval == 0
+                if keep:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+
+            if keep:
+                if resize_dim:
+                    frame = cv2.resize(frame, resize_dim)
+                yield saved_frame_idx, current_frame / fps, frame
+                saved_frame_idx += 1
+
+            current_frame += 1
+    finally:
+        cap.release()
+
+
+def iter_source_frames(video_path, resize_dim=(640, 480), mode="grab"):
+    """
+    Yield (t_sec, get) for every frame of the video; get() returns it as frame_bgr (resized).
 
-    while cap.isOpened():
-        ret, frame = cap.read()
+    For samplers that choose frames as they go (incremental.FrameReuse). Frames are only
+    retrieved / converted when get() is called, except in ffmpeg mode, where ffmpeg decodes
+    and scales every frame at the source rate.
+    """
+    if mode not in EXTRACT_MODES:
+        raise ValueError(f"Unknown extract mode '{mode}'. Choose from {EXTRACT_MODES}")
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    if mode == "ffmpeg":
+        cap.release()
+        from video_preprocessing import decode_frames
+        for _, t_sec, frame in decode_frames(video_path, fps=fps, resolution=resize_dim):
+            yield t_sec, lambda frame=frame: frame
+        return
+
+    cache = []  # the current frame, once retrieved
+
+    def get():
+        if cache:
+            return cache[0]
+        ret, frame = cap.retrieve()
         if not ret:
-            break
+            raise RuntimeError(f"Could not retrieve a frame of {video_path}")
+        if resize_dim:
+            frame = cv2.resize(frame, resize_dim)
+        cache.append(frame)
+        return frame
+
+    current_frame = 0
+    try:
+        while cap.grab():
+            cache.clear()
+            yield current_frame / fps, get
+            current_frame += 1
+    finally:
+        cap.release()
+
 
-        if current_frame % interval == 0:
-            if resize_dim:
-                frame = cv2.resize(frame, resize_dim)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_filename = os.path.join(output_dir, f"frame_{saved_frame_idx:04d}.jpg")
-            cv2.imwrite(frame_filename, cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR))
-            saved_frame_idx += 1
+def extract_frames(
+    video_path,
+    output_dir="frames/",
+    frame_interval_ms=1000,
+    resize_dim=(640, 480),
+    mode="grab",
+    frames=None,
+):
+    """
+    Write sampled frames as JPEGs plus a timestamps.csv sidecar; returns the count.
+
+    `frames` overrides the fixed-interval sampler with any (idx, t_sec, frame_bgr) iterable
+    (e.g. adaptive_sampling.iter_adaptive_frames).
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    if frames is None:
+        frames = iter_frames(video_path, frame_interval_ms, resize_dim, mode)
 
-        current_frame += 1
+    saved = 0
+    with open(os.path.join(output_dir, TIMESTAMPS_FILE), "w", encoding="utf-8") as ts:
+        ts.write("file,timestamp\n")
+        for idx, t_sec, frame in frames:
+            # OpenCV frames are already BGR, which is what imwrite expects.
+            name = f"frame_{idx:04d}.jpg"
+            cv2.imwrite(os.path.join(output_dir, name), frame)
+            ts.write(f"{name},{t_sec:.3f}\n")
+            saved += 1
 
-    cap.release()
-    print(f"[✓] Extracted {saved_frame_idx} frames to '{output_dir}'")
+    print(f"[✓] Extracted {saved} frames to '{output_dir}'")
+    return saved
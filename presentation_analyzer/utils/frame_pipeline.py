@@ -0,0 +1,146 @@
+"""
+Zero-disk frame pipeline: one decoder thread feeds decoded NumPy frames to every analyzer.
+
+Each consumer runs in its own thread and reads from its own bounded queue, so frames are
+shared (never copied or re-encoded) and memory is bounded by roughly
+queue_depth x number_of_consumers frames. A slow consumer applies backpressure to the
+decoder instead of letting frames pile up.
+"""
+
+import os
+import queue
+import threading
+import traceback
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+import cv2
+import numpy as np
+
+Frame = Tuple[int, float, np.ndarray]  # (sample_idx, t_sec, frame_bgr)
+
+_STOP = object()
+
+
+def _iter_queue(q: "queue.Queue") -> Iterator[Frame]:
+    while True:
+        item = q.get()
+        if item is _STOP:
+            return
+        yield item
+
+
+def run_frame_pipeline(
+    frames: Iterable[Frame],
+    consumers: Dict[str, Callable[[Iterator[Frame]], object]],
+    queue_depth: int = 8,
+):
+    """
+    Fan decoded frames out to consumers running concurrently.
+
+    Parameters:
+        frames: iterable of (sample_idx, t_sec, frame_bgr), e.g. frame_extraction.iter_frames(...).
+        consumers: name -> callable taking an iterator of frames and returning a result.
+        queue_depth: frames buffered per consumer.
+
+    Returns:
+        (results, errors): name -> return value, and name -> formatted traceback for consumers that failed.
+        A failed consumer keeps draining its queue so the others are not blocked.
+    """
+    queues = {name: queue.Queue(maxsize=max(1, queue_depth)) for name in consumers}
+    results: Dict[str, object] = {}
+    errors: Dict[str, str] = {}
+
+    def work(name: str, fn: Callable, q: "queue.Queue"):
+        it = _iter_queue(q)
+        try:
+            results[name] = fn(it)
+        except Exception:
+            errors[name] = traceback.format_exc()
+            print(f"[error] Frame consumer '{name}' failed:\n{errors[name]}", flush=True)
+        finally:
+            for _ in it:  # drain so the decoder never blocks on a dead consumer
+                pass
+
+    threads = [threading.Thread(target=work, args=(n, fn, queues[n]), name=f"frames-{n}", daemon=True)
+               for n, fn in consumers.items()]
+    for t in threads:
+        t.start()
+
+    n_frames = 0
+    try:
+        for item in frames:
+            for q in queues.values():
+                q.put(item)
+            n_frames += 1
+    finally:
+        for q in queues.values():
+            q.put(_STOP)
+        for t in threads:
+            t.join()
+
+    print(f"[✓] Pipeline decoded {n_frames} frames for {', '.join(consumers) or 'no consumers'}", flush=True)
+    return results, errors
+
+
+class FramePrefetcher:
+    """
+    Decode ahead: a thread pulls up to `depth` frames from `frames` before anyone reads them.
+
+    Batch mode wraps the next video's frames in one while the analyzers are still busy with the
+    current video. Iterate it once; close() stops the decoder early (e.g. the video was skipped).
+    Decoder errors are re-raised in the reading thread.
+    """
+
+    def __init__(self, frames: Iterable[Frame], depth: int = 64):
+        self._q: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._fill, args=(frames,), name="frames-prefetch", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fill(self, frames):
+        try:
+            for item in frames:
+                if not self._put(item):
+                    break
+        except Exception:
+            self._error = traceback.format_exc()
+        finally:
+            close = getattr(frames, "close", None)
+            if close is not None:
+                close()  # generator cleanup releases the capture / ffmpeg process
+            self._put(_STOP)
+
+    def __iter__(self) -> Iterator[Frame]:
+        while True:
+            item = self._q.get()
+            if item is _STOP:
+                if self._error:
+                    raise RuntimeError(f"Frame decoding failed:\n{self._error}")
+                return
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def jpeg_dump_consumer(output_dir: str) -> Callable[[Iterator[Frame]], int]:
+    """Debug consumer: write each frame as frame_XXXX.jpg (the old on-disk layout)."""
+    def dump(frames: Iterator[Frame]) -> int:
+        os.makedirs(output_dir, exist_ok=True)
+        n = 0
+        for idx, _, frame in frames:
+            cv2.imwrite(os.path.join(output_dir, f"frame_{idx:04d}.jpg"), frame)
+            n += 1
+        return n
+    return dump
@@ -0,0 +1,173 @@
+"""
+Streaming writers for the au_flags per-frame block (--include_frames).
+
+Per-frame values are kept as NumPy columns and turned into JSON text a chunk of rows at a
+time, so no list of per-frame dicts is ever built. Record layout (same keys as before):
+
+    {"authentic_smile": true, ..., "index": 0, "frame": 12, "emotions": {"anger": 0.01, ...}}
+
+Formats:
+    inline   : "frames" array inside the main JSON, one compact record per line
+    jsonl    : sidecar <out>.frames.jsonl, one record per line
+    columnar : sidecar <out>.frames.json, {"num_frames": N, "<key>": [...], "emotions": {"anger": [...]}}
+
+Missing values (NaN) are written as null.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FRAME_FORMATS = ("inline", "jsonl", "columnar")
+SIDECAR_SUFFIX = {"jsonl": ".frames.jsonl", "columnar": ".frames.json"}
+CHUNK_ROWS = 8192
+
+# (name, values, kind, group): kind is bool / int / float / key; group None or "emotions"
+Column = Tuple[str, np.ndarray, str, Optional[str]]
+
+
+def frame_block(flags_df: pd.DataFrame, df: pd.DataFrame, frame_key: Optional[str],
+                emotion_cols: List[str]) -> Dict[str, object]:
+    """The per-frame block as arrays, in record key order: flags, "index", frame key, "emotions": {...}."""
+    block: Dict[str, object] = {name: flags_df[name].to_numpy(dtype=bool) for name in flags_df.columns}
+    block["index"] = np.arange(len(flags_df))
+    if frame_key is not None:
+        block[frame_key] = df[frame_key].to_numpy()
+    if emotion_cols:
+        block["emotions"] = {col: pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+                             for col in emotion_cols}
+    return block
+
+
+def block_columns(block: Dict[str, object]) -> List[Column]:
+    cols: List[Column] = []
+    for name, values in block.items():
+        if name == "emotions":
+            cols += [(col, np.asarray(v, dtype=float), "float", "emotions") for col, v in values.items()]
+        elif name == "index":
+            cols.append((name, np.asarray(values), "int", None))
+        else:
+            values = np.asarray(values)
+            cols.append((name, values, "bool" if values.dtype == bool else "key", None))
+    return cols
+
+
+def frame_columns(flags_df: pd.DataFrame, df: pd.DataFrame, frame_key: Optional[str],
+                  emotion_cols: List[str]) -> List[Column]:
+    return block_columns(frame_block(flags_df, df, frame_key, emotion_cols))
+
+
+def _key_token(v) -> str:
+    # Same rules as the old per-record code: int() if possible, else float(), else str
+    try:
+        return str(int(v))
+    except Exception:
+        try:
+            f = float(v)
+            return repr(f) if np.isfinite(f) else "null"
+        except Exception:
+            return json.dumps(str(v), ensure_ascii=False)
+
+
+def _tokens(values: np.ndarray, kind: str) -> List[str]:
+    """JSON text of each value in a chunk."""
+    if kind == "bool":
+        return np.where(values, "true", "false").tolist()
+    if kind == "int":
+        return list(map(str, values.tolist()))
+    if kind == "float":
+        if not len(values):
+            return []
+        vals = values.tolist()
+        ok = np.isfinite(values)
+        if not ok.all():
+            vals = [v if good else None for v, good in zip(vals, ok.tolist())]
+        return json.dumps(vals)[1:-1].split(", ")  # C encoder; floats print as repr()
+    if values.dtype.kind in "iu":
+        return list(map(str, values.tolist()))
+    if values.dtype.kind in "fb":
+        f = values.astype(float)
+        ok = np.isfinite(f)
+        return [str(int(v)) if good else "null" for v, good in zip(f.tolist(), ok.tolist())]
+    return [_key_token(v) for v in values.tolist()]
+
+
+def _record_template(cols: List[Column]) -> str:
+    top = [f"{json.dumps(name)}:%s" for name, _, _, group in cols if group is None]
+    emo = [f"{json.dumps(name)}:%s" for name, _, _, group in cols if group == "emotions"]
+    if emo:
+        top.append('"emotions":{' + ",".join(emo) + "}")
+    return "{" + ",".join(top) + "}"
+
+
+def iter_records(cols: List[Column], chunk_rows: int = CHUNK_ROWS) -> Iterator[List[str]]:
+    """Compact JSON records, one list of strings per chunk of rows."""
+    order = [c for c in cols if c[3] is None] + [c for c in cols if c[3] == "emotions"]
+    tmpl = _record_template(cols)
+    n = len(cols[0][1]) if cols else 0
+    for start in range(0, n, chunk_rows):
+        toks = [_tokens(values[start:start + chunk_rows], kind) for _, values, kind, _ in order]
+        yield [tmpl % row for row in zip(*toks)]
+
+
+def sidecar_path(out_json: str, fmt: str) -> Path:
+    p = Path(out_json)
+    return p.with_name(p.stem + SIDECAR_SUFFIX[fmt])
+
+
+def write_jsonl(path, cols: List[Column], chunk_rows: int = CHUNK_ROWS) -> int:
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for lines in iter_records(cols, chunk_rows):
+            f.write("\n".join(lines))
+            f.write("\n")
+            n += len(lines)
+    return n
+
+
+def write_columnar(path, cols: List[Column], chunk_rows: int = CHUNK_ROWS) -> int:
+    n = len(cols[0][1]) if cols else 0
+
+    def write_column(f, name, values, kind):
+        f.write(f"{json.dumps(name)}:[")
+        for start in range(0, n, chunk_rows):
+            if start:
+                f.write(",")
+            f.write(",".join(_tokens(values[start:start + chunk_rows], kind)))
+        f.write("]")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'{{"num_frames":{n}')
+        for name, values, kind, group in cols:
+            if group is None:
+                f.write(",\n")
+                write_column(f, name, values, kind)
+        emo = [c for c in cols if c[3] == "emotions"]
+        if emo:
+            f.write(',\n"emotions":{')
+            for i, (name, values, kind, _) in enumerate(emo):
+                if i:
+                    f.write(",\n")
+                write_column(f, name, values, kind)
+            f.write("}")
+        f.write("}\n")
+    return n
+
+
+def write_with_inline_frames(path, out: dict, cols: List[Column], chunk_rows: int = CHUNK_ROWS) -> int:
+    """Write `out` (indent=2, as before) with a "frames" array appended, one compact record per line."""
+    head = json.dumps(out, ensure_ascii=False, indent=2)
+    assert head.endswith("\n}")
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(head[:-2])
+        f.write(',\n  "frames": [')
+        for lines in iter_records(cols, chunk_rows):
+            f.write(",\n    " if n else "\n    ")
+            f.write(",\n    ".join(lines))
+            n += len(lines)
+        f.write("\n  ]\n}" if n else "]\n}")
+    return n
@@ -0,0 +1,349 @@
+"""
+Incremental re-analysis of re-uploaded videos: reuse the Py-Feat rows of frames that did not change.
+
+The in-memory runners store two fingerprints with every row: "frame_hash", a 64-bit dHash
+of the whole frame, and "face_sig", the mean gray levels of a SIG_SIZE x SIG_SIZE grid over
+the row's face box (hex). When a trimmed or slightly edited upload is run against a
+previous run's results, each sampled frame is matched against them (FrameAligner):
+
+- candidates are previous frames whose frame hash is within `max_bits` and whose face
+  signatures are within `face_levels` (every cell) of the new frame's pixels in the same
+  boxes; a static room makes every frame look alike, the face region tells them apart;
+- a frame with no candidate, or with more than one, is analyzed again;
+- a single candidate must also agree with the time offset between the two uploads, which
+  is established by CONFIRM_FRAMES consecutive single matches agreeing on it (a trim), and
+  re-established the same way after a cut.
+
+A trim or cut is rarely a multiple of the sampling interval, so a fixed grid would never
+land on a frame the previous run analyzed. With fixed sampling the new upload is therefore
+sampled by FrameReuse.sample(): it walks every frame, probes the ones between samples until
+the offset is found, then snaps the grid onto the previous run's frames (shifted by the
+offset), as Audio_Stream's align_windows() does for audio windows.
+
+Matched frames take the previous rows with their new frame index, timestamp and frame
+hash; only the rest go to Py-Feat. The merged table is written in frame order and au_flags
+re-derives the segments.
+"""
+
+import itertools
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from results_io import ResultsWriter, read_results, result_columns
+
+Frame = Tuple[int, float, np.ndarray]  # (sample_idx, t_sec, frame_bgr)
+
+HASH_COL = "frame_hash"
+FACE_SIG_COL = "face_sig"
+FACE_BOX = ["FaceRectX", "FaceRectY", "FaceRectWidth", "FaceRectHeight"]
+MAX_BITS = 3         # frame hash bits that may differ (re-encoding flips a bit or two)
+HASH_EPS = 2.0       # a hash cell must be this much brighter than its left neighbour to set its bit
+SIG_SIZE = 16        # face signature grid (cells per side)
+FACE_LEVELS = 6      # gray levels any face signature cell may differ by (re-encoding moves them ~1-2)
+CONFIRM_FRAMES = 2   # consecutive single matches that establish a new time offset
+SEARCH_SAMPLES = 10  # unmatched samples in a row during which the frames between samples are probed
+SEARCH_EVERY = 30    # ... after that, probe one sample interval in this many
+
+
+def _grid_means(integral: np.ndarray, boxes, nx: int, ny: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean gray level of an ny x nx grid of cells over each (x, y, w, h) box, from a grayscale
+    integral image. Returns (n, ny, nx) means and which boxes were usable (finite, and at
+    least one pixel per cell inside the frame).
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    h_img, w_img = integral.shape[0] - 1, integral.shape[1] - 1
+    with np.errstate(invalid="ignore"):
+        x0 = np.clip(np.round(boxes[:, 0]), 0, w_img)
+        y0 = np.clip(np.round(boxes[:, 1]), 0, h_img)
+        x1 = np.clip(np.round(boxes[:, 0] + boxes[:, 2]), 0, w_img)
+        y1 = np.clip(np.round(boxes[:, 1] + boxes[:, 3]), 0, h_img)
+    ok = np.isfinite(boxes).all(axis=1) & (x1 - x0 >= nx) & (y1 - y0 >= ny)
+    x0, y0 = np.where(ok, x0, 0).astype(np.int64), np.where(ok, y0, 0).astype(np.int64)
+    x1, y1 = np.where(ok, x1, nx).astype(np.int64), np.where(ok, y1, ny).astype(np.int64)
+    xs = x0[:, None] + (x1 - x0)[:, None] * np.arange(nx + 1) // nx  # cell edges
+    ys = y0[:, None] + (y1 - y0)[:, None] * np.arange(ny + 1) // ny
+    s = integral[ys[:, :, None], xs[:, None, :]].astype(np.float64)
+    sums = s[:, 1:, 1:] - s[:, :-1, 1:] - s[:, 1:, :-1] + s[:, :-1, :-1]
+    return sums / (np.diff(ys)[:, :, None] * np.diff(xs)[:, None, :]), ok
+
+
+def frame_hash(integral: np.ndarray) -> int:
+    """64-bit dHash (9x8 grid, HASH_EPS dead zone) of a frame, as a signed int."""
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    cells = _grid_means(integral, [0, 0, w, h], 9, 8)[0][0]
+    return int(np.packbits((cells[:, 1:] - cells[:, :-1]) > HASH_EPS).view(">i8")[0])
+
+
+def face_signatures(integral: np.ndarray, boxes) -> Tuple[np.ndarray, np.ndarray]:
+    """(n, SIG_SIZE**2) uint8 face signatures of the boxes, and which boxes were usable."""
+    means, ok = _grid_means(integral, boxes, SIG_SIZE, SIG_SIZE)
+    return np.clip(np.round(means), 0, 255).astype(np.uint8).reshape(len(ok), -1), ok
+
+
+def fingerprint(frame_bgr: np.ndarray) -> Tuple[int, np.ndarray]:
+    """(frame hash, grayscale integral image) of a frame."""
+    integral = cv2.integral(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY))
+    return frame_hash(integral), integral
+
+
+def hashed_frames(frames: Iterable[Frame], prints: Dict[int, tuple]) -> Iterator[Frame]:
+    """Pass frames through, keeping each one's fingerprint by sample index until tag_rows() uses it."""
+    for item in frames:
+        prints[item[0]] = fingerprint(item[2])
+        yield item
+
+
+def tag_rows(df: pd.DataFrame, fp: Optional[tuple]) -> pd.DataFrame:
+    """Add frame_hash and face_sig (of each row's face box) to one frame's Py-Feat rows."""
+    h, integral = fp if fp is not None else (None, None)
+    df[HASH_COL] = h
+    if integral is None or not all(c in df.columns for c in FACE_BOX):
+        df[FACE_SIG_COL] = None
+        return df
+    sigs, ok = face_signatures(integral, df[FACE_BOX].apply(pd.to_numeric, errors="coerce"))
+    df[FACE_SIG_COL] = [s.tobytes().hex() if k else None for s, k in zip(sigs, ok.tolist())]
+    return df
+
+
+def _bits(a, b) -> np.ndarray:
+    """Differing bits between 64-bit hashes (arrays or ints, broadcast)."""
+    return np.bitwise_count(np.asarray(a, dtype=np.int64).view(np.uint64) ^ np.asarray(b, dtype=np.int64).view(np.uint64))
+
+
+class FrameAligner:
+    """Match frames of a new upload to the frames of a previous run (see the module docstring)."""
+
+    def __init__(self, previous: pd.DataFrame, max_bits: int = MAX_BITS, face_levels: int = FACE_LEVELS,
+                 confirm: int = CONFIRM_FRAMES):
+        self.frames, first, self.row_frame = np.unique(previous["frame"].to_numpy(dtype=np.int64),
+                                                       return_index=True, return_inverse=True)
+        self.times = previous["timestamp"].to_numpy(dtype=float)[first]
+        self.hashes = previous[HASH_COL].to_numpy(dtype=np.int64)[first]
+        n_sig = SIG_SIZE * SIG_SIZE
+        sigs = [bytes.fromhex(s) if isinstance(s, str) and len(s) == 2 * n_sig else None
+                for s in previous[FACE_SIG_COL].tolist()]
+        self.row_ok = np.array([s is not None for s in sigs], dtype=bool)
+        self.row_sig = np.frombuffer(b"".join(s or bytes(n_sig) for s in sigs), dtype=np.uint8).reshape(-1, n_sig)
+        self.row_box = previous[FACE_BOX].to_numpy(dtype=float)
+        self.max_bits, self.face_levels = max_bits, face_levels
+        self.confirm = max(1, confirm)
+        gaps = np.diff(np.sort(self.times))
+        self.tol = max(0.5 * float(np.median(gaps)), 1e-3) if gaps.size else 0.5
+        self.offset: Optional[float] = None  # previous-run time minus new time
+        self._pending: Optional[float] = None
+        self._streak = 0
+        self._run: Optional[list] = None  # [position, score, t_sec] of the best probe matching one frame
+
+    def candidates(self, integral: np.ndarray, h: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Previous frames (positions) whose frame hash and every face signature match this frame,
+        and how far each is (largest face signature cell difference plus differing hash bits).
+        """
+        bits = _bits(self.hashes, h)
+        cand = np.flatnonzero(bits <= self.max_bits)
+        if not cand.size:
+            return cand, bits[cand]
+        rows = np.flatnonzero(np.isin(self.row_frame, cand))
+        sigs, ok = face_signatures(integral, self.row_box[rows])
+        diff = np.abs(sigs.astype(np.int16) - self.row_sig[rows]).max(axis=1)
+        diff[~(ok & self.row_ok[rows])] = 255
+        worst = np.zeros(len(self.frames), dtype=np.int64)
+        np.maximum.at(worst, self.row_frame[rows], diff)
+        keep = worst[cand] <= self.face_levels
+        return cand[keep], worst[cand[keep]] + bits[cand[keep]]
+
+    def _vote(self, d: float) -> bool:
+        """Count a single match at time offset d; True if d is (now) the established offset."""
+        if self.offset is not None and abs(d - self.offset) <= self.tol:
+            return True  # the offset itself stays put, or samples snapped onto it would drift
+        if self._pending is not None and abs(d - self._pending) <= self.tol:
+            self._streak += 1
+        else:
+            self._pending, self._streak = d, 1
+        if self._streak < self.confirm:
+            return False
+        self.offset, self._pending, self._streak = d, None, 0
+        return True
+
+    def match(self, frame_bgr: np.ndarray, t_sec: float) -> Tuple[int, int]:
+        """(position of the matching previous frame or -1 to analyze this one, this frame's hash)."""
+        self.flush()
+        h, integral = fingerprint(frame_bgr)
+        cand, _ = self.candidates(integral, h)
+        if cand.size != 1:
+            return -1, h  # changed, or ambiguous: which previous frame it repeats is unknown
+        j = int(cand[0])
+        return (j if self._vote(float(self.times[j]) - t_sec) else -1), h
+
+    def probe(self, frame_bgr: np.ndarray, t_sec: float):
+        """
+        Look for the time offset with a frame that is not sampled. Consecutive probes that
+        match the same previous frame vote once, with the closest of them.
+        """
+        h, integral = fingerprint(frame_bgr)
+        cand, score = self.candidates(integral, h)
+        if cand.size != 1:
+            self.flush()
+            return
+        j = int(cand[0])
+        if self._run is not None and self._run[0] != j:
+            self.flush()
+        if self._run is None or score[0] < self._run[1]:
+            self._run = [j, int(score[0]), t_sec]
+
+    def flush(self):
+        """Vote with the pending run of probes, if any."""
+        if self._run is not None:
+            j, _, t_sec = self._run
+            self._run = None
+            self._vote(float(self.times[j]) - t_sec)
+
+    def next_time(self, last: Optional[float], step: float, now: Optional[float] = None) -> float:
+        """
+        When to sample after a frame sampled at `last`: `step` later, or, once the offset is
+        known, at the previous frame (shifted by the offset) nearest to that if one is within
+        half a step of it, so unchanged content is sampled where it was analyzed before.
+        Only times after `now` (the current frame) are picked.
+        """
+        if last is None:
+            return 0.0
+        due = last + step
+        if self.offset is not None:
+            targets = self.times - self.offset
+            lo = due - 0.5 * step if now is None else max(due - 0.5 * step, now)
+            near = targets[np.searchsorted(targets, lo, side="right"):np.searchsorted(targets, due + 0.5 * step)]
+            if near.size:
+                return float(near[np.argmin(np.abs(near - due))])
+        return due
+
+
+class FrameReuse:
+    """
+    The previous run's frames matched to a new upload's samples, as the sampler yields them:
+    `matches` maps each yielded sample index to FrameAligner.match()'s (position, hash).
+    """
+
+    def __init__(self, previous: pd.DataFrame, max_bits: int = MAX_BITS, face_levels: int = FACE_LEVELS):
+        self.previous = previous
+        self.aligner = FrameAligner(previous, max_bits, face_levels)
+        self.matches: Dict[int, Tuple[int, int]] = {}
+
+    def tag(self, frames: Iterable[Frame]) -> Iterator[Frame]:
+        """Match the frames of any sampler, as they are."""
+        for idx, t_sec, frame in frames:
+            self.matches[idx] = self.aligner.match(frame, t_sec)
+            yield idx, t_sec, frame
+
+    def sample(self, source: Iterable[Tuple[float, Callable[[], np.ndarray]]], step: float) -> Iterator[Frame]:
+        """
+        Sample one frame every `step` seconds from every frame of the upload ((t_sec, get)
+        pairs, e.g. frame_extraction.iter_source_frames), with the grid snapped onto the
+        previous run's frames once the time offset is known (FrameAligner.next_time): a trim
+        or cut that is not a multiple of `step` still lands samples on analyzed content.
+
+        While the offset is unknown, or the last samples did not match, the frames between
+        samples are probed to find it: for SEARCH_SAMPLES samples in a row, then for one
+        sample interval in every SEARCH_EVERY, so an upload that shares nothing with the
+        previous run is not fingerprinted frame by frame.
+        """
+        a = self.aligner
+        idx, last, misses, period = 0, None, 0, 0.0
+        due = a.next_time(None, step)
+        prev_t = None
+        for t_sec, get in source:
+            if prev_t is not None and not period:
+                period = t_sec - prev_t  # frame period, for "the frame nearest to a time"
+            prev_t = t_sec
+            if t_sec + 0.5 * period >= due:
+                frame = get()
+                j, h = self.matches[idx] = a.match(frame, t_sec)
+                misses = 0 if j >= 0 else misses + 1
+                yield idx, t_sec, frame
+                idx += 1
+                last = t_sec
+                due = a.next_time(last, step)
+            elif (misses or a.offset is None) and (misses < SEARCH_SAMPLES or misses % SEARCH_EVERY == 0):
+                offset = a.offset
+                a.probe(get(), t_sec)
+                if a.offset != offset:  # found (or moved): aim the next sample at the previous frames
+                    due = a.next_time(last, step, now=t_sec)
+        a.flush()
+
+
+def load_previous(path) -> Optional[pd.DataFrame]:
+    """A previous run's results with frame hashes and face signatures, or None (after a warning) if unusable."""
+    if not path or not Path(path).is_file():
+        print(f"[warn] No previous results at {path}; analyzing every frame.", flush=True)
+        return None
+    columns = result_columns(str(path))
+    missing = [c for c in [HASH_COL, FACE_SIG_COL] + FACE_BOX if c not in columns]
+    if missing:
+        print(f"[warn] {path} has no {', '.join(missing)} column (older or disk-pipeline run); "
+              f"analyzing every frame.", flush=True)
+        return None
+    df = read_results(str(path))
+    return df[df[HASH_COL].notna() & df["frame"].notna()].reset_index(drop=True)
+
+
+def reuse_consumer(run: Callable[[Iterable[Frame], str], Optional[str]], reuse: FrameReuse, output_path: str):
+    """
+    Wrap a Py-Feat frame consumer for incremental re-analysis.
+
+    run(frames, path) analyzes frames and writes their rows to path (returning it, or None
+    when nothing was detected). The frames come from one of `reuse`'s samplers; those that
+    match the previous run are held back and the rest go to run() with a temporary path.
+    The previous rows of the matched frames are then merged in and the whole table is
+    written to output_path. Returns output_path (None if there are no rows at all).
+    """
+    previous = reuse.previous
+
+    def consume(frames: Iterable[Frame]) -> Optional[str]:
+        rows_of = previous.groupby("frame").indices  # previous frame -> row positions
+        reused = []  # (new idx, t_sec, hash, previous frame)
+        n = 0
+
+        def fresh():
+            nonlocal n
+            for idx, t_sec, frame in frames:
+                n += 1
+                j, h = reuse.matches.pop(idx)
+                if j < 0:
+                    yield idx, t_sec, frame
+                else:
+                    reused.append((idx, t_sec, h, reuse.aligner.frames[j]))
+
+        out = Path(output_path)
+        tmp = out.with_name(out.stem + ".new" + out.suffix)
+        parts = []
+        todo = fresh()
+        head = next(todo, None)  # start Py-Feat (and load its models) only if a frame changed
+        new_path = run(itertools.chain([head], todo), str(tmp)) if head is not None else None
+        if new_path:
+            parts.append(read_results(new_path))
+        if reused:
+            pos = [rows_of[f] for _, _, _, f in reused]
+            old = previous.iloc[np.concatenate(pos)].copy()
+            reps = [len(p) for p in pos]
+            for col, k in (("frame", 0), ("timestamp", 1), (HASH_COL, 2)):
+                old[col] = np.repeat([r[k] for r in reused], reps)
+            parts.append(old)
+        if tmp.exists():
+            os.remove(tmp)
+        print(f"[info] Incremental: {len(reused)} of {n} frames reused from the previous run, "
+              f"{n - len(reused)} analyzed", flush=True)
+        if not parts:
+            return None
+
+        merged = pd.concat(parts, ignore_index=True).sort_values("frame", kind="stable")
+        with ResultsWriter(str(out)) as writer:
+            writer.append(merged)
+        print(f">>> py-feat results saved to: {out} ({writer.rows()} rows)")
+        return str(out)
+
+    return consume
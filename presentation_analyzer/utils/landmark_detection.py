@@ -1,52 +1,212 @@
 import cv2
 import mediapipe as mp
+import numpy as np
 import os
 import json
 
+from landmark_store import PARTS, PART_SLICES, LandmarkWriter, empty_frame
+
 mp_holistic = mp.solutions.holistic
 
-def detect_landmarks(frame_dir, output_json_dir="landmarks/"):
-    if not os.path.exists(output_json_dir):
-        os.makedirs(output_json_dir)
+# video : static_image_mode=False, frames fed in order; landmarks are tracked between frames
+#         and the detectors only re-run when tracking is lost
+# static: static_image_mode=True, full detection on every frame (original behaviour)
+LANDMARK_MODES = ("video", "static")
+# npy : one columnar store per run (see landmark_store.py)
+# json: one indented JSON file per frame (original output)
+LANDMARK_FORMATS = ("npy", "json")
+
+def _extract_landmarks(landmarks, label):
+    return {
+        label: [
+            {
+                "x": lm.x,
+                "y": lm.y,
+                "z": lm.z if hasattr(lm, 'z') else None,
+                "visibility": lm.visibility if hasattr(lm, 'visibility') else None
+            }
+            for lm in landmarks.landmark
+        ]
+    }
 
-    holistic = mp_holistic.Holistic(static_image_mode=True)
+def _results_to_dict(results):
+    landmarks_dict = {}
+    if results.pose_landmarks:
+        landmarks_dict.update(_extract_landmarks(results.pose_landmarks, "pose"))
+    if results.face_landmarks:
+        landmarks_dict.update(_extract_landmarks(results.face_landmarks, "face"))
+    if results.left_hand_landmarks:
+        landmarks_dict.update(_extract_landmarks(results.left_hand_landmarks, "left_hand"))
+    if results.right_hand_landmarks:
+        landmarks_dict.update(_extract_landmarks(results.right_hand_landmarks, "right_hand"))
+    return landmarks_dict
 
-    for frame_name in sorted(os.listdir(frame_dir)):
-        if not frame_name.endswith(".jpg"):
+def _results_to_array(results):
+    """(543, 4) float32 array (NaN for missing parts) and the per-part validity mask."""
+    out = empty_frame()
+    mask = []
+    for name, n in PARTS:
+        part = getattr(results, f"{name}_landmarks")
+        if not part:
+            mask.append(False)
             continue
+        rows = [(lm.x, lm.y, getattr(lm, "z", np.nan), getattr(lm, "visibility", np.nan))
+                for lm in part.landmark[:n]]
+        out[PART_SLICES[name]][:len(rows)] = rows
+        mask.append(True)
+    return out, mask
 
-        frame_path = os.path.join(frame_dir, frame_name)
-        image_bgr = cv2.imread(frame_path)
-        image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-
-        results = holistic.process(image_rgb)
-        landmarks_dict = {}
-
-        def extract_landmarks(landmarks, label):
-            return {
-                label: [
-                    {
-                        "x": lm.x,
-                        "y": lm.y,
-                        "z": lm.z if hasattr(lm, 'z') else None,
-                        "visibility": lm.visibility if hasattr(lm, 'visibility') else None
-                    }
-                    for lm in landmarks.landmark
-                ]
-            }
+def _make_holistic(mode):
+    if mode not in LANDMARK_MODES:
+        raise ValueError(f"Unknown landmark mode '{mode}'. Choose from {LANDMARK_MODES}")
+    return mp_holistic.Holistic(static_image_mode=(mode == "static"))
+
+def _records(holistic, frames, output_format):
+    """Run Holistic over frames in order; yields (idx, t_sec, array, mask) for npy or (idx, t_sec, dict) for json."""
+    for idx, t_sec, frame_bgr in frames:
+        results = holistic.process(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+        if output_format == "npy":
+            yield (idx, t_sec, *_results_to_array(results))
+        else:
+            yield idx, t_sec, _results_to_dict(results)
+
+class _Sink:
+    """Writes records in the order they are added: one store (npy) or one file per frame (json)."""
+
+    def __init__(self, output_dir, mode, output_format, source=None):
+        if output_format not in LANDMARK_FORMATS:
+            raise ValueError(f"Unknown landmark format '{output_format}'. Choose from {LANDMARK_FORMATS}")
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        self.output_dir = output_dir
+        self.writer = LandmarkWriter(output_dir, mode=mode, source=source) if output_format == "npy" else None
+        self.n = 0
+
+    def add(self, rec):
+        if self.writer is not None:
+            self.writer.append(*rec)
+        else:
+            idx, _, landmarks_dict = rec
+            json_path = os.path.join(self.output_dir, f"frame_{idx:04d}.json")
+            with open(json_path, 'w') as f:
+                json.dump(landmarks_dict, f, indent=2)
+        self.n += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        return self.n
+
+def _run(frames, output_dir, mode, output_format, source=None):
+    """frames: (sample_idx, t_sec, frame_bgr) in order. Returns the number of frames processed."""
+    sink = _Sink(output_dir, mode, output_format, source)
+    holistic = _make_holistic(mode)
+    try:
+        for rec in _records(holistic, frames, output_format):
+            sink.add(rec)
+    finally:
+        holistic.close()
+    return sink.close()
+
+# ---------- Sharded (multi-process) mode ----------
+_WORKER_HOLISTIC = None
+
+def _init_shard_worker(num_threads):
+    cv2.setNumThreads(max(1, num_threads))
+
+def _detect_block(block, mode, output_format):
+    """One contiguous frame range. Video mode starts a fresh tracker per range; static mode reuses one graph."""
+    global _WORKER_HOLISTIC
+    if mode == "video":
+        holistic = _make_holistic(mode)
+        try:
+            return list(_records(holistic, block, output_format))
+        finally:
+            holistic.close()
+    if _WORKER_HOLISTIC is None:
+        _WORKER_HOLISTIC = _make_holistic(mode)
+    return list(_records(_WORKER_HOLISTIC, block, output_format))
+
+def detect_landmarks_sharded(frames, output_dir="landmarks/", workers=2, mode="video", output_format="npy",
+                             block_size=64, threads_per_worker=1, source=None):
+    """
+    Shard Holistic across `workers` processes by frame range.
+
+    frames are cut into contiguous blocks of `block_size` (each block is tracked on its own in
+    video mode); at most 2 blocks per worker are in flight, so memory stays bounded, and
+    results are written in frame order as blocks complete.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing as mproc
+
+    sink = _Sink(output_dir, mode, output_format, source)
+    ctx = mproc.get_context("spawn")
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_shard_worker, initargs=(threads_per_worker,)) as pool:
+        block = []
+        for item in frames:
+            block.append(item)
+            if len(block) >= block_size:
+                pending.append(pool.submit(_detect_block, block, mode, output_format))
+                block = []
+                while len(pending) >= 2 * workers:
+                    for rec in pending.popleft().result():
+                        sink.add(rec)
+        if block:
+            pending.append(pool.submit(_detect_block, block, mode, output_format))
+        while pending:
+            for rec in pending.popleft().result():
+                sink.add(rec)
+    n = sink.close()
+    print(f"[✓] Landmarks for {n} frames saved in '{output_dir}' ({mode}, {output_format}, {workers} workers)")
+    return n
+
+def _iter_frame_dir(frame_dir):
+    """(idx, t_sec, frame_bgr) for frame_XXXX.jpg files, with times from the extractor's sidecar if present."""
+    from frame_extraction import TIMESTAMPS_FILE
+    times = {}
+    ts_path = os.path.join(frame_dir, TIMESTAMPS_FILE)
+    if os.path.exists(ts_path):
+        with open(ts_path, encoding="utf-8") as f:
+            next(f, None)
+            for line in f:
+                name, _, t = line.strip().partition(",")
+                times[name] = float(t)
+
+    names = [f for f in sorted(os.listdir(frame_dir)) if f.endswith(".jpg")]
+    for i, frame_name in enumerate(names):
+        image_bgr = cv2.imread(os.path.join(frame_dir, frame_name))
+        if image_bgr is None:
+            continue
+        stem = frame_name[:-4]
+        idx = int(stem.split("_")[-1]) if stem.split("_")[-1].isdigit() else i
+        yield idx, times.get(frame_name), image_bgr
+
+def detect_landmarks(frame_dir, output_dir="landmarks/", mode="video", output_format="json", workers=1,
+                     output_json_dir=None):
+    """
+    Landmarks of the frame_*.jpg images in frame_dir.
+
+    Writes per-frame JSON files by default, as before; output_format="npy" writes one
+    columnar store instead. output_json_dir is the old name of output_dir and still accepted.
+    """
+    if output_json_dir is not None:
+        output_dir = output_json_dir
+    if workers > 1:
+        return detect_landmarks_sharded(_iter_frame_dir(frame_dir), output_dir, workers, mode, output_format,
+                                        source=os.path.abspath(frame_dir))
+    n = _run(_iter_frame_dir(frame_dir), output_dir, mode, output_format, source=os.path.abspath(frame_dir))
+    print(f"[✓] Landmarks for {n} frames saved in '{output_dir}' ({mode}, {output_format})")
+    return n
+
+def detect_landmarks_from_arrays(frames, output_dir="landmarks/", mode="video", output_format="npy"):
+    """
+    In-memory variant of detect_landmarks.
 
-        if results.pose_landmarks:
-            landmarks_dict.update(extract_landmarks(results.pose_landmarks, "pose"))
-        if results.face_landmarks:
-            landmarks_dict.update(extract_landmarks(results.face_landmarks, "face"))
-        if results.left_hand_landmarks:
-            landmarks_dict.update(extract_landmarks(results.left_hand_landmarks, "left_hand"))
-        if results.right_hand_landmarks:
-            landmarks_dict.update(extract_landmarks(results.right_hand_landmarks, "right_hand"))
-
-        json_path = os.path.join(output_json_dir, frame_name.replace(".jpg", ".json"))
-        with open(json_path, 'w') as f:
-            json.dump(landmarks_dict, f, indent=2)
-
-    holistic.close()
-    print(f"[✓] Landmarks saved in '{output_json_dir}'")
+    frames: iterable of (sample_idx, t_sec, frame_bgr) in order; json output keeps the frame_XXXX.json naming.
+    """
+    n = _run(frames, output_dir, mode, output_format)
+    print(f"[✓] Landmarks for {n} frames saved in '{output_dir}' ({mode}, {output_format})")
+    return n
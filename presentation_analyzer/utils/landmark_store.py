@@ -0,0 +1,103 @@
+"""
+Columnar landmark store: one float32 array for a whole video instead of a JSON file per frame.
+
+Layout of a store directory:
+    landmarks.npy   float32 (F, 543, 4)  x, y, z, visibility; NaN where a part was not detected
+    mask.npy        bool    (F, 4)       per-part validity (pose, face, left_hand, right_hand)
+    frames.npy      int32   (F,)         sample index of each row
+    timestamps.npy  float64 (F,)         source time in seconds (NaN if unknown)
+    meta.json       part offsets, field names, shape, detection mode
+
+Landmark rows per frame: pose 0-32, face 33-500, left hand 501-521, right hand 522-542.
+Everything is plain .npy, so consumers can np.load(..., mmap_mode="r") without MediaPipe.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+PARTS = (("pose", 33), ("face", 468), ("left_hand", 21), ("right_hand", 21))
+FIELDS = ("x", "y", "z", "visibility")
+N_LANDMARKS = sum(n for _, n in PARTS)  # 543
+
+PART_SLICES: Dict[str, slice] = {}
+_off = 0
+for _name, _n in PARTS:
+    PART_SLICES[_name] = slice(_off, _off + _n)
+    _off += _n
+PART_INDEX = {name: i for i, (name, _) in enumerate(PARTS)}
+
+STORE_FILES = ("landmarks.npy", "mask.npy", "frames.npy", "timestamps.npy", "meta.json")
+
+
+def empty_frame() -> np.ndarray:
+    return np.full((N_LANDMARKS, len(FIELDS)), np.nan, dtype=np.float32)
+
+
+class LandmarkWriter:
+    """Collect per-frame (543, 4) arrays in order and write the store on close()."""
+
+    def __init__(self, output_dir: str, mode: str = "video", source: Optional[str] = None):
+        self.output_dir = output_dir
+        self.meta = {"mode": mode, "source": source}
+        self._frames, self._mask, self._idx, self._ts = [], [], [], []
+
+    def append(self, idx: int, t_sec, frame: np.ndarray, mask) -> None:
+        self._frames.append(frame)
+        self._mask.append(mask)
+        self._idx.append(idx)
+        self._ts.append(np.nan if t_sec is None else float(t_sec))
+
+    def __len__(self):
+        return len(self._frames)
+
+    def close(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        data = np.stack(self._frames) if self._frames else np.zeros((0, N_LANDMARKS, len(FIELDS)), np.float32)
+        mask = np.asarray(self._mask, dtype=bool).reshape(-1, len(PARTS))
+        np.save(os.path.join(self.output_dir, "landmarks.npy"), data)
+        np.save(os.path.join(self.output_dir, "mask.npy"), mask)
+        np.save(os.path.join(self.output_dir, "frames.npy"), np.asarray(self._idx, dtype=np.int32))
+        np.save(os.path.join(self.output_dir, "timestamps.npy"), np.asarray(self._ts, dtype=np.float64))
+        meta = dict(self.meta,
+                    shape=list(data.shape),
+                    fields=list(FIELDS),
+                    parts={name: [s.start, s.stop] for name, s in PART_SLICES.items()},
+                    detected={name: int(mask[:, i].sum()) for i, (name, _) in enumerate(PARTS)})
+        with open(os.path.join(self.output_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return self.output_dir
+
+
+class LandmarkStore:
+    """Read side: arrays are memory-mapped by default."""
+
+    def __init__(self, store_dir: str, mmap: bool = True):
+        mode = "r" if mmap else None
+        self.store_dir = store_dir
+        self.landmarks = np.load(os.path.join(store_dir, "landmarks.npy"), mmap_mode=mode)
+        self.mask = np.load(os.path.join(store_dir, "mask.npy"), mmap_mode=mode)
+        self.frames = np.load(os.path.join(store_dir, "frames.npy"))
+        self.timestamps = np.load(os.path.join(store_dir, "timestamps.npy"))
+        with open(os.path.join(store_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def part(self, name: str) -> np.ndarray:
+        """(F, n, 4) view of one body part (NaN rows where it was not detected)."""
+        return self.landmarks[:, PART_SLICES[name]]
+
+    def valid(self, name: str) -> np.ndarray:
+        return self.mask[:, PART_INDEX[name]]
+
+
+def load_landmarks(store_dir: str, mmap: bool = True) -> LandmarkStore:
+    return LandmarkStore(store_dir, mmap=mmap)
+
+
+def is_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, "landmarks.npy")) and os.path.exists(os.path.join(path, "meta.json"))
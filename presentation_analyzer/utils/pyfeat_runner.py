@@ -1,12 +1,21 @@
 # presentation_analyzer/utils/pyfeat_runner.py
 import os
 import sys
+import time
 import argparse
 import inspect
-from typing import List
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import multiprocessing as mp
+import numpy as np
 import pandas as pd
 import cv2
 
+from face_tracking import BOX_COLUMNS, FaceTracker, boxes_from_fex
+from incremental import hashed_frames, tag_rows
+from results_io import ResultsWriter, default_results_path
+
 def _list_images(frame_dir: str) -> List[str]:
     return [
         os.path.join(frame_dir, f)
@@ -21,17 +30,30 @@ def _load_rgb(img_path: str):
         raise RuntimeError(f"cv2.imread() returned None for {img_path}")
     return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
 
-def _make_detector():
-    """Create a Detector instance compatible with the installed py-feat version."""
-    from feat import Detector
+def default_num_threads() -> int:
+    """Torch intra-op threads: 1 on Windows (avoids the handle issues seen there), all cores elsewhere."""
+    if sys.platform.startswith("win"):
+        return 1
+    return os.cpu_count() or 1
 
-    # Be conservative with threads on Windows
+def _set_torch_threads(num_threads: Optional[int]):
+    n = num_threads or default_num_threads()
     try:
         import torch
-        torch.set_num_threads(1)
-        torch.set_num_interop_threads(1)
+        torch.set_num_threads(n)
+        # Only settable once per process, before any parallel work.
+        try: torch.set_num_interop_threads(1 if n == 1 else min(n, 4))
+        except RuntimeError: pass
     except Exception:
         pass
+    return n
+
+def _make_detector(num_threads: Optional[int] = None):
+    """Create a Detector instance compatible with the installed py-feat version."""
+    from feat import Detector
+
+    n = _set_torch_threads(num_threads)
+    print(f">>> torch threads: {n}")
 
     # Introspect signature to avoid unsupported kwargs
     sig = inspect.signature(Detector.__init__)
@@ -55,67 +77,415 @@ def _make_detector():
 
     raise RuntimeError(f"Detector init failed; last error: {last_err}")
 
-def run_pyfeat_on_frames(frame_dir="frames", output_csv="output/pyfeat_results.csv"):
-    abs_frames = os.path.abspath(frame_dir)
-    print(">>> Py-Feat runner starting…")
-    print(f">>> Frame dir: {abs_frames}")
-
-    image_paths = _list_images(frame_dir)
-    print(f">>> Found {len(image_paths)} images")
-    if not image_paths:
-        print(">>> No valid images found. Exiting.")
-        return
-
+def _load_detector(num_threads: Optional[int] = None):
+    """Import py-feat and build a Detector; returns None (after logging) on failure."""
     try:
         from feat import Detector  # noqa: F401 (import to ensure module present)
     except Exception as e:
         print(f">>> [EXCEPTION] Could not import py-feat: {e}")
-        return
+        return None
 
     try:
-        detector = _make_detector()
+        return _make_detector(num_threads)
     except Exception as e:
         print(f">>> [EXCEPTION] Detector init failed: {e}")
-        return
+        return None
 
+def _detect_one(detector, rgb=None, img_path=None):
     detect_img = getattr(detector, "detect_image", None)
-    dfs = []
+    if callable(detect_img):
+        if rgb is None:
+            rgb = _load_rgb(img_path)
+        return detect_img(rgb)
+    return detector.detect(img_path)
 
-    for i, img_path in enumerate(image_paths, 1):
+def _supports_batches(detector) -> bool:
+    detect_img = getattr(detector, "detect_image", None)
+    if not callable(detect_img):
+        return False
+    try:
+        return "batch_size" in inspect.signature(detect_img).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _split_batch_result(df, n_items: int):
+    """
+    Split one batched detect_image result into per-input DataFrames (None where no face was found).
+
+    Rows are matched through the "frame" column py-feat adds (0..n-1 within the call); without it,
+    a result with exactly one row per input is taken in order. Anything else is ambiguous -> None.
+    """
+    if df is None or df.empty:
+        return [None] * n_items
+    if "frame" in df.columns:
+        frames = pd.to_numeric(df["frame"], errors="coerce")
+        if frames.notna().all() and frames.min() >= 0 and frames.max() < n_items:
+            out = [None] * n_items
+            for k, part in df.groupby(frames.astype(int), sort=True):
+                part = part.reset_index(drop=True)
+                part["frame"] = 0  # what a single-image call reports; keeps CSVs identical across batch sizes
+                out[int(k)] = part
+            return out
+    if len(df) == n_items:
+        return [df.iloc[[i]].reset_index(drop=True) for i in range(n_items)]
+    return None
+
+def _detect_batch(detector, batch_size: int, rgbs=None, img_paths=None):
+    """
+    Detect on a list of inputs, batched when the installed py-feat supports it.
+
+    Returns one DataFrame (or None) per input, in input order. Falls back to one call per
+    input when batching is unavailable or its result cannot be mapped back to the inputs.
+    """
+    n_items = len(rgbs) if rgbs is not None else len(img_paths)
+    if batch_size > 1 and n_items > 1 and _supports_batches(detector):
+        inputs = img_paths if img_paths is not None else rgbs
+        try:
+            parts = _split_batch_result(detector.detect_image(inputs, batch_size=batch_size), n_items)
+            if parts is not None:
+                return parts
+        except Exception as e:
+            print(f"[warn] batched detect failed ({e}); falling back to single frames")
+    out = []
+    for i in range(n_items):
         try:
-            if callable(detect_img):
-                rgb = _load_rgb(img_path)
-                df = detect_img(rgb)
+            if rgbs is not None:
+                out.append(_detect_one(detector, rgb=rgbs[i]))
             else:
-                df = detector.detect(img_path)
+                out.append(_detect_one(detector, img_path=img_paths[i]))
+        except Exception as e:
+            print(f"[warn] detect failed on {img_paths[i] if img_paths is not None else f'frame {i}'}: {e}")
+            out.append(None)
+    return out
+
+# ---------- Tracking mode ----------
+STAGES = ("load", "detect_full", "track", "landmarks", "aus", "emotions")
+_EMOTION_NAMES = {"anger", "disgust", "fear", "happiness", "sadness", "surprise", "neutral"}
 
+def _new_stage_stats():
+    return {"time": dict.fromkeys(STAGES, 0.0), "full": 0, "tracked": 0, "staged_ok": True, "template": None}
+
+def _timed(stats, stage, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        stats["time"][stage] += time.perf_counter() - t0
+
+def _rows_like(template, boxes, landmarks, aus, emotions):
+    """Build result rows with the keyframe's column layout from per-stage model outputs."""
+    cols = list(template.columns)
+    au_cols = [c for c in cols if re.fullmatch(r"AU\d+", c)]
+    emo_cols = [c for c in cols if c in _EMOTION_NAMES]
+    lm_x = [c for c in cols if re.fullmatch(r"x_\d+", c)]
+    lm_y = [c for c in cols if re.fullmatch(r"y_\d+", c)]
+    rows = []
+    for i, box in enumerate(boxes):
+        a = np.asarray(aus[i], dtype=float).ravel()
+        e = np.asarray(emotions[i], dtype=float).ravel()
+        if len(a) != len(au_cols) or len(e) != len(emo_cols):
+            raise ValueError(f"stage output sizes {len(a)}/{len(e)} do not match columns {len(au_cols)}/{len(emo_cols)}")
+        row = dict.fromkeys(cols, np.nan)  # pose etc. are not re-estimated on tracked frames
+        if "frame" in row:
+            row["frame"] = 0
+        row.update((c, v) for c, v in zip(BOX_COLUMNS, box) if c in row)
+        lm = np.asarray(landmarks[i], dtype=float).reshape(-1, 2)
+        if len(lm) == len(lm_x) == len(lm_y):
+            row.update(zip(lm_x, lm[:, 0]))
+            row.update(zip(lm_y, lm[:, 1]))
+        row.update(zip(au_cols, a))
+        row.update(zip(emo_cols, e))
+        rows.append(row)
+    return pd.DataFrame(rows, columns=cols)
+
+def _detect_from_boxes(detector, rgb, boxes, stats):
+    """Skip face detection: run landmark, AU and emotion models on the tracked boxes."""
+    batch = rgb[None]
+    faces = [[[x, y, x + w, y + h, s] for x, y, w, h, s in boxes]]
+    lms = _timed(stats, "landmarks", detector.detect_landmarks, batch, faces)
+    aus = _timed(stats, "aus", detector.detect_aus, batch, lms)
+    emos = _timed(stats, "emotions", detector.detect_emotions, batch, faces, lms)
+    return _rows_like(stats["template"], boxes, lms[0], aus[0], emos[0])
+
+def _detect_tracked(detector, rgb, tracker: FaceTracker, stats):
+    """
+    Full detection every `tracker.redetect_every` frames (or when tracking confidence drops);
+    in between, the tracked boxes go straight to the landmark/AU/emotion models.
+    """
+    if stats["staged_ok"] and stats["template"] is not None and not tracker.needs_detection():
+        boxes, score = _timed(stats, "track", tracker.update, rgb)
+        if boxes and score >= tracker.min_score:
+            try:
+                df = _detect_from_boxes(detector, rgb, boxes, stats)
+                stats["tracked"] += 1
+                return df
+            except Exception as e:
+                print(f"[warn] staged detection unavailable with this py-feat ({e}); tracking disabled")
+                stats["staged_ok"] = False
+    df = _timed(stats, "detect_full", _detect_one, detector, rgb)
+    stats["full"] += 1
+    boxes = boxes_from_fex(df)
+    if boxes and stats["template"] is None:
+        stats["template"] = df.iloc[:0]
+    tracker.reset(rgb, boxes)
+    return df
+
+def _report_stages(stats, log_prefix: str = ""):
+    t = stats["time"]
+    nf, nt = stats["full"], stats["tracked"]
+    print(f">>> {log_prefix}Stage breakdown (s): " + ", ".join(f"{k}={v:.2f}" for k, v in t.items()))
+    print(f">>> {log_prefix}Frames: {nf} full detections, {nt} tracked")
+    if nf and nt:
+        per_full = t["detect_full"] / nf
+        per_tracked = (t["track"] + t["landmarks"] + t["aus"] + t["emotions"]) / nt
+        print(f">>> {log_prefix}Est. time saved by tracking: {nt * (per_full - per_tracked):.2f}s "
+              f"({per_full * 1000:.0f} ms/frame full vs {per_tracked * 1000:.0f} ms/frame tracked)")
+
+def _detect_paths_tracked(detector, image_paths: List[str], track_every: int, track_min_score: float,
+                          log_prefix: str = ""):
+    tracker = FaceTracker(track_every, track_min_score)
+    stats = _new_stage_stats()
+    for i, img_path in enumerate(image_paths, 1):
+        try:
+            rgb = _timed(stats, "load", _load_rgb, img_path)
+            df = _detect_tracked(detector, rgb, tracker, stats)
+        except Exception as e:
+            print(f"[warn] detect failed on {img_path}: {e}")
+            df = None
+        if df is None or df.empty:
+            print(f"[warn] Empty result for {img_path}")
+        else:
+            df["image_path"] = os.path.abspath(img_path)
+            yield df
+        if i % 10 == 0 or i == len(image_paths):
+            print(f"    {log_prefix}... processed {i}/{len(image_paths)}")
+    _report_stages(stats, log_prefix)
+
+def _detect_paths(detector, image_paths: List[str], batch_size: int, log_prefix: str = "",
+                  track_every: int = 0, track_min_score: float = 0.6):
+    """Yield one result DataFrame per detected frame, in frame order."""
+    if track_every > 1:
+        yield from _detect_paths_tracked(detector, image_paths, track_every, track_min_score, log_prefix)
+        return
+    step = max(1, batch_size)
+    for start in range(0, len(image_paths), step):
+        chunk = image_paths[start:start + step]
+        for img_path, df in zip(chunk, _detect_batch(detector, batch_size, img_paths=chunk)):
             if df is None or df.empty:
                 print(f"[warn] Empty result for {img_path}")
                 continue
-
             df["image_path"] = os.path.abspath(img_path)
-            dfs.append(df)
+            yield df
+        done = start + len(chunk)
+        if done % 10 < step or done == len(image_paths):
+            print(f"    {log_prefix}... processed {done}/{len(image_paths)}")
+
+def _attach_timestamps(dfs, frame_dir: str):
+    """Add a "timestamp" column from the extractor's timestamps.csv sidecar, when there is one (lazily, per df)."""
+    from frame_extraction import TIMESTAMPS_FILE
+    path = os.path.join(frame_dir, TIMESTAMPS_FILE)
+    if not os.path.exists(path):
+        yield from dfs
+        return
+    ts = pd.read_csv(path)
+    times = dict(zip(ts["file"].astype(str), ts["timestamp"].astype(float)))
+    for df in dfs:
+        df["timestamp"] = df["image_path"].map(lambda p: times.get(os.path.basename(p), np.nan))
+        yield df
+
+def _save_results(dfs, output_path):
+    """
+    Stream result DataFrames to `output_path` (.parquet: float32 row groups, else CSV) as they arrive.
+
+    Returns the path, or None if nothing was detected.
+    """
+    writer = ResultsWriter(output_path)
+    try:
+        writer.extend(dfs)
+    finally:
+        writer.close()
+    return _report_saved(writer)
+
+def _report_saved(writer: ResultsWriter):
+    if not writer.rows():
+        print(">>> [ERROR] No successful detections; no results written.")
+        return None
+    print(f">>> py-feat results saved to: {os.path.abspath(writer.path)} ({writer.rows()} rows)")
+    return writer.path
+
+def _report_rate(n_frames: int, t0: float):
+    dt = time.perf_counter() - t0
+    print(f">>> Detection: {n_frames} frames in {dt:.2f}s ({n_frames / max(dt, 1e-9):.2f} fps)")
+
+# ---------- Sharded (multi-process) mode ----------
+_WORKER_DETECTOR = None
+
+def _init_worker(num_threads: int):
+    global _WORKER_DETECTOR
+    _WORKER_DETECTOR = _make_detector(num_threads)
+
+def _detect_shard(shard_idx: int, image_paths: List[str], batch_size: int, track_every: int, track_min_score: float):
+    dfs = list(_detect_paths(_WORKER_DETECTOR, image_paths, batch_size, log_prefix=f"[shard {shard_idx}] ",
+                             track_every=track_every, track_min_score=track_min_score))
+    return pd.concat(dfs, ignore_index=True) if dfs else None
+
+def _run_sharded(image_paths: List[str], workers: int, batch_size: int, num_threads: Optional[int],
+                 track_every: int = 0, track_min_score: float = 0.6):
+    """Split the frame list into `workers` contiguous shards, one warm Detector per process; yield them in frame order."""
+    threads = max(1, (num_threads or default_num_threads()) // workers)
+    size = -(-len(image_paths) // workers)
+    shards = [image_paths[i:i + size] for i in range(0, len(image_paths), size)]
+    print(f">>> Sharded mode: {len(shards)} workers x {threads} threads, batch_size={batch_size}")
+    ctx = mp.get_context("spawn")  # fresh interpreters; torch and fork do not mix
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=ctx,
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = [pool.submit(_detect_shard, i, shard, batch_size, track_every, track_min_score) for i, shard in enumerate(shards)]
+        for f in futures:
+            df = f.result()
+            if df is not None:
+                yield df
+
+def run_pyfeat_on_frames(frame_dir="frames", output_csv=default_results_path(),
+                         batch_size=1, num_threads=None, workers=1, track_every=0, track_min_score=0.6,
+                         detector=None):
+    abs_frames = os.path.abspath(frame_dir)
+    print(">>> Py-Feat runner starting…")
+    print(f">>> Frame dir: {abs_frames}")
 
-            if i % 10 == 0 or i == len(image_paths):
-                print(f"    ... processed {i}/{len(image_paths)}")
+    image_paths = _list_images(frame_dir)
+    print(f">>> Found {len(image_paths)} images")
+    if not image_paths:
+        print(">>> No valid images found. Exiting.")
+        return
+
+    if workers > 1 and len(image_paths) > 1:
+        t0 = time.perf_counter()
+        dfs = _run_sharded(image_paths, min(workers, len(image_paths)), batch_size, num_threads,
+                           track_every, track_min_score)
+        try:
+            saved = _save_results(_attach_timestamps(dfs, frame_dir), output_csv)
         except Exception as e:
-            print(f"[warn] detect failed on {img_path}: {e}")
+            print(f">>> [EXCEPTION] Sharded Py-Feat failed: {e}")
+            return None
+        _report_rate(len(image_paths), t0)
+        return saved
 
-    if not dfs:
-        print(">>> [ERROR] No successful detections; not writing CSV.")
+    if detector is None:
+        detector = _load_detector(num_threads)
+    if detector is None:
         return
 
-    results = pd.concat(dfs, ignore_index=True)
-    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
-    results.to_csv(output_csv, index=False)
-    print(f">>> py-feat results saved to: {os.path.abspath(output_csv)}")
+    t0 = time.perf_counter()
+    dfs = _detect_paths(detector, image_paths, batch_size,
+                        track_every=track_every, track_min_score=track_min_score)
+    saved = _save_results(_attach_timestamps(dfs, frame_dir), output_csv)
+    _report_rate(len(image_paths), t0)
+    return saved
+
+def detect_frames(detector, frames, batch_size=1, tracker: Optional[FaceTracker] = None, stats=None):
+    """
+    Yield (sample_idx, t_sec, df_or_None) for each (sample_idx, t_sec, frame_bgr) in `frames`, in order.
+
+    Frames are collected into batches of `batch_size` before detection; with a tracker
+    (tracking mode) they go one by one, and `stats` collects the per-stage timings.
+    Tracker and stats may be carried across calls to continue one video.
+    """
+    step = 1 if tracker is not None else max(1, batch_size)
+    if tracker is not None and stats is None:
+        stats = _new_stage_stats()
+    batch = []
+
+    def flush():
+        if tracker is not None:
+            idx, t_sec, frame = batch[0]
+            try:
+                rgb = _timed(stats, "load", cv2.cvtColor, frame, cv2.COLOR_BGR2RGB)
+                results = [_detect_tracked(detector, rgb, tracker, stats)]
+            except Exception as e:
+                print(f"[warn] detect failed on frame {idx}: {e}")
+                results = [None]
+        else:
+            rgbs = [cv2.cvtColor(f, cv2.COLOR_BGR2RGB) for _, _, f in batch]
+            results = _detect_batch(detector, batch_size, rgbs=rgbs)
+        out = [(idx, t_sec, df) for (idx, t_sec, _), df in zip(batch, results)]
+        batch.clear()
+        return out
+
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= step:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+def run_pyfeat_on_arrays(frames, output_csv=default_results_path(), detector=None,
+                         batch_size=1, num_threads=None, track_every=0, track_min_score=0.6, on_rows=None):
+    """
+    In-memory variant of run_pyfeat_on_frames.
+
+    frames: iterable of (sample_idx, t_sec, frame_bgr), e.g. from frame_pipeline / frame_extraction.iter_frames.
+    Rows get "frame" (sample index), "timestamp" (seconds), "frame_hash" and "face_sig"
+    (fingerprints of the frame and the face box, for incremental re-analysis) columns
+    instead of an image path.
+    Frames are collected into batches of `batch_size` before detection, unless tracking
+    (track_every > 1) is on, which works frame by frame. Rows are written as they arrive
+    (and passed to `on_rows(df)`, e.g. au_stream.SegmentLog, when given); returns the
+    results path (None if nothing was detected).
+    """
+    print(">>> Py-Feat runner starting (in-memory frames)…")
+    if detector is None:
+        detector = _load_detector(num_threads)
+    if detector is None:
+        return None
+
+    n = 0
+    t0 = time.perf_counter()
+    tracker = FaceTracker(track_every, track_min_score) if track_every > 1 else None
+    stats = _new_stage_stats()
+    hashes = {}
+
+    def rows():
+        nonlocal n
+        for idx, t_sec, df in detect_frames(detector, hashed_frames(frames, hashes), batch_size, tracker, stats):
+            n += 1
+            if n % 10 == 0:
+                print(f"    ... processed {n} frames")
+            fingerprint = hashes.pop(idx, None)
+            if df is None or df.empty:
+                print(f"[warn] Empty result for frame {idx}")
+                continue
+            df["frame"] = idx
+            df["timestamp"] = t_sec
+            tag_rows(df, fingerprint)
+            if on_rows is not None:
+                on_rows(df)
+            yield df
+
+    saved = _save_results(rows(), output_csv)
+    print(f"    ... processed {n} frames")
+    _report_rate(n, t0)
+    if tracker is not None:
+        _report_stages(stats)
+    return saved
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--frame_dir", default="frames")
-    ap.add_argument("--output_csv", default="output/pyfeat_results.csv")
+    ap.add_argument("--output_csv", "--output", dest="output_csv", default=default_results_path(),
+                    help="Results file; .parquet writes typed row groups, anything else CSV")
+    ap.add_argument("--batch_size", type=int, default=1, help="Frames per detect_image call")
+    ap.add_argument("--num_threads", type=int, default=None,
+                    help=f"Torch threads in total (default: {default_num_threads()} on this platform)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Shard frames across N processes, each with its own Detector")
+    ap.add_argument("--track_every", type=int, default=0,
+                    help="Full face detection every K frames, tracked boxes in between (0/1 = off)")
+    ap.add_argument("--track_min_score", type=float, default=0.6,
+                    help="Re-detect early when the tracker's match score drops below this")
     args = ap.parse_args()
-    run_pyfeat_on_frames(args.frame_dir, args.output_csv)
+    run_pyfeat_on_frames(args.frame_dir, args.output_csv,
+                         batch_size=args.batch_size, num_threads=args.num_threads, workers=args.workers,
+                         track_every=args.track_every, track_min_score=args.track_min_score)
 
 if __name__ == "__main__":
     main()
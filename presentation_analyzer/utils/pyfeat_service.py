@@ -0,0 +1,551 @@
+"""
+Long-lived local Py-Feat worker: keeps one warm Detector so each video skips the torch import
+and model load that a fresh pyfeat_runner.py subprocess pays every time.
+
+The worker listens on a Unix socket (a named pipe on Windows) via multiprocessing.connection.
+Detection still runs in its own process, as with the subprocess runner, and a supervisor
+restarts it if it crashes. The first client that finds no worker starts one in the background;
+it exits by itself after --idle_timeout seconds without jobs.
+
+Connections authenticate with a random per-user key kept next to the pid file (mode 0600;
+PYFEAT_SERVICE_KEY overrides it), so only this user's processes can send the worker
+(pickled) jobs. Clients give up on a worker that does not answer within PING_TIMEOUT.
+The worker's log is kept next to the pid file as well (mode 0600).
+
+Jobs (one per connection; detection jobs run one at a time, pings are answered meanwhile):
+    {"op": "ping"}                                   -> {"ok": True, "pid": ..., "busy": bool}
+    {"op": "frame_dir", "frame_dir": ..., ...opts}   -> {"results": [...]}* then {"done": n}
+    {"op": "frames", ...opts}, then per batch {"frames": [(idx, t_sec, bgr), ...]} -> {"results": [...]},
+                                                     closed by {"end": True}
+    {"op": "shutdown"}                               -> {"ok": True}
+Each result is (idx, t_sec, DataFrame or None); opts are batch_size, track_every, track_min_score.
+
+    python presentation_analyzer/utils/pyfeat_service.py serve      # foreground
+    python presentation_analyzer/utils/pyfeat_service.py status
+    python presentation_analyzer/utils/pyfeat_service.py stop
+"""
+
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from multiprocessing.connection import AuthenticationError, Client, Listener, answer_challenge, deliver_challenge
+import multiprocessing as mp
+
+import cv2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from face_tracking import FaceTracker  # noqa: E402
+from incremental import hashed_frames, tag_rows  # noqa: E402
+from pyfeat_runner import (  # noqa: E402
+    _attach_timestamps, _list_images, _load_detector, _new_stage_stats, _report_saved, _report_stages,
+    _save_results, detect_frames,
+)
+from results_io import ResultsWriter  # noqa: E402
+
+DEFAULT_IDLE_TIMEOUT = 1800
+STARTUP_TIMEOUT = 300  # model download/load on a cold machine can take minutes
+PING_TIMEOUT = 5.0     # handshake / ping reply; the worker answers these even while a job runs
+MAX_RESTARTS = 5       # within RESTART_WINDOW seconds, before the supervisor gives up
+RESTART_WINDOW = 60
+DIR_CHUNK = 32         # frames per streamed message for frame_dir jobs
+
+
+def default_address() -> str:
+    if sys.platform.startswith("win"):
+        return r"\\.\pipe\pyfeat-worker-" + os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"pyfeat-worker-{os.getuid()}.sock")
+
+
+def _pid_path(address: str) -> str:
+    if address.startswith("\\\\"):
+        return os.path.join(tempfile.gettempdir(), address.rsplit("\\", 1)[-1] + ".pid")
+    return address + ".pid"
+
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform.startswith("win"):
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def supervisor_pid(address: str):
+    """PID of the live supervisor for `address`, or None."""
+    try:
+        with open(_pid_path(address), encoding="utf-8") as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return None
+    return pid if pid and _pid_alive(pid) else None
+
+
+def _claim_pidfile(address: str) -> bool:
+    """Atomically become the one supervisor for `address` (stale pid files are taken over)."""
+    path = _pid_path(address)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        except FileExistsError:
+            if supervisor_pid(address) is not None:
+                return False
+            try: os.unlink(path)
+            except OSError: pass
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _key_path(address: str) -> str:
+    return _pid_path(address)[:-len(".pid")] + ".key"
+
+
+def _log_path(address: str) -> str:
+    return _pid_path(address)[:-len(".pid")] + ".log"
+
+
+def _open_log(path: str):
+    """Append to the worker log, refusing a symlink or a file that belongs to another user."""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    if hasattr(os, "getuid"):
+        st = os.fstat(fd)
+        if st.st_uid != os.getuid():
+            os.close(fd)
+            raise PermissionError(f"{path} belongs to another user; remove it and retry")
+        if st.st_mode & 0o077:
+            os.fchmod(fd, 0o600)
+    return os.fdopen(fd, "a", encoding="utf-8")
+
+
+_keys = {}
+
+
+def _authkey(address: str) -> bytes:
+    """Key shared by the worker at `address` and its clients; created on first use."""
+    if os.environ.get("PYFEAT_SERVICE_KEY"):
+        return os.environ["PYFEAT_SERVICE_KEY"].encode()
+    if address not in _keys:
+        path = _key_path(address)
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            try:
+                os.link(tmp, path)  # never replaces a key another process created meanwhile
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp)
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        with os.fdopen(fd) as f:
+            st = os.fstat(f.fileno())
+            if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+                raise PermissionError(f"{path} is not private to this user; remove it and retry")
+            _keys[address] = f.read().strip().encode()
+    return _keys[address]
+
+
+def _connect(address: str, timeout: float = PING_TIMEOUT):
+    """Authenticated connection; TimeoutError if the worker does not take it within `timeout`."""
+    conn = Client(address)  # unauthenticated so far; the worker sends its challenge once it accepts
+    try:
+        if not conn.poll(timeout):
+            raise TimeoutError(f"Py-Feat worker at {address} did not answer within {timeout:.0f}s")
+        key = _authkey(address)
+        answer_challenge(conn, key)
+        deliver_challenge(conn, key)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def ping(address: str, timeout: float = PING_TIMEOUT):
+    """The worker's ping reply ({"ok", "pid", "busy"}), or None if none answers within `timeout`."""
+    try:
+        with _connect(address, timeout) as conn:
+            conn.send({"op": "ping"})
+            if conn.poll(timeout):
+                return conn.recv()
+    except (OSError, EOFError, AuthenticationError):
+        pass
+    return None
+
+
+def is_running(address: str) -> bool:
+    reply = ping(address)
+    return bool(reply and reply.get("ok"))
+
+
+# ---------- Worker side ----------
+def _tracker(job):
+    track_every = int(job.get("track_every") or 0)
+    return FaceTracker(track_every, float(job.get("track_min_score", 0.6))) if track_every > 1 else None
+
+
+def _job_frame_dir(conn, detector, job):
+    frame_dir = job["frame_dir"]
+    paths = _list_images(frame_dir)
+    tracker, stats = _tracker(job), _new_stage_stats()
+
+    def frames():
+        for i, p in enumerate(paths):
+            img = cv2.imread(p, cv2.IMREAD_COLOR)
+            if img is None:
+                print(f"[warn] cv2.imread() returned None for {p}")
+                continue
+            yield i, None, img
+
+    n, chunk = 0, []
+    for idx, _, df in detect_frames(detector, frames(), int(job.get("batch_size", 1)), tracker, stats):
+        if df is not None and not df.empty:
+            df["image_path"] = os.path.abspath(paths[idx])
+        chunk.append((idx, None, df))
+        n += 1
+        if len(chunk) >= DIR_CHUNK:
+            conn.send({"results": chunk})
+            chunk = []
+    if chunk:
+        conn.send({"results": chunk})
+    if tracker is not None:
+        _report_stages(stats)
+    conn.send({"done": n})
+
+
+def _job_frames(conn, detector, job):
+    tracker, stats = _tracker(job), _new_stage_stats()
+    batch_size = int(job.get("batch_size", 1))
+    while True:
+        msg = conn.recv()
+        if msg.get("end"):
+            break
+        results = list(detect_frames(detector, msg["frames"], batch_size, tracker, stats))
+        conn.send({"results": results})
+    if tracker is not None:
+        _report_stages(stats)
+
+
+def _serve(address: str, num_threads, idle_timeout: float):
+    """Worker process: load the Detector once, then handle jobs until shutdown or idle timeout."""
+    if is_running(address):
+        print(f">>> Py-Feat worker already running at {address}")
+        return
+    if not address.startswith("\\\\") and os.path.exists(address):
+        os.unlink(address)  # stale socket from a crashed worker
+
+    detector = _load_detector(num_threads)
+    if detector is None:
+        sys.exit(3)
+
+    authkey = _authkey(address)
+    umask = os.umask(0o077) if not address.startswith("\\\\") else None  # socket is 0600 from bind() on
+    try:
+        listener = Listener(address, authkey=authkey)
+    finally:
+        if umask is not None:
+            os.umask(umask)
+    print(f">>> Py-Feat worker {os.getpid()} ready at {address}", flush=True)
+
+    jobs = threading.Lock()  # one detection job at a time; later ones wait their turn
+    state_lock = threading.Lock()
+    state = {"last": time.monotonic(), "busy": 0}
+
+    def done(conn):
+        conn.close()
+        with state_lock:
+            state["busy"] -= 1
+            state["last"] = time.monotonic()
+
+    def run_job(conn, job):
+        try:
+            with jobs:
+                if job["op"] == "frame_dir":
+                    _job_frame_dir(conn, detector, job)
+                else:
+                    _job_frames(conn, detector, job)
+        except (EOFError, OSError):
+            print("[warn] client disconnected mid-job", flush=True)
+        except Exception:
+            tb = traceback.format_exc()
+            print(tb, flush=True)
+            try: conn.send({"error": tb})
+            except Exception: pass
+        finally:
+            done(conn)
+
+    def watchdog():
+        while True:
+            time.sleep(min(30.0, idle_timeout))
+            if not state["busy"] and time.monotonic() - state["last"] > idle_timeout:
+                print(f">>> Idle for {idle_timeout:.0f}s; worker exiting.", flush=True)
+                os._exit(0)
+
+    if idle_timeout > 0:
+        threading.Thread(target=watchdog, daemon=True).start()
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:  # bad authkey, client gone mid-handshake
+            print(f"[warn] accept failed: {e}", flush=True)
+            continue
+        with state_lock:
+            state["busy"] += 1
+        try:
+            if not conn.poll(PING_TIMEOUT):
+                raise EOFError
+            job = conn.recv()
+            op = job.get("op")
+            if op in ("frame_dir", "frames"):
+                threading.Thread(target=run_job, args=(conn, job), daemon=True).start()
+                continue  # run_job closes it
+            if op == "ping":
+                conn.send({"ok": True, "pid": os.getpid(), "busy": state["busy"] > 1})
+            elif op == "shutdown":
+                with jobs:  # let the running job finish
+                    conn.send({"ok": True})
+                    listener.close()
+                    return
+            else:
+                conn.send({"error": f"unknown op {op!r}"})
+        except (EOFError, OSError):
+            print("[warn] client disconnected before sending a job", flush=True)
+        done(conn)
+
+
+def supervise(address: str, num_threads=None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+    """Run the worker in a child process and restart it when it dies abnormally."""
+    if not _claim_pidfile(address):
+        print(f">>> Py-Feat supervisor already running for {address}", flush=True)
+        return 0
+    ctx = mp.get_context("spawn")
+    restarts = []
+    try:
+        while True:
+            proc = ctx.Process(target=_serve, args=(address, num_threads, idle_timeout), daemon=False)
+            proc.start()
+            proc.join()
+            if proc.exitcode == 0:
+                return 0
+            now = time.monotonic()
+            restarts = [t for t in restarts if now - t < RESTART_WINDOW] + [now]
+            if len(restarts) > MAX_RESTARTS:
+                print(f"[error] Py-Feat worker crashed {len(restarts)} times in {RESTART_WINDOW}s; giving up.", flush=True)
+                return 1
+            print(f"[warn] Py-Feat worker exited with code {proc.exitcode}; restarting.", flush=True)
+            time.sleep(min(2 ** len(restarts) * 0.25, 5.0))
+    finally:
+        try: os.unlink(_pid_path(address))
+        except OSError: pass
+
+
+# ---------- Client side ----------
+def ensure_running(address=None, num_threads=None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                   timeout: float = STARTUP_TIMEOUT) -> str:
+    """Return the address of a live worker, starting one in the background if needed."""
+    address = address or default_address()
+    reply = ping(address)
+    if reply and reply.get("ok"):
+        if reply.get("busy"):
+            print("[info] Py-Feat worker is busy with another job; this one runs after it.", flush=True)
+        return address
+
+    deadline = time.monotonic() + timeout
+    if supervisor_pid(address) is not None:
+        # A supervisor exists (worker starting up or restarting after a crash): wait for it.
+        while time.monotonic() < deadline and supervisor_pid(address) is not None:
+            if is_running(address):
+                return address
+            time.sleep(0.5)
+        if is_running(address):
+            return address
+
+    log_path = _log_path(address)
+    cmd = [sys.executable, os.path.abspath(__file__), "serve", "--address", address,
+           "--idle_timeout", str(idle_timeout)]
+    if num_threads:
+        cmd += ["--num_threads", str(num_threads)]
+    kwargs = {}
+    if sys.platform.startswith("win"):
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    print(f">>> Starting Py-Feat worker (log: {log_path})…", flush=True)
+    with _open_log(log_path) as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, **kwargs)
+
+    while time.monotonic() < deadline:
+        if is_running(address):
+            return address
+        if proc is not None and proc.poll() is not None:
+            if proc.returncode == 0 and supervisor_pid(address) is not None:
+                proc = None  # lost the start-up race; another supervisor is bringing the worker up
+                continue
+            raise RuntimeError(f"Py-Feat worker exited with code {proc.returncode}; see {log_path}")
+        time.sleep(0.5)
+    raise TimeoutError(f"Py-Feat worker not ready after {timeout:.0f}s; see {log_path}")
+
+
+def _check(msg):
+    if "error" in msg:
+        raise RuntimeError(f"Py-Feat worker error:\n{msg['error']}")
+    return msg
+
+
+def _with_restart(job_fn, address, num_threads, retries: int = 1):
+    """Run job_fn(conn); if the worker dies mid-job, wait for a (re)started worker and retry."""
+    for attempt in range(retries + 1):
+        address = ensure_running(address, num_threads)
+        try:
+            with _connect(address) as conn:
+                return job_fn(conn)
+        except (EOFError, ConnectionError, BrokenPipeError) as e:
+            if attempt == retries:
+                raise
+            print(f"[warn] Py-Feat worker connection lost ({e!r}); retrying…", flush=True)
+            time.sleep(1.0)
+
+
+def run_frame_dir_via_service(frame_dir, output_csv, address=None, num_threads=None,
+                              batch_size=1, track_every=0, track_min_score=0.6):
+    """Service counterpart of pyfeat_runner.run_pyfeat_on_frames (same results layout)."""
+    print(f">>> Py-Feat via worker: {os.path.abspath(frame_dir)}")
+    job = {"op": "frame_dir", "frame_dir": os.path.abspath(frame_dir), "batch_size": batch_size,
+           "track_every": track_every, "track_min_score": track_min_score}
+
+    def run(conn):
+        # Chunks are kept until the job finishes so a retry after a worker crash starts clean.
+        dfs, t0 = [], time.perf_counter()
+        conn.send(job)
+        while True:
+            msg = _check(conn.recv())
+            if "done" in msg:
+                n = msg["done"]
+                break
+            for idx, _, df in msg["results"]:
+                if df is None or df.empty:
+                    print(f"[warn] Empty result for frame {idx}")
+                else:
+                    dfs.append(df)
+        dt = time.perf_counter() - t0
+        print(f">>> Detection: {n} frames in {dt:.2f}s ({n / max(dt, 1e-9):.2f} fps)")
+        return dfs
+
+    dfs = _with_restart(run, address, num_threads)
+    return _save_results(_attach_timestamps(dfs, frame_dir), output_csv)
+
+
+def run_arrays_via_service(frames, output_csv, address=None, num_threads=None,
+                           batch_size=1, track_every=0, track_min_score=0.6, on_rows=None):
+    """
+    Service counterpart of pyfeat_runner.run_pyfeat_on_arrays (same results layout).
+
+    Frames are sent in batches of `batch_size` and rows come back per batch; each batch is
+    appended to the results file as it returns. If the worker crashes, the unfinished batch
+    is resent to the restarted worker.
+    """
+    print(">>> Py-Feat via worker (in-memory frames)…")
+    job = {"op": "frames", "batch_size": batch_size,
+           "track_every": track_every, "track_min_score": track_min_score}
+    hashes = {}
+    frames = hashed_frames(iter(frames), hashes)
+    step = max(1, batch_size)
+    pending = []
+    writer = ResultsWriter(output_csv)
+    n, t0 = 0, time.perf_counter()
+
+    def run(conn):
+        nonlocal n
+        conn.send(job)
+        while True:
+            if not pending:
+                for item in frames:
+                    pending.append(item)
+                    if len(pending) >= step:
+                        break
+                if not pending:
+                    conn.send({"end": True})
+                    return
+            conn.send({"frames": pending})
+            for idx, t_sec, df in _check(conn.recv())["results"]:
+                n += 1
+                fingerprint = hashes.pop(idx, None)
+                if df is None or df.empty:
+                    print(f"[warn] Empty result for frame {idx}")
+                    continue
+                df["frame"] = idx
+                df["timestamp"] = t_sec
+                tag_rows(df, fingerprint)
+                writer.append(df)
+                if on_rows is not None:
+                    on_rows(df)
+            pending.clear()
+            if n % 10 < step:
+                print(f"    ... processed {n} frames")
+
+    try:
+        _with_restart(run, address, num_threads)
+    finally:
+        writer.close()
+    dt = time.perf_counter() - t0
+    print(f">>> Detection: {n} frames in {dt:.2f}s ({n / max(dt, 1e-9):.2f} fps)")
+    return _report_saved(writer)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Warm Py-Feat worker service")
+    ap.add_argument("command", choices=["serve", "start", "status", "stop"])
+    ap.add_argument("--address", default=None, help="Socket path / pipe name (default: per-user temp path)")
+    ap.add_argument("--num_threads", type=int, default=None)
+    ap.add_argument("--idle_timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                    help="Exit after this many seconds without jobs (0 = never)")
+    args = ap.parse_args()
+    address = args.address or default_address()
+
+    if args.command == "serve":
+        return supervise(address, args.num_threads, args.idle_timeout)
+    if args.command == "start":
+        ensure_running(address, args.num_threads, args.idle_timeout)
+        print(f">>> Py-Feat worker running at {address}")
+        return 0
+    if args.command == "status":
+        reply = ping(address)
+        up = bool(reply and reply.get("ok"))
+        state = ("busy" if reply.get("busy") else "running") if up else "not running"
+        print(f">>> Py-Feat worker at {address}: {state}")
+        return 0 if up else 1
+    if not is_running(address):
+        print(">>> Py-Feat worker not running.")
+        return 0
+    with _connect(address) as conn:
+        conn.send({"op": "shutdown"})
+        conn.recv()
+    print(">>> Py-Feat worker stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
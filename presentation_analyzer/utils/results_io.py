@@ -0,0 +1,158 @@
+"""
+Py-Feat results on disk: incremental Parquet (typed, columnar) or the old wide CSV.
+
+The format follows the file extension (.parquet / .pq, anything else is CSV). Rows are
+appended in row groups as frames are processed, so the runner never holds the whole
+result table, and readers can ask for just the columns they use.
+
+Schema: numeric columns are float32 (AU, emotion, landmark and box values do not need
+more), "timestamp" stays float64, "frame" and "frame_hash" (in-memory runs) are int64 and
+text columns ("input", "image_path") are strings. pyarrow is optional; without it callers get CSV.
+"""
+
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAVE_PARQUET = True
+except Exception:
+    HAVE_PARQUET = False
+
+PARQUET_EXTS = (".parquet", ".pq")
+FLOAT64_COLUMNS = {"timestamp"}
+INT_COLUMNS = {"frame", "frame_hash"}
+ROW_GROUP_SIZE = 512
+
+
+def is_parquet(path: str) -> bool:
+    return str(path).lower().endswith(PARQUET_EXTS)
+
+
+def default_results_path(stem: str = "output/pyfeat_results") -> str:
+    return stem + (".parquet" if HAVE_PARQUET else ".csv")
+
+
+def _arrow_type(name: str, dtype):
+    if name in INT_COLUMNS:
+        return pa.int64()
+    if name in FLOAT64_COLUMNS:
+        return pa.float64()
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        return pa.float32()
+    return pa.string()
+
+
+def _coerce(df: pd.DataFrame, columns: List[str], types: dict) -> pd.DataFrame:
+    """Align a batch to the writer's columns (missing -> NaN/None, extras dropped) and dtypes."""
+    df = df.reindex(columns=columns)
+    for c in columns:
+        t = types[c]
+        if t == "string":
+            df[c] = df[c].map(lambda v: None if v is None or (isinstance(v, float) and np.isnan(v)) else str(v))
+        else:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(t)
+    return df
+
+
+class ResultsWriter:
+    """
+    Append DataFrames (one per frame or batch) to a results file in row groups.
+
+    The schema is fixed by the first batch; later batches are aligned to it. Use as a
+    context manager or call close(); rows() reports how many rows were written.
+    """
+
+    def __init__(self, path: str, row_group_size: int = ROW_GROUP_SIZE):
+        self.path = str(path)
+        self.parquet = is_parquet(self.path)
+        if self.parquet and not HAVE_PARQUET:
+            raise RuntimeError("pyarrow is required for Parquet output; use a .csv path instead")
+        self.row_group_size = max(1, row_group_size)
+        self._pending: List[pd.DataFrame] = []
+        self._pending_rows = 0
+        self._columns: Optional[List[str]] = None
+        self._types: dict = {}
+        self._writer = None
+        self._schema = None
+        self._n = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def rows(self) -> int:
+        return self._n
+
+    def append(self, df: Optional[pd.DataFrame]):
+        if df is None or df.empty:
+            return
+        if self._columns is None:
+            self._columns = list(df.columns)
+            if self.parquet:
+                self._schema = pa.schema([(c, _arrow_type(c, df[c].dtype)) for c in self._columns])
+                self._types = {c: ("string" if self._schema.field(c).type == pa.string()
+                                   else self._schema.field(c).type.to_pandas_dtype()) for c in self._columns}
+        self._pending.append(df)
+        self._pending_rows += len(df)
+        if self._pending_rows >= self.row_group_size:
+            self.flush()
+
+    def extend(self, dfs: Iterable[Optional[pd.DataFrame]]):
+        for df in dfs:
+            self.append(df)
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+        if self.parquet:
+            batch = _coerce(batch, self._columns, self._types)
+            table = pa.Table.from_pandas(batch, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+            self._writer.write_table(table)
+        else:
+            batch = batch.reindex(columns=self._columns)
+            batch.to_csv(self.path, mode="a", header=self._n == 0, index=False)
+        self._n += len(batch)
+
+    def close(self) -> Optional[str]:
+        """Flush and close; returns the path, or None if nothing was written."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return self.path if self._n else None
+
+
+def result_columns(path: str) -> List[str]:
+    if is_parquet(path):
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_results(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Load a results file, reading only `columns` (those that exist; order kept) when given.
+
+    Parquet reads just those column chunks; CSV still scans the text but parses only them.
+    """
+    path = str(path)
+    if columns is None:
+        return pd.read_parquet(path) if is_parquet(path) else pd.read_csv(path)
+    available = set(result_columns(path))
+    wanted = [c for c in dict.fromkeys(columns) if c in available]
+    if is_parquet(path):
+        return pd.read_parquet(path, columns=wanted)
+    return pd.read_csv(path, usecols=wanted)[wanted] if wanted else pd.DataFrame(index=pd.RangeIndex(0))
@@ -0,0 +1,212 @@
+"""
+Content-addressed cache for main.py's stages.
+
+A stage's key is a SHA-256 over the content digests of its inputs, its parameters and its
+code version (the source of the modules that implement it plus the versions of the packages
+it runs). Entries live in <cache_dir>/<stage>/<key[:2]>/<key>/: the output files (hard links
+where the file system allows, copies otherwise) and a manifest.json:
+
+    {"stage": "pyfeat", "key": "…", "inputs": {"video": "…"}, "params": {...}, "code": "…",
+     "outputs": {"results": {"pyfeat_results.parquet": {"sha256": "…", "size": 123}}}, "created": "…"}
+
+fetch() puts a hit's files at the stage's output paths. On a miss, clear() removes the old
+outputs first, so a stage never writes through a hard link into the cache, and store() records
+the new ones. Downstream stages key on the recorded output digests (output_digest), so a re-run
+that produces the same bytes does not invalidate what follows.
+
+Outputs are given per stage as name -> file path, or name -> (directory, glob patterns).
+Digests of large files (the uploaded video) are memoized on (path, size, mtime) in
+<cache_dir>/digests.json, so a long upload is hashed once.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CHUNK = 1 << 20
+MEMO_MIN_BYTES = 8 << 20  # smaller files are cheaper to re-hash than to look up
+
+_lock = threading.Lock()
+
+
+def _sha256_file(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _sha256_json(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def code_version(files: Iterable, packages: Iterable[str] = ()) -> str:
+    """Digest of the given source files and installed package versions ("-" if missing)."""
+    h = hashlib.sha256()
+    for p in files:
+        h.update(os.path.basename(p).encode("utf-8") + b"\0")
+        with open(p, "rb") as f:
+            h.update(f.read().replace(b"\r\n", b"\n"))  # same key for a CRLF and an LF checkout
+    for name in packages:
+        try:
+            version = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            version = "-"
+        h.update(f"{name}=={version}\0".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _output_files(spec) -> List[Tuple[str, Path]]:
+    """(name in the entry, current path) of each file an output spec covers."""
+    if isinstance(spec, tuple):
+        root, patterns = Path(spec[0]), spec[1]
+        files = sorted({p for pat in patterns for p in root.glob(pat) if p.is_file()})
+        return [(p.relative_to(root).as_posix(), p) for p in files]
+    p = Path(spec)
+    return [(p.name, p)] if p.is_file() else []
+
+
+def _target(spec, rel: str) -> Path:
+    return Path(spec[0]) / rel if isinstance(spec, tuple) else Path(spec)
+
+
+def _link_or_copy(src: Path, dst: Path):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def output_digest(manifest: Optional[dict], name: str) -> str:
+    """Digest of one recorded output (all of its files), for use as a downstream input."""
+    if not manifest:
+        return ""
+    files = manifest["outputs"].get(name, {})
+    return _sha256_json({rel: meta["sha256"] for rel, meta in files.items()})
+
+
+class StageCache:
+    """
+    Stage results keyed by content. enabled=False runs every stage and records nothing;
+    refresh=True (main.py --overwrite) ignores existing entries and replaces them.
+    """
+
+    def __init__(self, root, enabled: bool = True, refresh: bool = False):
+        self.root = Path(root)
+        self.enabled = enabled
+        self.refresh = refresh
+        self._memo: Optional[dict] = None
+
+    # ---------- digests ----------
+    def _memo_path(self) -> Path:
+        return self.root / "digests.json"
+
+    def _load_memo(self) -> dict:
+        if self._memo is None:
+            try:
+                with open(self._memo_path(), encoding="utf-8") as f:
+                    self._memo = json.load(f)
+            except (OSError, ValueError):
+                self._memo = {}
+        return self._memo
+
+    def _save_memo(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._memo_path().with_name(f"digests.json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._memo, f, indent=0)
+        os.replace(tmp, self._memo_path())
+
+    def digest(self, path) -> str:
+        """SHA-256 of a file; memoized for large files. Empty when the cache is off."""
+        if not self.enabled:
+            return ""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        if st.st_size < MEMO_MIN_BYTES:
+            return _sha256_file(path)
+        sig = [st.st_size, st.st_mtime_ns]
+        with _lock:
+            hit = self._load_memo().get(path)
+        if hit and hit[:2] == sig:
+            return hit[2]
+        value = _sha256_file(path)
+        with _lock:
+            self._memo = None  # pick up entries other jobs added meanwhile
+            self._load_memo()[path] = sig + [value]
+            self._save_memo()
+        return value
+
+    # ---------- entries ----------
+    def stage(self, name: str, inputs: Dict[str, str], params: dict, code: str) -> dict:
+        """Identity of one stage run: its inputs, parameters, code version and the key over them."""
+        spec = {"stage": name, "inputs": inputs, "params": params, "code": code}
+        spec["key"] = _sha256_json(spec)
+        return spec
+
+    def _entry(self, spec: dict) -> Path:
+        return self.root / spec["stage"] / spec["key"][:2] / spec["key"]
+
+    def fetch(self, spec: dict, outputs: dict) -> Optional[dict]:
+        """On a hit, put the entry's files at the output paths and return its manifest; else None."""
+        if not self.enabled or self.refresh:
+            return None
+        entry = self._entry(spec)
+        try:
+            with open(entry / "manifest.json", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if set(manifest["outputs"]) != set(outputs):
+            return None
+        for name, files in manifest["outputs"].items():
+            for rel, meta in files.items():
+                src = entry / name / rel
+                if not src.is_file() or src.stat().st_size != meta["size"]:
+                    return None  # entry damaged or pruned: run the stage again
+        self.clear(outputs)
+        for name, files in manifest["outputs"].items():
+            for rel in files:
+                _link_or_copy(entry / name / rel, _target(outputs[name], rel))
+        return manifest
+
+    def clear(self, outputs: dict):
+        """Remove a stage's current output files before it runs."""
+        for spec in outputs.values():
+            for _, p in _output_files(spec):
+                p.unlink()
+
+    def store(self, spec: dict, outputs: dict) -> dict:
+        """Record the stage's output files under its key; returns the manifest."""
+        manifest = dict(spec)
+        if not self.enabled:
+            manifest["outputs"] = {name: {} for name in outputs}
+            return manifest
+        files = {name: _output_files(out) for name, out in outputs.items()}
+        manifest["outputs"] = {name: {rel: {"sha256": self.digest(p), "size": p.stat().st_size} for rel, p in fl}
+                               for name, fl in files.items()}
+        manifest["created"] = datetime.now().isoformat(timespec="seconds")
+
+        entry = self._entry(spec)
+        tmp = entry.with_name(f"{spec['key']}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, fl in files.items():
+            for rel, p in fl:
+                _link_or_copy(p, tmp / name / rel)
+        with open(tmp / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(tmp, entry)  # readers see the old entry, none, or the complete new one
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another job stored the same key meanwhile
+        return manifest
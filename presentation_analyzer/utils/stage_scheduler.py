@@ -0,0 +1,69 @@
+"""
+Run independent analysis stages side by side and split a CPU budget between them.
+
+Landmarks and Py-Feat only read the same frames, so neither has to wait for the other:
+wall time approaches the slower stage instead of the sum of both.
+"""
+
+import math
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Optional
+
+
+def split_cpu_budget(shares: Dict[str, float], total: Optional[int] = None) -> Dict[str, int]:
+    """
+    Split `total` cores (default: all) between stages in proportion to `shares`.
+
+    Every stage gets at least one core; leftovers go to the largest fractional parts.
+    """
+    total = max(1, total or os.cpu_count() or 1)
+    weights = {k: max(0.0, float(v)) for k, v in shares.items()}
+    norm = sum(weights.values()) or 1.0
+    exact = {k: total * w / norm for k, w in weights.items()}
+    alloc = {k: max(1, math.floor(v)) for k, v in exact.items()}
+    spare = total - sum(alloc.values())
+    for k in sorted(exact, key=lambda k: exact[k] - math.floor(exact[k]), reverse=True):
+        if spare <= 0:
+            break
+        alloc[k] += 1
+        spare -= 1
+    return alloc
+
+
+def run_stages(stages: Dict[str, Callable[[], object]]):
+    """
+    Run each stage in its own thread (the heavy work happens in native code or child processes).
+
+    Returns (results, errors, timings): name -> return value, name -> formatted traceback, and
+    name -> seconds. Prints the wall time next to the sum of stage times.
+    """
+    results: Dict[str, object] = {}
+    errors: Dict[str, str] = {}
+    timings: Dict[str, float] = {}
+
+    def work(name, fn):
+        t0 = time.perf_counter()
+        try:
+            results[name] = fn()
+        except Exception:
+            errors[name] = traceback.format_exc()
+            print(f"[error] Stage '{name}' failed:\n{errors[name]}", flush=True)
+        finally:
+            timings[name] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(n, fn), name=f"stage-{n}", daemon=True)
+               for n, fn in stages.items()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    if len(stages) > 1:
+        parts = ", ".join(f"{n} {s:.1f}s" for n, s in timings.items())
+        print(f"[info] Stages: {parts}; wall {wall:.1f}s vs {sum(timings.values()):.1f}s sequential", flush=True)
+    return results, errors, timings
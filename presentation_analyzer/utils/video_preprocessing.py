@@ -1,18 +1,93 @@
 import ffmpeg
+import numpy as np
 import os
 
-def standardize_video(input_path, output_path="processed_video.mp4", fps=25, resolution=(640, 480)):
-    print(">>> [FFmpeg] Standardizing video...")
+STANDARDIZE_MODES = ("none", "copy", "encode")
+
+
+def standardize_video(input_path, output_path="processed_video.mp4", fps=25, resolution=(640, 480), mode="encode"):
+    """
+    Write a standardized copy of the upload.
+
+    mode="encode" re-encodes to H.264/AAC at `fps` / `resolution` (slow, CPU heavy);
+    mode="copy" only remuxes the streams into `output_path` (fast, no decode). The fps /
+    scale normalisation is normally done at decode time instead, see decode_frames.
+    """
+    print(f">>> [FFmpeg] Standardizing video ({mode})...")
     try:
-        (
-            ffmpeg
-            .input(input_path)
-            .filter('fps', fps=fps)
-            .filter('scale', resolution[0], resolution[1])
-            .output(output_path, vcodec='libx264', acodec='aac')
-            .run(overwrite_output=True)
-        )
+        if mode == "copy":
+            (
+                ffmpeg
+                .input(input_path)
+                .output(output_path, c='copy')
+                .run(overwrite_output=True)
+            )
+        else:
+            (
+                ffmpeg
+                .input(input_path)
+                .filter('fps', fps=fps)
+                .filter('scale', resolution[0], resolution[1])
+                .output(output_path, vcodec='libx264', acodec='aac')
+                .run(overwrite_output=True)
+            )
     except ffmpeg.Error as e:
-        print("[FFmpeg ERROR]", e.stderr.decode())
+        print("[FFmpeg ERROR]", e.stderr.decode() if e.stderr else e)
         raise e
     return output_path
+
+
+def video_size(input_path):
+    """(width, height) of the first video stream."""
+    info = ffmpeg.probe(input_path)
+    vs = next(s for s in info["streams"] if s.get("codec_type") == "video")
+    return int(vs["width"]), int(vs["height"])
+
+
+def decode_frames(input_path, fps=1.0, resolution=(640, 480), keyframes_only=False):
+    """
+    Decode-only path: yield (idx, t_sec, frame_bgr) straight from ffmpeg.
+
+    The fps and scale filters run inside the decoder and raw BGR frames are piped to us,
+    so nothing is re-encoded and no intermediate video is written. keyframes_only=True
+    additionally tells the decoder to skip every non-keyframe (very cheap, coarse sampling).
+    resolution=None keeps the source frame size.
+    """
+    in_kwargs = {"skip_frame": "nokey"} if keyframes_only else {}
+    # round=up: output frame n is the source frame at exactly n / fps (same frames as index sampling)
+    stream = ffmpeg.input(input_path, **in_kwargs).video.filter('fps', fps=fps, round='up')
+    if resolution:
+        w, h = resolution
+        stream = stream.filter('scale', w, h)
+    else:
+        w, h = video_size(input_path)
+    proc = (
+        stream
+        .output('pipe:', format='rawvideo', pix_fmt='bgr24')
+        .global_args('-loglevel', 'error', '-nostdin')
+        .run_async(pipe_stdout=True)
+    )
+    frame_bytes = w * h * 3
+    idx = 0
+    finished = False
+    try:
+        while True:
+            buf = bytearray(frame_bytes)  # writable frame memory, filled in place
+            view, got = memoryview(buf), 0
+            while got < frame_bytes:
+                n = proc.stdout.readinto(view[got:])
+                if not n:
+                    break
+                got += n
+            if got < frame_bytes:
+                finished = True
+                break
+            yield idx, idx / float(fps), np.frombuffer(buf, np.uint8).reshape(h, w, 3)
+            idx += 1
+    finally:
+        proc.stdout.close()
+        if not finished:
+            proc.kill()  # consumer stopped early
+        proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {os.path.basename(input_path)} (exit {proc.returncode})")